@@ -0,0 +1,41 @@
+"""
+Guards for state that must be shared by every web process.
+
+Per-process caches (LocMemCache, or an in-process structure such as
+teams.cache.LocalPermissionCache) only see invalidations made by the process
+that holds them. That is fine for `runserver` and a single worker; with more
+workers a revocation or membership change would only take effect in one of
+them. settings.WEB_PROCESSES (default: gunicorn's WEB_CONCURRENCY) says how
+many processes serve the app, and require_shared() refuses to start when
+such state would be split between them.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_process_local(alias) -> bool:
+    """Whether CACHES[alias] lives inside each process."""
+    try:
+        backend = settings.CACHES[alias]["BACKEND"]
+    except KeyError:
+        raise ImproperlyConfigured(f"CACHES has no {alias!r} alias")
+    return backend in PROCESS_LOCAL_BACKENDS
+
+
+def web_processes() -> int:
+    return max(1, int(getattr(settings, "WEB_PROCESSES", 1)))
+
+
+def require_shared(what, process_local: bool):
+    """Raise ImproperlyConfigured when `what` is process-local but several processes serve the app."""
+    processes = web_processes()
+    if process_local and processes > 1:
+        raise ImproperlyConfigured(
+            f"{what} is per-process but WEB_PROCESSES is {processes}: changes made in one worker "
+            f"would not be seen by the others. Point it at a shared CACHES alias (redis, memcached)."
+        )
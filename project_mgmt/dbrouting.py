@@ -0,0 +1,153 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Views that opt in with ReplicaReadMixin send the ORM reads of their safe-method
+requests to one of settings.DATABASE_REPLICAS["REPLICAS"]; everything else
+(writes, other views, background work) uses "default". A replica that fails
+to connect is skipped for RETRY_AFTER seconds. The caller's memberships for
+permission checks (teams/authz.py) are always read from the primary, since
+they are cached across requests.
+
+After an authenticated user makes a successful write through any view,
+ReadYourWritesMiddleware pins that user's reads to the primary for
+STICKY_SECONDS, long enough for replicas to catch up. The marker lives in
+a Django cache (CACHE_ALIAS), so it must be shared by every web process.
+
+Local setup with two SQLite files (copy db.sqlite3 to replica.sqlite3 after
+migrating):
+
+    DATABASES["replica"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "replica.sqlite3",
+                            "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS = {"REPLICAS": ["replica"], ...}
+"""
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+    "REPLICAS": [],
+    "STICKY_SECONDS": 5,
+    "RETRY_AFTER": 30,     # seconds an unreachable replica is left out
+    "CACHE_ALIAS": "default",
+}
+
+_read_alias = ContextVar("project_mgmt_read_alias", default=None)
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "DATABASE_REPLICAS", {})}
+
+
+class ReplicaHealth:
+    """Per-process record of replicas that recently failed to connect."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._down_until = {}   # alias -> monotonic deadline
+        self.failures = 0
+
+    def is_up(self, alias) -> bool:
+        return self._down_until.get(alias, 0) <= time.monotonic()
+
+    def mark_down(self, alias, seconds):
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + seconds
+            self.failures += 1
+
+    def clear(self):
+        with self._lock:
+            self._down_until.clear()
+
+
+health = ReplicaHealth()
+
+
+def _sticky_key(user_id) -> str:
+    return f"dbrouting:sticky:{user_id}"
+
+
+def mark_wrote(user_id):
+    """Pin `user_id`'s reads to the primary for STICKY_SECONDS."""
+    config = get_config()
+    if config["REPLICAS"] and user_id is not None and config["STICKY_SECONDS"]:
+        caches[config["CACHE_ALIAS"]].set(_sticky_key(user_id), 1, config["STICKY_SECONDS"])
+
+
+def is_sticky(user_id) -> bool:
+    if user_id is None:
+        return False
+    return caches[get_config()["CACHE_ALIAS"]].get(_sticky_key(user_id)) is not None
+
+
+def choose_replica(user_id=None):
+    """A healthy, reachable replica alias, or None to read from the primary."""
+    config = get_config()
+    replicas = [alias for alias in config["REPLICAS"] if health.is_up(alias)]
+    if not replicas or is_sticky(user_id):
+        return None
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+            return alias
+        except DatabaseError:
+            health.mark_down(alias, config["RETRY_AFTER"])
+    return None
+
+
+class ReplicaRouter:
+    """Reads go where the current request was routed (primary by default); writes and migrations to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same data as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_config()["REPLICAS"]:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views: route the ORM reads of GET/HEAD/OPTIONS requests to a replica
+    unless the caller wrote recently. Authentication runs first, on the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            _read_alias.set(choose_replica(getattr(request.user, "id", None)))
+
+
+class ReadYourWritesMiddleware:
+    """Mark the user sticky to the primary after any successful unsafe request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                mark_wrote(user.id)
+        return response
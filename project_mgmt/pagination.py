@@ -0,0 +1,162 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination with opaque cursors.
+
+    Pages are fetched with `WHERE (k1, k2, ...) > (cursor values) ORDER BY k1, k2, ... LIMIT n+1`,
+    so the cost of a page does not depend on how deep the client is, and no COUNT(*) is issued.
+    `ordering` must be non-null columns whose combination is unique (end with "id"),
+    ideally backed by an index in that order. Prefix a field with "-" for descending.
+    """
+    ordering = ("id",)
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.next_values = None
+        self.previous_values = None
+
+    # ---- cursor encoding ----
+    def encode_cursor(self, values, reverse=False):
+        payload = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, reverse = payload["v"], bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def clean_values(self, model, values) -> list:
+        """Cursor values converted by their model fields; a tampered cursor is a 404, not a 500."""
+        cleaned = []
+        for (name, _), value in zip(self._fields(), values):
+            if value is None:  # ordering columns are non-null
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:  # a lookup across relations: left to the database
+                cleaned.append(value)
+                continue
+            try:
+                cleaned.append(field.to_python(value))
+            except (ValidationError, ValueError, TypeError, OverflowError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    # ---- query building ----
+    def _fields(self):
+        return [(f.lstrip("-"), f.startswith("-")) for f in self.ordering]
+
+    def _seek_filter(self, values, reverse):
+        # (a > x) OR (a = x AND b > y) OR ...
+        fields = self._fields()
+        q = Q()
+        for i, (name, descending) in enumerate(fields):
+            lookup = "lt" if descending != reverse else "gt"
+            conds = {fields[j][0]: values[j] for j in range(i)}
+            conds[f"{name}__{lookup}"] = values[i]
+            q |= Q(**conds)
+        return q
+
+    def _order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in self.ordering)
+
+    @staticmethod
+    def _value(row, name):
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def _key(self, row):
+        return [self._value(row, name) for name, _ in self._fields()]
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        values, reverse = cursor if cursor else (None, False)
+
+        qs = queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            values = self.clean_values(queryset.model, values)
+            qs = qs.filter(self._seek_filter(values, reverse))
+        rows = list(qs[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_values = self.previous_values = None
+        if rows:
+            if has_more or reverse:
+                self.next_values = self._key(rows[-1])
+            if values is not None and (has_more or not reverse):
+                self.previous_values = self._key(rows[0])
+        return rows
+
+    # ---- response ----
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.previous_values, reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
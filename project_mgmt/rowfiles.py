@@ -0,0 +1,45 @@
+"""
+Streaming CSV / JSONL readers shared by the bulk management commands
+(users import_users, teams provision_orgs).
+"""
+import csv
+import json
+import sys
+from pathlib import Path
+
+from django.core.management.base import CommandError
+
+
+def detect_format(path, fmt=None) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if Path(path).suffix.lower() in (".jsonl", ".ndjson") else "csv"
+
+
+def open_input(path):
+    """Open `path` (or stdin for "-") as text suitable for the csv module."""
+    if path == "-":
+        return open(sys.stdin.fileno(), encoding="utf-8", newline="", closefd=False)
+    try:
+        return open(path, encoding="utf-8", newline="")
+    except OSError as exc:
+        raise CommandError(f"Cannot read {path}: {exc}")
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict). Unparseable JSONL lines are yielded as
+    {"_error": message} so callers can report them and carry on.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = {"_error": f"invalid JSON ({exc})"}
+            yield line_no, row if isinstance(row, dict) else {"_error": "expected a JSON object"}
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'project_mgmt.dbrouting.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'project_mgmt.urls'
@@ -82,7 +84,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Local stand-in for a read replica: unused until listed in DATABASE_REPLICAS["REPLICAS"]
+    # (copy db.sqlite3 to replica.sqlite3 after migrating). Its test database is separate
+    # from the primary's, so tests can make it lag behind.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
+
+# Safe-method reads of the team and user-admin viewsets go to these aliases
+# (project_mgmt/dbrouting.py); a user's reads stay on the primary for
+# STICKY_SECONDS after they write. Empty REPLICAS: everything uses "default".
+DATABASE_ROUTERS = ["project_mgmt.dbrouting.ReplicaRouter"]
+DATABASE_REPLICAS = {
+    "REPLICAS": [],
+    "STICKY_SECONDS": 5,
+    "RETRY_AFTER": 30,
+    "CACHE_ALIAS": "default",
 }
 
 
@@ -105,6 +125,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Work factors come from PASSWORD_HASHER_PARAMS (see users/hashers.py); run
+# `python manage.py calibrate_hashers` on each instance type to size them.
+PASSWORD_HASHERS = [
+    'users.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHER_PARAMS = {}
+
+# Bounded process pool for password hashing (users/hashing.py); WORKERS = 0 hashes inline
+PASSWORD_HASHING_POOL = {
+    "WORKERS": 2,
+    "QUEUE_DEPTH": 64,
+    "QUEUE_TIMEOUT": 2.0,
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -130,9 +169,114 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.PrincipalJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_PAGINATION_CLASS": "project_mgmt.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+}
+
+# Web worker processes serving the app; per-process caches refuse to start when it is above 1
+# (project_mgmt/caching.py). gunicorn reads the same WEB_CONCURRENCY variable.
+WEB_PROCESSES = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+# Cross-request cache of effective team permissions (see teams/cache.py).
+# LocalPermissionCache only sees invalidations made in its own process (entries still expire after
+# `timeout` seconds); use teams.cache.DjangoPermissionCache with a shared CACHES alias when
+# WEB_PROCESSES > 1 or on multi-node deployments.
+TEAMS_PERMISSION_CACHE = {
+    "BACKEND": "teams.cache.LocalPermissionCache",
+    "OPTIONS": {"max_entries": 10000, "timeout": 300},
+}
+
+# Per-user (is_active, token_version) checked on every authenticated request (users/authentication.py).
+# Logout-all, User.save() and User.delete() drop the entry, so on a shared alias revocation is
+# immediate in every worker; writes that skip both (queryset.update(), raw SQL) are seen within
+# USER_STATE_CACHE_TIMEOUT seconds. A per-process alias (LocMem, the default here) refuses to start
+# with WEB_PROCESSES > 1.
+USER_STATE_CACHE_ALIAS = "default"
+USER_STATE_CACHE_TIMEOUT = 60
+
+# In-process Bloom filter in front of the RevokedToken table (users/revocation.py)
+TOKEN_DENYLIST = {
+    "FILTER_BITS": 1 << 20,
+    "FILTER_HASHES": 7,
+    "REFRESH_INTERVAL": 5.0,
+    "REBUILD_INTERVAL": 3600.0,
+}
+
+# Outgoing mail goes through the EmailOutbox table (users/outbox.py).
+# Dev prints messages to the console; point EMAIL_BACKEND/EMAIL_HOST at a real provider in production.
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "no-reply@localhost"
+EMAIL_OUTBOX = {
+    "ON_COMMIT": "thread",   # "thread" | "inline" | None (leave delivery to `manage.py send_outbox`)
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 8,
+    "BACKOFF_BASE": 30.0,
+    "BACKOFF_MAX": 3600.0,
+    "LEASE_SECONDS": 300.0,
+}
+
+# "db": one EmailVerificationToken row per link (auditable); "signed": stateless HMAC-signed
+# links that need no table and work once (users/verification.py)
+EMAIL_VERIFICATION = {
+    "MODE": "db",
+    "MAX_AGE": 24 * 3600,
+}
+
+# Sliding-window limits for the public auth endpoints (users/ratelimit.py).
+# Rules: {"key": "ip" | "identifier" | "email", "limit": requests, "window": seconds}.
+# Use users.ratelimit.CacheRateLimiter with a shared CACHES alias on multi-node deployments.
+RATE_LIMITS = {
+    "BACKEND": "users.ratelimit.LocalRateLimiter",
+    "OPTIONS": {},
+    "RULES": {
+        "login": [
+            {"key": "ip", "limit": 30, "window": 60},
+            {"key": "identifier", "limit": 10, "window": 300},
+        ],
+        "signup": [{"key": "ip", "limit": 10, "window": 3600}],
+        "resend": [
+            {"key": "ip", "limit": 10, "window": 3600},
+            {"key": "email", "limit": 3, "window": 3600},
+        ],
+    },
+    # progressive lockout after repeated failed logins for one identifier
+    "LOCKOUT": {"THRESHOLD": 5, "WINDOW": 900, "BASE": 30, "MAX": 3600},
+    # reverse proxies that append to X-Forwarded-For; with 0, "ip" is REMOTE_ADDR and XFF is ignored
+    "NUM_PROXIES": 0,
+}
+
+# Deletion of consumed/expired tokens (users/purge.py); run `manage.py purge_tokens` from cron
+# or set INTERVAL (seconds) to purge in the background from web processes.
+TOKEN_PURGE = {
+    "INTERVAL": None,
+    "CHUNK_SIZE": 1000,
+    "PAUSE": 0.0,
+}
+
+# What every new organization starts with is defined by teams/provisioning.py DEFAULTS: the
+# system roles with their capabilities (teams/capabilities.py), the role its owner gets and a
+# "General" default team. Override keys here, e.g. {"DEFAULT_TEAM": None} to skip the team.
+ORG_PROVISIONING = {}
+
+# Team/role claims in access tokens (teams/claims.py). Opt-in: they grow every token.
+# Sets larger than MAX_BYTES are replaced by a stamp; see GET /api/teams/claims/.
+TOKEN_MEMBERSHIP_CLAIMS = {
+    "ENABLED": False,
+    "CLAIM": "mbr",
+    "MAX_BYTES": 1024,
+}
+
+# Asymmetric token signing (users/signing.py). With ALGORITHM unset tokens stay HS256
+# with SECRET_KEY. Keys are published at /.well-known/jwks.json; create them with
+# `manage.py generate_signing_key`.
+JWT_SIGNING = {
+    "ALGORITHM": None,   # "RS256", "ES256", "EdDSA"
+    "KEYS": [],
+    "ACTIVE_KID": None,
+    "JWKS_MAX_AGE": 3600,
 }
 
 from datetime import timedelta
@@ -17,9 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from users.views import JWKSView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(".well-known/jwks.json", JWKSView.as_view(), name="jwks"),
     
+    path("api/users/", include("users.urls")),
     path("api/teams/", include("teams.urls")),
 
 ]
\ No newline at end of file
@@ -20,7 +20,7 @@ class TeamAdmin(admin.ModelAdmin):
 
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
-    list_display = ("name", "org", "description", "is_system")
+    list_display = ("name", "org", "description", "is_system", "capability_names")
     search_fields = ("name", "org__name")
     list_filter = ("is_system", "org")
     ordering = ("org", "name")
@@ -0,0 +1,144 @@
+from django.db.models import CharField, Exists, IntegerField, OuterRef, Q, UUIDField, Value
+
+from .cache import EffectivePermissions, get_permission_cache
+from .capabilities import MEMBERSHIP_CAPABILITIES, Capability
+from .models import Organization, Team, TeamMembership
+
+
+class AuthzContext:
+    """
+    Request-scoped view of what the caller belongs to.
+    Active memberships (with role names and capability bitmasks) and owned org ids are loaded together
+    in a single query the first time they are needed, then memoized.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._loaded = False
+        self._team_roles = {}   # team_id -> role name (None when no role)
+        self._team_caps = {}    # team_id -> Capability bitmask of the membership
+        self._owned_org_ids = set()
+        self._team_perms = {}   # team_id -> EffectivePermissions seen this request
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.user or not self.user.is_authenticated:
+            return
+        # (org_id, team_id, role_name, capabilities); owned orgs come back with team_id NULL.
+        # Always read from the primary, also while the request's reads go to a replica
+        # (project_mgmt/dbrouting.py): the result ends up in the cross-request permission
+        # cache under the org's current version, so a lagging replica must not supply it.
+        memberships = TeamMembership.objects.using("default").filter(
+            user_id=self.user.id, left_at__isnull=True
+        ).values_list("team__org_id", "team_id", "role__name", "role__capabilities")
+        owned = Organization.objects.using("default").filter(owner_id=self.user.id).annotate(
+            _team_id=Value(None, output_field=UUIDField()),
+            _role_name=Value(None, output_field=CharField()),
+            _capabilities=Value(None, output_field=IntegerField()),
+        ).values_list("id", "_team_id", "_role_name", "_capabilities")
+        for org_id, team_id, role_name, capabilities in memberships.union(owned, all=True):
+            if team_id is None:
+                self._owned_org_ids.add(org_id)
+            else:
+                self._team_roles[team_id] = role_name
+                self._team_caps[team_id] = (capabilities or 0) | MEMBERSHIP_CAPABILITIES
+
+    @property
+    def owned_org_ids(self) -> set:
+        self._load()
+        return self._owned_org_ids
+
+    def is_org_owner(self, org_id) -> bool:
+        return org_id is not None and org_id in self.owned_org_ids
+
+    def is_member(self, team_id) -> bool:
+        self._load()
+        return team_id in self._team_roles
+
+    def team_role(self, team_id):
+        self._load()
+        return self._team_roles.get(team_id)
+
+    def team_capabilities(self, team_id, org_id) -> int:
+        if self.is_org_owner(org_id):
+            return Capability.all()
+        self._load()
+        return self._team_caps.get(team_id, 0)
+
+    def can(self, team_id, org_id, capability) -> bool:
+        return self.team_permissions(team_id, org_id).can(capability)
+
+    def team_permissions(self, team_id, org_id) -> EffectivePermissions:
+        """
+        Effective permissions on one team. Served from the cross-request
+        permission cache when possible so object checks skip the DB entirely.
+        """
+        perms = self._team_perms.get(team_id)
+        if perms is not None:
+            return perms
+        cache = get_permission_cache()
+        user_id = getattr(self.user, "id", None)
+        if self._loaded or cache is None or user_id is None:
+            perms = self._resolve(team_id, org_id)
+        else:
+            perms, version = cache.get(user_id, team_id, org_id)
+            if perms is None:
+                perms = self._resolve(team_id, org_id)
+                cache.set(user_id, team_id, org_id, perms, version)
+        self._team_perms[team_id] = perms
+        return perms
+
+    def _resolve(self, team_id, org_id) -> EffectivePermissions:
+        return EffectivePermissions(
+            is_org_owner=self.is_org_owner(org_id),
+            is_member=self.is_member(team_id),
+            role=self.team_role(team_id),
+            capabilities=int(self.team_capabilities(team_id, org_id)),
+        )
+
+
+def get_authz(request) -> AuthzContext:
+    """Return the AuthzContext attached to this request, creating it on first use."""
+    ctx = getattr(request, "_teams_authz", None)
+    if ctx is None or ctx.user is not request.user:
+        ctx = AuthzContext(request.user)
+        request._teams_authz = ctx
+    return ctx
+
+
+def _active_memberships(user):
+    return TeamMembership.objects.filter(user_id=user.id, left_at__isnull=True)
+
+
+def visible_teams(user, queryset=None):
+    """Teams the user can see: member of the team, or owner of its org. Single pass, no UNION."""
+    queryset = Team.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        Q(org__owner_id=user.id)
+        | Exists(_active_memberships(user).filter(team_id=OuterRef("pk")))
+    )
+
+
+def visible_organizations(user, queryset=None):
+    """Orgs the user owns or has an active membership in, as one filtered query."""
+    queryset = Organization.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        Q(owner_id=user.id)
+        | Exists(_active_memberships(user).filter(team__org_id=OuterRef("pk")))
+    )
+
+
+def teams_with_capability(user, capability, queryset=None):
+    """
+    Teams where the user holds every bit of `capability`: owner of the org, or
+    an active member whose role grants it. The bit test runs in SQL, so this
+    composes with pagination and other filters like visible_teams().
+    """
+    queryset = Team.objects.all() if queryset is None else queryset
+    memberships = _active_memberships(user).filter(team_id=OuterRef("pk"))
+    role_bits = int(Capability(capability) & ~MEMBERSHIP_CAPABILITIES)
+    if role_bits:
+        memberships = memberships.filter(role__capabilities__has=role_bits)
+    return queryset.filter(Q(org__owner_id=user.id) | Exists(memberships))
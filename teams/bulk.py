@@ -0,0 +1,123 @@
+"""
+Bulk membership operations for a single team.
+
+Each function takes the already-authorized team and a list of request items
+({"user": <id>, "role": <id or null>}), validates every user/role id with one
+query each, writes through bulk_create / bulk_update / a single DELETE, and
+returns one result dict per item in request order. Callers wrap them in a
+transaction and `deferred_org_bump` (see teams/signals.py).
+"""
+from users.models import User
+from .models import Role, Team, TeamMembership
+from .utils import parse_uuid
+
+
+class _Batch:
+    """Parsed items plus per-item results, keyed by position in the request."""
+
+    def __init__(self, items, with_role: bool):
+        self.results = [None] * len(items)
+        self.rows = []  # (index, user_id, role_id)
+        seen = set()
+        for i, item in enumerate(items):
+            raw_user = item.get("user") if isinstance(item, dict) else None
+            user_id = parse_uuid(raw_user)
+            if user_id is None:
+                self.fail(i, raw_user, "invalid user id")
+                continue
+            if user_id in seen:
+                self.fail(i, raw_user, "duplicate user in request")
+                continue
+            seen.add(user_id)
+            role_id = None
+            if with_role and item.get("role"):
+                role_id = parse_uuid(item["role"])
+                if role_id is None:
+                    self.fail(i, raw_user, "invalid role id")
+                    continue
+            self.rows.append((i, user_id, role_id))
+
+    def ok(self, index, user_id, result: str):
+        self.results[index] = {"user": str(user_id), "ok": True, "result": result}
+
+    def fail(self, index, user_id, detail: str):
+        self.results[index] = {"user": str(user_id) if user_id is not None else None, "ok": False, "detail": detail}
+
+    def valid_roles(self, team: Team) -> dict:
+        role_ids = {role_id for _, _, role_id in self.rows if role_id}
+        if not role_ids:
+            return {}
+        return {r.id: r for r in Role.objects.filter(id__in=role_ids, org_id=team.org_id)}
+
+    def memberships(self, team: Team) -> dict:
+        user_ids = [user_id for _, user_id, _ in self.rows]
+        return {m.user_id: m for m in TeamMembership.objects.filter(team=team, user_id__in=user_ids)}
+
+
+def bulk_add_members(team: Team, items: list, invited_by_id) -> list:
+    batch = _Batch(items, with_role=True)
+    known_users = set(User.objects.filter(id__in=[u for _, u, _ in batch.rows]).values_list("id", flat=True))
+    roles = batch.valid_roles(team)
+    existing = batch.memberships(team)
+
+    to_create, to_reactivate = [], []
+    for i, user_id, role_id in batch.rows:
+        if user_id not in known_users:
+            batch.fail(i, user_id, "user not found")
+        elif role_id and role_id not in roles:
+            batch.fail(i, user_id, "role must belong to the same organization")
+        elif user_id in existing and existing[user_id].left_at is None:
+            batch.fail(i, user_id, "already a member")
+        elif user_id in existing:
+            m = existing[user_id]
+            m.left_at, m.role_id, m.invited_by_id = None, role_id, invited_by_id
+            to_reactivate.append(m)
+            batch.ok(i, user_id, "reactivated")
+        else:
+            to_create.append(TeamMembership(team=team, user_id=user_id, role_id=role_id, invited_by_id=invited_by_id))
+            batch.ok(i, user_id, "added")
+
+    TeamMembership.objects.bulk_create(to_create)
+    if to_reactivate:
+        TeamMembership.objects.bulk_update(to_reactivate, ["left_at", "role", "invited_by"])
+    return batch.results
+
+
+def bulk_set_roles(team: Team, items: list) -> list:
+    batch = _Batch(items, with_role=True)
+    roles = batch.valid_roles(team)
+    existing = batch.memberships(team)
+
+    to_update = []
+    for i, user_id, role_id in batch.rows:
+        m = existing.get(user_id)
+        if m is None or m.left_at is not None:
+            batch.fail(i, user_id, "not a member")
+        elif role_id and role_id not in roles:
+            batch.fail(i, user_id, "role must belong to the same organization")
+        else:
+            m.role_id = role_id
+            to_update.append(m)
+            batch.ok(i, user_id, "updated")
+
+    if to_update:
+        TeamMembership.objects.bulk_update(to_update, ["role"])
+    return batch.results
+
+
+def bulk_remove_members(team: Team, items: list) -> list:
+    batch = _Batch(items, with_role=False)
+    existing = batch.memberships(team)
+
+    to_delete = []
+    for i, user_id, _ in batch.rows:
+        m = existing.get(user_id)
+        if m is None or m.left_at is not None:
+            batch.fail(i, user_id, "not a member")
+        else:
+            to_delete.append(m.id)
+            batch.ok(i, user_id, "removed")
+
+    if to_delete:
+        TeamMembership.objects.filter(id__in=to_delete).delete()
+    return batch.results
@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from project_mgmt.caching import is_process_local, require_shared
+
+
+class EffectivePermissions(NamedTuple):
+    """What a user may do on one team, as resolved by AuthzContext."""
+    is_org_owner: bool
+    is_member: bool
+    role: Optional[str]
+    capabilities: int = 0   # Capability bitmask; org owners hold every bit
+
+    def can(self, capability) -> bool:
+        return (self.capabilities & capability) == capability
+
+
+class CacheLookup(NamedTuple):
+    perms: Optional[EffectivePermissions]   # None on a miss
+    version: int                            # org version seen by the lookup; hand it back to set()
+
+
+class BasePermissionCache:
+    """
+    Effective permissions keyed by (user, team), validated against a per-org
+    version counter. Writes to memberships, roles, teams or orgs bump the
+    org's version (see teams/signals.py), which invalidates every entry for
+    that org without having to find them.
+
+    On a miss, resolve the permissions and pass the version returned by get()
+    to set(): an entry is only ever stored under the version read before the
+    memberships were, so a bump landing in between leaves it stale, not current.
+    """
+    shared = False  # whether versions are the same in every process (safe to put in ETags)
+
+    def __init__(self, max_entries=10000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id, team_id, org_id) -> CacheLookup:
+        raise NotImplementedError
+
+    def set(self, user_id, team_id, org_id, perms: EffectivePermissions, version: int):
+        raise NotImplementedError
+
+    def bump_org(self, org_id):
+        raise NotImplementedError
+
+    def org_versions(self, org_ids) -> dict:
+        """Current version counter of each org (0 for orgs never bumped)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @property
+    def process_local(self) -> bool:
+        """Whether invalidations made in one process go unseen by the others."""
+        return not self.shared
+
+    def _record(self, perms, version) -> CacheLookup:
+        if perms is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return CacheLookup(perms, version)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,   # org version bumps made by this process
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+class LocalPermissionCache(BasePermissionCache):
+    """
+    In-process LRU for a single web process: versions are bumped only by writes
+    made in this process, so entries also expire after `timeout` seconds.
+    """
+
+    def __init__(self, max_entries=10000, timeout=300):
+        super().__init__(max_entries=max_entries, timeout=timeout)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, team_id) -> (org_version, expires_at, perms)
+        self._versions = {}
+
+    def get(self, user_id, team_id, org_id):
+        key = (user_id, team_id)
+        with self._lock:
+            version = self._versions.get(org_id, 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                return self._record(entry[2], version)
+            if entry is not None:
+                del self._entries[key]
+        return self._record(None, version)
+
+    def set(self, user_id, team_id, org_id, perms, version):
+        key = (user_id, team_id)
+        expires_at = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            if version != self._versions.get(org_id, 0):
+                return  # the org changed while perms were resolved
+            self._entries[key] = (version, expires_at, perms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump_org(self, org_id):
+        with self._lock:
+            self._versions[org_id] = self._versions.get(org_id, 0) + 1
+            self.invalidations += 1
+
+    def org_versions(self, org_ids):
+        with self._lock:
+            return {org_id: self._versions.get(org_id, 0) for org_id in org_ids}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self):
+        data = super().stats()
+        data["entries"] = len(self._entries)
+        return data
+
+
+class DjangoPermissionCache(BasePermissionCache):
+    """
+    Shared across nodes through a Django cache alias. Eviction is left to the
+    cache backend (MAX_ENTRIES for locmem/db, LRU for memcached/redis).
+    """
+    shared = True
+
+    def __init__(self, alias="default", key_prefix="teams:perm", max_entries=10000, timeout=300):
+        super().__init__(max_entries=max_entries, timeout=timeout)
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def _entry_key(self, user_id, team_id):
+        return f"{self.key_prefix}:{user_id}:{team_id}"
+
+    @property
+    def process_local(self):
+        return is_process_local(self.alias)
+
+    def _version_key(self, org_id):
+        return f"{self.key_prefix}:v:{org_id}"
+
+    def get(self, user_id, team_id, org_id):
+        entry_key, version_key = self._entry_key(user_id, team_id), self._version_key(org_id)
+        found = self._cache.get_many([entry_key, version_key])
+        entry, version = found.get(entry_key), found.get(version_key, 0)
+        # entries written before a field was added to EffectivePermissions count as misses
+        if entry is not None and entry[0] == version and len(entry[1]) == len(EffectivePermissions._fields):
+            return self._record(EffectivePermissions(*entry[1]), version)
+        return self._record(None, version)
+
+    def set(self, user_id, team_id, org_id, perms, version):
+        # stored under the version read before resolving; a later bump makes it a miss
+        self._cache.set(self._entry_key(user_id, team_id), (version, tuple(perms)), self.timeout)
+
+    def bump_org(self, org_id):
+        self.invalidations += 1
+        key = self._version_key(org_id)
+        # versions never expire, otherwise an old entry could match a reset counter
+        if not self._cache.add(key, 1, timeout=None):
+            try:
+                self._cache.incr(key)
+            except ValueError:
+                self._cache.set(key, 1, timeout=None)
+
+    def org_versions(self, org_ids):
+        keys = {self._version_key(org_id): org_id for org_id in org_ids}
+        found = self._cache.get_many(list(keys))
+        return {org_id: found.get(key, 0) for key, org_id in keys.items()}
+
+    def clear(self):
+        self._cache.clear()
+
+
+_permission_cache = None
+
+
+def get_permission_cache() -> Optional[BasePermissionCache]:
+    """Return the configured cache, or None when TEAMS_PERMISSION_CACHE is unset/disabled."""
+    global _permission_cache
+    if _permission_cache is None:
+        config = getattr(settings, "TEAMS_PERMISSION_CACHE", None)
+        if not config:
+            return None
+        backend = import_string(config["BACKEND"])
+        _permission_cache = backend(**config.get("OPTIONS", {}))
+    return _permission_cache
+
+
+def check_permission_cache():
+    """Refuse to start with a per-process permission cache behind several web processes."""
+    cache = get_permission_cache()
+    if cache is not None:
+        require_shared(f"TEAMS_PERMISSION_CACHE ({type(cache).__name__})", cache.process_local)
+
+
+@receiver(setting_changed)
+def _reset_permission_cache(setting, **kwargs):
+    global _permission_cache
+    if setting == "TEAMS_PERMISSION_CACHE":
+        _permission_cache = None
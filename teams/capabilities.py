@@ -0,0 +1,81 @@
+"""
+Role capabilities as an integer bitmask.
+
+Each Role stores the OR of the capabilities it grants in `Role.capabilities`,
+so a permission check is a single bitwise test and "teams where I can X" can
+be filtered in SQL with the `has` lookup:
+
+    TeamMembership.objects.filter(role__capabilities__has=Capability.WRITE)
+    ->  ("teams_role"."capabilities" & 2) = 2
+
+Bits are stored in the database: never renumber them, only append.
+"""
+import enum
+
+from django.db import models
+
+
+class Capability(enum.IntFlag):
+    VIEW = 1 << 0             # read the team and its members
+    WRITE = 1 << 1            # create/edit the team's content (tasks, projects)
+    EDIT_TEAM = 1 << 2        # rename, describe, archive the team
+    MANAGE_MEMBERS = 1 << 3   # add/remove members and set their roles
+    DELETE_TEAM = 1 << 4
+    MANAGE_ROLES = 1 << 5     # define the org's custom roles
+
+    @classmethod
+    def all(cls) -> "Capability":
+        mask = cls(0)
+        for member in cls:
+            mask |= member
+        return mask
+
+    @classmethod
+    def parse(cls, value) -> "Capability":
+        """An int, a name ("write") or an iterable of names -> Capability."""
+        if isinstance(value, int):
+            return cls(value) & cls.all()
+        if isinstance(value, str):
+            value = [value]
+        mask = cls(0)
+        for name in value:
+            try:
+                mask |= cls[str(name).strip().upper()]
+            except KeyError:
+                raise ValueError(f"unknown capability {name!r}")
+        return mask
+
+    @classmethod
+    def names(cls, mask) -> list:
+        return [member.name.lower() for member in cls if mask & member]
+
+
+# What the built-in roles grant; used to seed new orgs (teams/provisioning.py)
+# and to backfill roles created before capabilities existed.
+SYSTEM_ROLE_CAPABILITIES = {
+    "Owner": Capability.all(),
+    "Manager": (Capability.VIEW | Capability.WRITE | Capability.EDIT_TEAM
+                | Capability.MANAGE_MEMBERS | Capability.DELETE_TEAM),
+    "Member": Capability.VIEW | Capability.WRITE,
+    "Viewer": Capability.VIEW,
+}
+
+# An active membership lets the user see the team even without a role.
+MEMBERSHIP_CAPABILITIES = Capability.VIEW
+
+
+class CapabilityField(models.PositiveIntegerField):
+    """Capability bitmask column; supports `field__has=<mask>` (all bits set)."""
+
+
+@CapabilityField.register_lookup
+class HasCapabilities(models.Lookup):
+    lookup_name = "has"
+
+    def get_prep_lookup(self):
+        return int(self.rhs)
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"({lhs} & {rhs}) = {rhs}", [*lhs_params, *rhs_params, *rhs_params]
@@ -0,0 +1,101 @@
+"""
+Compact membership claims for access tokens (opt-in, settings.TOKEN_MEMBERSHIP_CLAIMS).
+
+With ENABLED, login and refresh embed one claim (CLAIM, default "mbr") so
+downstream services can authorize without calling back:
+
+    {"v": "<stamp>", "t": {"<team id>": <capability bitmask>, ...}, "o": ["<owned org id>", ...]}
+
+Ids are base64url UUID bytes (22 characters instead of 36); bitmasks are
+teams/capabilities.py values, VIEW included for every active membership.
+When the encoded claim would exceed MAX_BYTES only {"v": "<stamp>"} is
+embedded, and callers fetch the full set from GET /api/teams/claims/ once per
+stamp. The stamp is a digest of the full set, so refresh re-encodes the
+claim only when the user's memberships actually changed.
+"""
+import base64
+import hashlib
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import CharField, IntegerField, Value
+
+from .capabilities import MEMBERSHIP_CAPABILITIES
+from .models import Organization, TeamMembership
+
+DEFAULTS = {
+    "ENABLED": False,
+    "CLAIM": "mbr",
+    "MAX_BYTES": 1024,   # encoded JSON size of the claim; larger sets fall back to the stamp
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "TOKEN_MEMBERSHIP_CLAIMS", {})}
+
+
+def is_enabled() -> bool:
+    return bool(get_config()["ENABLED"])
+
+
+def encode_id(value) -> str:
+    return base64.urlsafe_b64encode(uuid.UUID(str(value)).bytes).rstrip(b"=").decode()
+
+
+def decode_id(value: str) -> uuid.UUID:
+    return uuid.UUID(bytes=base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+
+
+def _rows(user_id):
+    # ("t", team_id, role capabilities) per active membership, ("o", org_id, NULL) per owned org
+    memberships = TeamMembership.objects.filter(user_id=user_id, left_at__isnull=True).annotate(
+        _kind=Value("t", output_field=CharField()),
+    ).values_list("_kind", "team_id", "role__capabilities")
+    owned = Organization.objects.filter(owner_id=user_id).annotate(
+        _kind=Value("o", output_field=CharField()),
+        _capabilities=Value(None, output_field=IntegerField()),
+    ).values_list("_kind", "id", "_capabilities")
+    return memberships.union(owned, all=True)
+
+
+def _build(rows) -> dict:
+    teams, orgs = {}, []
+    for kind, target_id, capabilities in rows:
+        if kind == "t":
+            teams[encode_id(target_id)] = int((capabilities or 0) | MEMBERSHIP_CAPABILITIES)
+        else:
+            orgs.append(encode_id(target_id))
+    body = {"t": dict(sorted(teams.items())), "o": sorted(orgs)}
+    digest = hashlib.blake2b(json.dumps(body, separators=(",", ":")).encode(), digest_size=9).digest()
+    return {"v": base64.urlsafe_b64encode(digest).decode(), **body}
+
+
+def _fit(claims: dict) -> dict:
+    size = len(json.dumps(claims, separators=(",", ":")))
+    return claims if size <= get_config()["MAX_BYTES"] else {"v": claims["v"]}
+
+
+def full_claims(user_id) -> dict:
+    """Every membership, whatever its size (one query)."""
+    return _build(_rows(user_id))
+
+
+def token_claims(user_id) -> dict:
+    """The claim to embed: the full set when it fits MAX_BYTES, else just the stamp."""
+    return _fit(full_claims(user_id))
+
+
+async def atoken_claims(user_id) -> dict:
+    return _fit(_build(await sync_to_async(list)(_rows(user_id))))
+
+
+def refresh_claims(token, claims: dict) -> bool:
+    """Put `claims` on a token; False when it already carries the same stamp."""
+    name = get_config()["CLAIM"]
+    current = token.get(name)
+    if isinstance(current, dict) and current.get("v") == claims["v"]:
+        return False
+    token[name] = claims
+    return True
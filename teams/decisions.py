@@ -0,0 +1,136 @@
+"""
+Batched authorization decisions for downstream services.
+
+A batch of checks ({"user": <id>, "team": <id> | "org": <id>, "action": <capability>})
+is answered with a fixed number of queries, whatever its size:
+
+    teams asked about -> org and org owner      1 query
+    orgs asked about directly -> owner          1 query (skipped when none)
+    active memberships with role capabilities   1 query
+
+Actions are capability names (teams/capabilities.py). On a team, a member holds
+their role's capabilities plus VIEW; on an org, the union over their teams in
+it. Org owners hold every capability on both.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .capabilities import MEMBERSHIP_CAPABILITIES, Capability
+from .models import Organization, Team, TeamMembership
+from .utils import parse_uuid
+
+
+class DecisionBatch:
+    """Parsed checks plus one result dict per check, in request order."""
+
+    def __init__(self, items, caller=None):
+        self.results = [None] * len(items)
+        self.rows = []          # (index, user_id, kind, target_id, capability)
+        self.team_orgs = {}     # team_id -> org_id
+        self.org_owners = {}    # org_id -> owner_id
+        self._loaded = False
+        may_ask_for_others = caller is None or caller.is_staff
+        for i, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            kind = "team" if item.get("team") is not None else "org"
+            echo = {"user": item.get("user"), kind: item.get(kind), "action": item.get("action")}
+            user_id, target_id = parse_uuid(item.get("user")), parse_uuid(item.get(kind))
+            if user_id is None:
+                self.fail(i, echo, "invalid user id")
+            elif target_id is None:
+                self.fail(i, echo, "invalid team or org id")
+            elif not may_ask_for_others and user_id != caller.id:
+                self.fail(i, echo, "only staff may check other users")
+            else:
+                try:
+                    capability = Capability.parse(item.get("action") or [])
+                except (TypeError, ValueError):
+                    capability = None
+                if not capability:
+                    self.fail(i, echo, "unknown action")
+                    continue
+                self.results[i] = echo
+                self.rows.append((i, user_id, kind, target_id, capability))
+
+    def fail(self, index, echo, detail: str):
+        self.results[index] = {**echo, "allowed": False, "detail": detail}
+
+    def load_targets(self):
+        """Resolve every team to its org and every org to its owner (1-2 queries)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        team_ids = {target for _, _, kind, target, _ in self.rows if kind == "team"}
+        org_ids = {target for _, _, kind, target, _ in self.rows if kind == "org"}
+        if team_ids:
+            for team_id, org_id, owner_id in Team.objects.filter(id__in=team_ids).values_list(
+                "id", "org_id", "org__owner_id"
+            ):
+                self.team_orgs[team_id] = org_id
+                self.org_owners[org_id] = owner_id
+        org_ids -= set(self.org_owners)
+        if org_ids:
+            self.org_owners.update(Organization.objects.filter(id__in=org_ids).values_list("id", "owner_id"))
+
+    @property
+    def org_ids(self) -> set:
+        self.load_targets()
+        return set(self.org_owners)
+
+    @property
+    def all_found(self) -> bool:
+        """Every team/org asked about exists (a missing one would not show up in org versions)."""
+        self.load_targets()
+        return all(
+            (self.team_orgs.get(target) if kind == "team" else target) in self.org_owners
+            for _, _, kind, target, _ in self.rows
+        )
+
+    def cache_key(self) -> str:
+        """Stable digest of the checks, for ETags that also depend on org versions."""
+        rows = sorted((str(u), kind, str(t), int(c)) for _, u, kind, t, c in self.rows)
+        failed = sorted(json.dumps(r, sort_keys=True, default=str) for r in self.results if r and "detail" in r)
+        return hashlib.blake2b(json.dumps([rows, failed]).encode(), digest_size=16).hexdigest()
+
+    def resolve(self) -> list:
+        self.load_targets()
+        checks = []
+        team_members, org_members = defaultdict(set), defaultdict(set)
+        for i, user_id, kind, target_id, capability in self.rows:
+            org_id = self.team_orgs.get(target_id) if kind == "team" else target_id
+            if org_id not in self.org_owners:
+                self.fail(i, self.results[i], f"{kind} not found")
+                continue
+            checks.append((i, user_id, kind, target_id, org_id, capability))
+            if self.org_owners[org_id] != user_id:
+                (team_members if kind == "team" else org_members)[target_id].add(user_id)
+
+        granted = self._membership_capabilities(team_members, org_members)
+        for i, user_id, kind, target_id, org_id, capability in checks:
+            if self.org_owners[org_id] == user_id:
+                held = Capability.all()
+            else:
+                held = granted.get((user_id, kind, target_id), 0)
+            self.results[i]["allowed"] = (held & capability) == capability
+        return self.results
+
+    @staticmethod
+    def _membership_capabilities(team_members, org_members) -> dict:
+        """(user_id, "team"|"org", target_id) -> capability bitmask, in one query."""
+        if not team_members and not org_members:
+            return {}
+        user_ids = set().union(*team_members.values(), *org_members.values())
+        memberships = TeamMembership.objects.filter(user_id__in=user_ids, left_at__isnull=True).filter(
+            Q(team_id__in=list(team_members)) | Q(team__org_id__in=list(org_members))
+        ).values_list("user_id", "team_id", "team__org_id", "role__capabilities")
+        granted = defaultdict(int)
+        for user_id, team_id, org_id, capabilities in memberships:
+            held = (capabilities or 0) | MEMBERSHIP_CAPABILITIES
+            if user_id in team_members.get(team_id, ()):
+                granted[(user_id, "team", team_id)] |= held
+            if user_id in org_members.get(org_id, ()):
+                granted[(user_id, "org", org_id)] |= held
+        return granted
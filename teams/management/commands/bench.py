@@ -0,0 +1,200 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from teams.models import Organization, Team, TeamMembership
+from teams.provisioning import provision_organizations
+from teams.signals import bump_org_version
+from users.benchmarking import (
+    PASSWORD, Sample, login_bodies, percentiles, run_wsgi, seed_users, unthrottled, verification_bodies,
+)
+from users.models import EmailOutbox, User
+from users.serializers import LoginTokenObtainPairSerializer
+
+# endpoint -> (method, url name, sends the owner's access token)
+ENDPOINTS = {
+    "signup": ("post", "users:signup", False),
+    "login": ("post", "users:login", False),
+    "verify-email": ("post", "users:verify-email", False),
+    "team-list": ("get", "team-list", True),
+    "members": ("get", "team-members", True),
+    "add-member": ("post", "team-add-member", True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset (accounts, one org with teams and members), drive the auth and team "
+        "endpoints at each concurrency level and report req/s, p50/p95/p99 latency, queries and CPU "
+        "time per request. Runs the app in-process (WSGI, one thread per in-flight request) unless "
+        "--server is given; against a server, queries and CPU are not observable and its rate limits "
+        "apply. CPU is this process's and excludes PASSWORD_HASHING_POOL workers. The dataset is "
+        "written to the configured database and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=list(ENDPOINTS), action="append",
+                            help="Endpoint to benchmark; repeatable (default: all).")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50],
+                            help="Concurrency levels, requests in flight at once (default: 1 10 50).")
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Requests per endpoint and concurrency level (default: 200).")
+        parser.add_argument("--users", type=int, default=20, help="Seeded accounts to spread logins over (default: 20).")
+        parser.add_argument("--teams", type=int, default=20, help="Teams in the seeded org (default: 20).")
+        parser.add_argument("--members", type=int, default=100,
+                            help="Members of the benchmarked team (default: 100).")
+        parser.add_argument("--server", metavar="URL",
+                            help="Base URL of a running server sharing this database, e.g. http://127.0.0.1:8000.")
+        parser.add_argument("--output", metavar="PATH", help="Write the results as JSON ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        n = max(1, options["requests"])
+        levels = sorted({max(1, c) for c in options["concurrency"]})
+        endpoints = options["endpoint"] or list(ENDPOINTS)
+        server = options["server"].rstrip("/") if options["server"] else None
+        self.prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        dataset = {"users": max(1, options["users"]), "teams": max(1, options["teams"]),
+                   "members": max(0, options["members"])}
+
+        results = []
+        try:
+            self._seed(**dataset)
+            # signup mail is queued in the outbox as usual but not delivered
+            with unthrottled(), override_settings(EMAIL_BACKEND="django.core.mail.backends.dummy.EmailBackend"):
+                for endpoint in endpoints:
+                    for concurrency in levels:
+                        requests = self._requests(endpoint, n, concurrency)
+                        run = self._run_server if server else self._run_in_process
+                        cpu, started = time.process_time(), time.perf_counter()
+                        samples = run(server, requests, concurrency)
+                        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+                        result = self._summarize(endpoint, concurrency, samples, elapsed, None if server else cpu)
+                        results.append(result)
+                        self._report(result)
+        finally:
+            self._cleanup()
+
+        if options["output"]:
+            document = json.dumps({
+                "started_at": timezone.now().isoformat(),
+                "target": server or "in-process",
+                "database": connection.vendor,
+                "dataset": dataset,
+                "requests_per_level": n,
+                "results": results,
+            }, indent=2)
+            if options["output"] == "-":
+                self.stdout.write(document)
+            else:
+                with open(options["output"], "w") as fh:
+                    fh.write(document + "\n")
+
+    # ---- dataset ----
+    def _seed(self, users, teams, members):
+        self.owner = seed_users(f"{self.prefix}-owner", 1, password=None)[0]
+        self.accounts = seed_users(f"{self.prefix}-account", users)
+        provisioned = provision_organizations([{"name": self.prefix, "owner_id": self.owner.id}])[0]
+        if provisioned.team is None:
+            raise CommandError("ORG_PROVISIONING must create a default team to benchmark members.")
+        self.team, self.role = provisioned.team, provisioned.roles.get("Member")
+        Team.objects.bulk_create([
+            Team(org=provisioned.org, name=f"team-{i}", created_by=self.owner) for i in range(1, teams)
+        ])
+        TeamMembership.objects.bulk_create([
+            TeamMembership(team=self.team, user=user, role=self.role)
+            for user in seed_users(f"{self.prefix}-member", members, password=None)
+        ])
+        bump_org_version(provisioned.org.id)  # bulk_create sends no signals
+        token = LoginTokenObtainPairSerializer.get_token(self.owner).access_token
+        self.authorization = f"Bearer {token}"
+
+    def _requests(self, endpoint, n, concurrency):
+        """(method, path, body, headers) for n requests; anything they consume is created up front."""
+        method, name, auth = ENDPOINTS[endpoint]
+        headers = {"Authorization": self.authorization} if auth else {}
+        path = reverse(name, args=[self.team.id]) if endpoint in ("members", "add-member") else reverse(name)
+
+        if endpoint == "signup":
+            tag = f"{self.prefix}-signup-{concurrency}"
+            bodies = [{"username": f"{tag}-{i}", "email": f"{tag}-{i}@bench.invalid", "password": PASSWORD}
+                      for i in range(n)]
+        elif endpoint == "login":
+            bodies = login_bodies(self.accounts, n)
+        elif endpoint == "verify-email":
+            bodies = verification_bodies(self.accounts, n)
+        elif endpoint == "add-member":
+            role = str(self.role.id) if self.role else None
+            outsiders = seed_users(f"{self.prefix}-outsider-{concurrency}", n, password=None)
+            bodies = [{"team": str(self.team.id), "user": str(user.id), "role": role} for user in outsiders]
+        else:
+            bodies = [None] * n
+        return [(method, path, body, headers) for body in bodies]
+
+    def _cleanup(self):
+        Organization.objects.filter(name=self.prefix).delete()
+        User.objects.filter(username__startswith=self.prefix).delete()
+        EmailOutbox.objects.filter(to_email__startswith=self.prefix).delete()
+
+    # ---- runners: each returns [Sample] ----
+    @staticmethod
+    def _run_in_process(server, requests, concurrency):
+        return run_wsgi(requests, concurrency)
+
+    @staticmethod
+    def _run_server(server, requests, concurrency):
+        def one(request):
+            method, path, body, headers = request
+            data = json.dumps(body).encode() if body is not None else None
+            req = urllib.request.Request(server + path, data=data, method=method.upper(),
+                                         headers={**headers, "Content-Type": "application/json"})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req) as response:
+                    response.read()
+                    ok = response.status < 400
+            except urllib.error.HTTPError as exc:
+                exc.read()
+                ok = False
+            except urllib.error.URLError as exc:
+                raise CommandError(f"Cannot reach {server}: {exc.reason}")
+            return Sample(time.perf_counter() - started, ok, None)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(one, requests))
+
+    # ---- reporting ----
+    @staticmethod
+    def _summarize(endpoint, concurrency, samples, elapsed, cpu) -> dict:
+        cuts = percentiles([s.seconds for s in samples])
+        queries = [s.queries for s in samples if s.queries is not None]
+        return {
+            "endpoint": endpoint,
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "errors": sum(1 for s in samples if not s.ok),
+            "req_per_s": round(len(samples) / elapsed, 1),
+            **{f"{name}_ms": round(value * 1000, 2) for name, value in cuts.items()},
+            # None against a server: its queries and CPU are not visible from here
+            "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+            "cpu_ms_per_request": round(cpu * 1000 / len(samples), 2) if cpu is not None else None,
+        }
+
+    def _report(self, r):
+        extra = ""
+        if r["queries_per_request"] is not None:
+            extra = f"  {r['queries_per_request']:5.1f} q/req  cpu {r['cpu_ms_per_request']:6.2f}ms/req"
+        self.stdout.write(
+            f"{r['endpoint']:<13} c={r['concurrency']:<4} {r['req_per_s']:8.1f} req/s  "
+            f"p50 {r['p50_ms']:7.1f}ms  p95 {r['p95_ms']:7.1f}ms  p99 {r['p99_ms']:7.1f}ms  "
+            f"errors {r['errors']}/{r['requests']}{extra}"
+        )
@@ -0,0 +1,116 @@
+import time
+import uuid
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.text import slugify
+
+from project_mgmt.rowfiles import detect_format, open_input, read_rows
+from teams.models import Organization
+from teams.provisioning import provision_organizations
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Provision organizations from CSV or JSONL (fields: name, slug, owner as email, username "
+        "or id). Each org gets the ORG_PROVISIONING roles, default team and owner membership; "
+        "each batch is one transaction with one bulk INSERT per table. Existing names/slugs are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="Input format (default: from the file extension, else csv).")
+        parser.add_argument("--batch-size", type=int, default=500, help="Organizations per transaction (default: 500).")
+        parser.add_argument("--owner", help="Owner (email, username or id) for rows without an owner column.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seen_names, self.seen_slugs = set(), set()
+        self.counts = {"provisioned": 0, "skipped": 0, "failed": 0}
+        started = time.perf_counter()
+
+        with open_input(options["path"]) as stream:
+            rows = read_rows(stream, detect_format(options["path"], options["format"]))
+            while batch := list(islice(rows, max(1, options["batch_size"]))):
+                specs = self._prepare(batch)
+                if specs:
+                    provision_organizations(specs)
+                self.counts["provisioned"] += len(specs)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{self.counts['provisioned']} provisioned, {self.counts['skipped']} skipped, "
+                    f"{self.counts['failed']} failed ({self.counts['provisioned'] / elapsed:.0f} orgs/s)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.counts['provisioned']} provisioned, {self.counts['skipped']} skipped, "
+            f"{self.counts['failed']} failed in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _fail(self, line_no, message):
+        self.counts["failed"] += 1
+        self.stderr.write(f"line {line_no}: {message}")
+
+    def _prepare(self, batch):
+        candidates = []
+        for line_no, row in batch:
+            if "_error" in row:
+                self._fail(line_no, row["_error"])
+                continue
+            name = str(row.get("name") or "").strip()
+            slug = slugify(str(row.get("slug") or "") or name)[:200]
+            owner = str(row.get("owner") or self.options["owner"] or "").strip()
+            if not name or not slug:
+                self._fail(line_no, "name is required")
+                continue
+            if name in self.seen_names or slug in self.seen_slugs:
+                self.counts["skipped"] += 1
+                continue
+            self.seen_names.add(name)
+            self.seen_slugs.add(slug)
+            candidates.append((line_no, name, slug, owner))
+
+        taken = set()
+        for name, slug in Organization.objects.filter(
+            Q(name__in=[c[1] for c in candidates]) | Q(slug__in=[c[2] for c in candidates])
+        ).values_list("name", "slug"):
+            taken.update((("name", name), ("slug", slug)))
+        owners = self._resolve_owners({c[3] for c in candidates if c[3]})
+
+        specs = []
+        for line_no, name, slug, owner in candidates:
+            if ("name", name) in taken or ("slug", slug) in taken:
+                self.counts["skipped"] += 1
+            elif owner and owner not in owners:
+                self._fail(line_no, f"owner {owner!r} not found")
+            else:
+                specs.append({"name": name, "slug": slug, "owner_id": owners.get(owner)})
+        return specs
+
+    @staticmethod
+    def _resolve_owners(refs) -> dict:
+        """owner reference (email, username or id) -> user id, in one query."""
+        if not refs:
+            return {}
+        ids = []
+        for ref in refs:
+            try:
+                ids.append(uuid.UUID(ref))
+            except ValueError:
+                pass
+        lowered = [ref.lower() for ref in refs]
+        resolved = {}
+        for user_id, username, email in User.objects.filter(
+            Q(id__in=ids) | Q(username__in=refs) | Q(email__in=lowered)
+        ).values_list("id", "username", "email"):
+            for key in (str(user_id), username, email):
+                resolved[key] = user_id
+        owners = {}
+        for ref in refs:
+            user_id = resolved.get(ref) or resolved.get(ref.lower())
+            if user_id is not None:
+                owners[ref] = user_id
+        return owners
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teammembership',
+            index=models.Index(condition=models.Q(('left_at__isnull', True)), fields=['user', 'team'], name='teams_tm_user_team_active_idx'),
+        ),
+    ]
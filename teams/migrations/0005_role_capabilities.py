@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:49
+
+import teams.capabilities
+from django.db import migrations
+
+# Frozen copy of SYSTEM_ROLE_CAPABILITIES at the time of this migration: roles
+# used to be checked by name, so existing roles keep what their name granted.
+ROLE_CAPABILITIES = {"Owner": 63, "Manager": 31, "Member": 3, "Viewer": 1}
+
+
+def backfill_capabilities(apps, schema_editor):
+    Role = apps.get_model("teams", "Role")
+    for name, mask in ROLE_CAPABILITIES.items():
+        Role.objects.filter(name=name).update(capabilities=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0004_teammembership_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='role',
+            name='capabilities',
+            field=teams.capabilities.CapabilityField(default=0),
+        ),
+        migrations.RunPython(backfill_capabilities, migrations.RunPython.noop),
+    ]
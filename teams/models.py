@@ -5,6 +5,8 @@ from django.utils.text import slugify
 from django.conf import settings
 from users.models import User
 
+from .capabilities import Capability, CapabilityField
+
 
 class Organization(models.Model):
     """
@@ -69,6 +71,8 @@ class Role(models.Model):
     Org-scoped role definition (distinct from Django Groups).
     Use for team/project scoping without touching global RBAC.
     Example names: 'Owner', 'Manager', 'Member', 'Viewer'.
+    What a role allows is the `capabilities` bitmask (teams/capabilities.py),
+    not its name.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     org = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="roles")
@@ -77,6 +81,14 @@ class Role(models.Model):
     is_system = models.BooleanField(
         default=False
     )  # seed defaults; protect from edits/deletes if you want
+    capabilities = CapabilityField(default=0)
+
+    def can(self, capability) -> bool:
+        return (self.capabilities & capability) == capability
+
+    @property
+    def capability_names(self) -> list:
+        return Capability.names(self.capabilities)
 
     class Meta:
         unique_together = (("org", "name"),)  # same role name can exist in different orgs
@@ -112,6 +124,18 @@ class TeamMembership(models.Model):
             models.Index(fields=["team", "user"]),
             models.Index(fields=["user"]),
             models.Index(fields=["role"]),
+            # visibility lookups: "active memberships of user U" probed per team
+            models.Index(
+                fields=["user", "team"],
+                condition=models.Q(left_at__isnull=True),
+                name="teams_tm_user_team_active_idx",
+            ),
+            # keyset pagination of a team's active members by (joined_at, id)
+            models.Index(
+                fields=["team", "joined_at", "id"],
+                condition=models.Q(left_at__isnull=True),
+                name="teams_tm_team_joined_idx",
+            ),
         ]
 
     def __str__(self):
@@ -1,42 +1,48 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from .models import Organization, Team, TeamMembership, Role
+from .models import Organization, Team
+from .authz import get_authz
+from .capabilities import Capability
 
-def _is_org_owner(user, org: Organization) -> bool:
-    return org and org.owner_id == user.id
+def _team_permissions(request, team: Team):
+    return get_authz(request).team_permissions(team.id, team.org_id)
 
-def _team_membership(user, team: Team):
-    if not user or not team:
-        return None
-    return TeamMembership.objects.select_related("role").filter(team=team, user=user, left_at__isnull=True).first()
+def _is_org_owner(request, team: Team) -> bool:
+    return bool(team) and _team_permissions(request, team).is_org_owner
 
-def _has_team_role(user, team: Team, allowed: set[str]) -> bool:
-    m = _team_membership(user, team)
-    return bool(m and m.role and m.role.name in allowed)
+def _team_membership(request, team: Team) -> bool:
+    return bool(team) and _team_permissions(request, team).is_member
+
+def _has_capability(request, team: Team, capability) -> bool:
+    return bool(team) and _team_permissions(request, team).can(capability)
 
 class IsOrgOwnerOrReadOnly(BasePermission):
     """Org owner can write; others can read."""
     def has_object_permission(self, request, view, obj: Organization):
         if request.method in SAFE_METHODS:
             return True
-        return _is_org_owner(request.user, obj)
+        return bool(obj) and obj.owner_id == request.user.id
 
 class IsTeamReadable(BasePermission):
     """Team is readable by org owner or any team member; writes limited below."""
     def has_object_permission(self, request, view, team: Team):
         if request.method in SAFE_METHODS:
-            return _is_org_owner(request.user, team.org) or _team_membership(request.user, team)
+            return _is_org_owner(request, team) or _team_membership(request, team)
         return True  # defer to write permission class
 
-class TeamWriteByOwnerOrManager(BasePermission):
+class TeamWriteByCapability(BasePermission):
     """
-    Allow create/update/delete if:
-      - user is the org owner, OR
-      - user has team role in {'Owner','Manager'}
+    Allow an action on a team if the user is the org owner or holds the
+    capability the view asks for: view.required_capabilities[view.action],
+    else VIEW for safe methods and EDIT_TEAM for writes.
+
+    Every active member holds VIEW (MEMBERSHIP_CAPABILITIES), so any member
+    may read the team and its member list, as IsTeamReadable intends; the
+    role-name check this replaced limited those reads to Owners and Managers.
     """
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, team: Team):
-        if _is_org_owner(request.user, team.org):
-            return True
-        return _has_team_role(request.user, team, {"Owner", "Manager"})
+        default = Capability.VIEW if request.method in SAFE_METHODS else Capability.EDIT_TEAM
+        required = getattr(view, "required_capabilities", {}).get(getattr(view, "action", None), default)
+        return _has_capability(request, team, required)
@@ -0,0 +1,105 @@
+"""
+Organization provisioning.
+
+A new org gets its roles (the system roles of teams/capabilities.py unless
+settings.ORG_PROVISIONING["ROLES"] lists others), a default team and the owner's
+membership in that team, all in one transaction and a fixed number of INSERTs
+regardless of the template size:
+
+    org, roles (bulk_create), team, membership   -> 4 statements
+    provision_organizations(n specs)              -> still 4 statements (+1 lookup)
+"""
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import slugify
+
+from .capabilities import SYSTEM_ROLE_CAPABILITIES, Capability
+from .models import Organization, Role, Team, TeamMembership
+from .signals import bump_org_version, deferred_org_bump
+
+ROLE_DESCRIPTIONS = {
+    "Owner": "Full control of the organization.",
+    "Manager": "Manages teams and their members.",
+    "Member": "Works in the teams they belong to.",
+    "Viewer": "Read-only access.",
+}
+
+DEFAULTS = {
+    # capabilities come from SYSTEM_ROLE_CAPABILITIES; a ROLES override may give each
+    # role a "capabilities" list of names instead
+    "ROLES": [{"name": name, "description": ROLE_DESCRIPTIONS.get(name)} for name in SYSTEM_ROLE_CAPABILITIES],
+    "OWNER_ROLE": "Owner",
+    "DEFAULT_TEAM": "General",   # None: no default team (and no owner membership)
+}
+
+
+class ProvisionedOrg(NamedTuple):
+    org: Organization
+    roles: dict                        # name -> Role
+    team: Optional[Team]
+    membership: Optional[TeamMembership]
+
+
+def get_template() -> dict:
+    return {**DEFAULTS, **getattr(settings, "ORG_PROVISIONING", {})}
+
+
+def _build(org: Organization, owner_id, template) -> ProvisionedOrg:
+    """Unsaved rows for one org; every id is generated client-side, so no insert needs another's result."""
+    roles = {
+        spec["name"]: Role(
+            org=org, name=spec["name"], description=spec.get("description"), is_system=True,
+            # roles listed without capabilities fall back to the built-in grant for that name
+            capabilities=int(Capability.parse(spec.get("capabilities", SYSTEM_ROLE_CAPABILITIES.get(spec["name"], 0)))),
+        )
+        for spec in template["ROLES"]
+    }
+    team = membership = None
+    if template["DEFAULT_TEAM"]:
+        team = Team(org=org, name=template["DEFAULT_TEAM"], created_by_id=owner_id)
+        if owner_id is not None:
+            membership = TeamMembership(team=team, user_id=owner_id, role=roles.get(template["OWNER_ROLE"]))
+    return ProvisionedOrg(org, roles, team, membership)
+
+
+def provision_organization(name, owner_id, slug=None, template=None) -> ProvisionedOrg:
+    """Create one org with its roles, default team and owner membership."""
+    template = template or get_template()
+    org = Organization(name=name, slug=slug or "", owner_id=owner_id)
+    result = _build(org, owner_id, template)
+    with transaction.atomic(), deferred_org_bump(org.id):
+        org.save(force_insert=True)
+        Role.objects.bulk_create(result.roles.values())
+        if result.team is not None:
+            result.team.save(force_insert=True)
+        if result.membership is not None:
+            result.membership.save(force_insert=True)
+    return result
+
+
+def provision_organizations(specs, template=None) -> list:
+    """
+    Bulk variant for tenant onboarding: specs are dicts with name, owner_id and
+    optional slug. All orgs are written with one bulk_create per table; the
+    caller checks names/slugs for conflicts beforehand (see provision_orgs).
+    """
+    template = template or get_template()
+    results = []
+    for spec in specs:
+        org = Organization(
+            name=spec["name"],
+            slug=spec.get("slug") or slugify(spec["name"])[:200],  # bulk_create skips Organization.save()
+            owner_id=spec.get("owner_id"),
+        )
+        results.append(_build(org, org.owner_id, template))
+
+    with transaction.atomic():
+        Organization.objects.bulk_create([r.org for r in results])
+        Role.objects.bulk_create([role for r in results for role in r.roles.values()])
+        Team.objects.bulk_create([r.team for r in results if r.team is not None])
+        TeamMembership.objects.bulk_create([r.membership for r in results if r.membership is not None])
+        for r in results:  # bulk_create sends no signals
+            bump_org_version(r.org.id)
+    return results
@@ -0,0 +1,24 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils import encoders
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Lets clients negotiate `Accept: application/x-ndjson`;
+    streaming views emit rows themselves, this only renders non-streamed bodies (errors).
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(ndjson_line(row) for row in rows)
+
+
+def ndjson_line(row) -> bytes:
+    return json.dumps(row, cls=encoders.JSONEncoder, separators=(",", ":")).encode() + b"\n"
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from .capabilities import Capability
 from .models import Organization, Team, Role, TeamMembership
+from .provisioning import provision_organization
 from users.models import User
 
 
@@ -12,11 +14,8 @@ class OrganizationSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "slug", "owner", "created_at")
 
     def create(self, validated_data):
-        org = Organization.objects.create(owner=self.context["request"].user, **validated_data)
-        # (Optional) seed system roles here if you didn’t do it via signals
-        for r in ["Owner", "Manager", "Member", "Viewer"]:
-            Role.objects.get_or_create(org=org, name=r, defaults={"is_system": True})
-        return org
+        # org + template roles + default team + owner membership, one transaction (teams/provisioning.py)
+        return provision_organization(owner_id=self.context["request"].user.id, **validated_data).org
 
 
 class TeamSerializer(serializers.ModelSerializer):
@@ -29,14 +28,32 @@ class TeamSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_by", "created_at", "updated_at")
 
     def create(self, validated_data):
-        validated_data["created_by"] = self.context["request"].user
+        validated_data["created_by_id"] = self.context["request"].user.id
         return super().create(validated_data)
 
 
+class CapabilitiesField(serializers.Field):
+    """Capability bitmask <-> list of names, e.g. ["view", "write"]."""
+    default_error_messages = {"invalid": "Expected a list of capability names: {names}."}
+
+    def to_representation(self, value):
+        return Capability.names(value)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not isinstance(data, list):
+            self.fail("invalid", names=", ".join(Capability.names(Capability.all())))
+        try:
+            return int(Capability.parse(data))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
 class RoleSerializer(serializers.ModelSerializer):
+    capabilities = CapabilitiesField(required=False)
+
     class Meta:
         model = Role
-        fields = ("id", "org", "name", "description", "is_system")
+        fields = ("id", "org", "name", "description", "is_system", "capabilities")
         read_only_fields = ("id", "is_system")
 
 
@@ -51,5 +68,5 @@ class TeamMembershipSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "invited_by", "joined_at", "left_at")
 
     def create(self, validated_data):
-        validated_data["invited_by"] = self.context["request"].user
+        validated_data["invited_by_id"] = self.context["request"].user.id
         return super().create(validated_data)
@@ -0,0 +1,60 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import get_permission_cache
+from .models import Organization, Role, Team, TeamMembership
+
+
+def bump_org_version(org_id):
+    """Invalidate cached permissions for every (user, team) in this org once the write commits."""
+    cache = get_permission_cache()
+    if cache is None or org_id is None:
+        return
+    transaction.on_commit(lambda: cache.bump_org(org_id))
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_org_bump(*org_ids):
+    """
+    Suppress per-row membership invalidation inside the block and bump each org once
+    at the end. Bulk writes and cascading deletes use this: bulk_create/bulk_update send
+    no signals, and a per-row post_delete would otherwise look up each membership's org.
+    """
+    previous = getattr(_deferred, "active", False)
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = previous
+    for org_id in org_ids:
+        bump_org_version(org_id)
+
+
+def _membership_org_id(membership: TeamMembership):
+    if TeamMembership.team.is_cached(membership):
+        return membership.team.org_id
+    return Team.objects.filter(pk=membership.team_id).values_list("org_id", flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=TeamMembership)
+def _membership_changed(sender, instance, **kwargs):
+    if get_permission_cache() is not None and not getattr(_deferred, "active", False):
+        bump_org_version(_membership_org_id(instance))
+
+
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=Team)
+def _org_child_changed(sender, instance, **kwargs):
+    bump_org_version(instance.org_id)
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def _org_changed(sender, instance, **kwargs):
+    bump_org_version(instance.pk)
@@ -1,3 +1,976 @@
-from django.test import TestCase
+"""
+Teams app tests.
 
-# Create your tests here.
+Query budgets: every API endpoint must issue the same number of queries
+whether the data it touches has 1, 10 or 100 rows (members, teams, orgs,
+bulk items, authz checks), called by the seeded owner and again by a plain
+Member (whose writes may be refused, but not at a growing cost). Budgets
+live in QUERY_BUDGETS; raising one is a deliberate, reviewed change. A
+failure prints the SQL of the largest run with the statements that repeat
+per row marked.
+"""
+import base64
+import json
+import re
+import tempfile
+import uuid
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from typing import Callable, NamedTuple, Optional
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.utils import encoders
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from project_mgmt import dbrouting
+from users.authentication import Principal
+from users.models import EmailVerificationToken, User
+from users.serializers import LoginTokenObtainPairSerializer
+
+from . import claims
+from .authz import AuthzContext
+from .cache import DjangoPermissionCache, EffectivePermissions, LocalPermissionCache, check_permission_cache
+from .capabilities import SYSTEM_ROLE_CAPABILITIES, Capability
+from .models import Organization, Role, Team, TeamMembership
+from .provisioning import provision_organization, provision_organizations
+
+SIZES = (1, 10, 100)
+
+
+class Seed(NamedTuple):
+    owner: User
+    org: str            # ids as strings, ready for URLs and bodies
+    team: str
+    roles: dict         # role name -> id
+    members: list       # user ids with an active membership in `team`
+    outsiders: list     # user ids in no team
+    refresh: str
+
+
+def seed(n, tag) -> Seed:
+    """An owner with n orgs (each provisioned with roles and a default team), n teams in
+    the first org, and n members plus n outsiders for its default team."""
+    owner = User.objects.create_user(username=f"owner-{tag}", email=f"owner-{tag}@example.com", is_staff=True)
+    provisioned = provision_organizations(
+        [{"name": f"org-{tag}-{i}", "owner_id": owner.id} for i in range(n)]
+    )
+    first = provisioned[0]
+    Team.objects.bulk_create([Team(org=first.org, name=f"team-{i}", created_by=owner) for i in range(1, n)])
+    users = User.objects.bulk_create([
+        User(username=f"user-{tag}-{i}", email=f"user-{tag}-{i}@example.com", password="!") for i in range(2 * n)
+    ])
+    roles = list(first.roles.values())
+    TeamMembership.objects.bulk_create([
+        TeamMembership(team=first.team, user=user, role=roles[i % len(roles)]) for i, user in enumerate(users[:n])
+    ])
+    refresh = RefreshToken.for_user(owner)
+    for claim, value in Principal.claims_for(owner).items():
+        refresh[claim] = value
+    return Seed(
+        owner=owner,
+        org=str(first.org.id),
+        team=str(first.team.id),
+        roles={name: str(role.id) for name, role in first.roles.items()},
+        members=[str(u.id) for u in users[:n]],
+        outsiders=[str(u.id) for u in users[n:]],
+        refresh=str(refresh),
+    )
+
+
+class Endpoint(NamedTuple):
+    name: str
+    method: str
+    path: str                                   # formatted with the Seed's fields
+    budget: int                                 # queries per request, at every size
+    body: Optional[Callable[[Seed], dict]] = None
+    auth: bool = True
+    member_budget: Optional[int] = None         # called by a plain Member instead; None: staff/anonymous only
+    cascades: bool = False                      # deletes rows with delete signals, GET_ITERATOR_CHUNK_SIZE per query
+
+
+PASSWORD = "budget-password"
+
+
+def _members(ids, role=None):
+    return {"members": [{"user": user_id, "role": role} for user_id in ids]}
+
+
+def _credentials(s):
+    s.owner.set_password(PASSWORD)
+    s.owner.email_verified_at = timezone.now()
+    s.owner.save()
+    return {"username": s.owner.email, "password": PASSWORD}
+
+
+def _verification(s):
+    token = EmailVerificationToken.objects.create(user=s.owner, expires_at=timezone.now() + timedelta(hours=1))
+    return {"token": str(token.token)}
+
+
+def _signup(s):
+    return {"username": f"signup-{s.org}", "email": f"signup-{s.org}@example.com", "password": PASSWORD}
+
+
+# ---- budgets ----
+QUERY_BUDGETS = [
+    # teams
+    Endpoint("organization-list", "get", "/api/teams/organizations/", 1, member_budget=1),
+    Endpoint("organization-detail", "get", "/api/teams/organizations/{org}/", 1, member_budget=1),
+    Endpoint("organization-create", "post", "/api/teams/organizations/", 8, lambda s: {"name": f"new-{s.org}"},
+             member_budget=8),
+    Endpoint("organization-update", "patch", "/api/teams/organizations/{org}/", 3,
+             lambda s: {"name": f"renamed-{s.org}"}, member_budget=1),
+    Endpoint("organization-destroy", "delete", "/api/teams/organizations/{org}/", 11, member_budget=1,
+             cascades=True),
+    Endpoint("team-list", "get", "/api/teams/teams/", 1, member_budget=1),
+    Endpoint("team-list-can-write", "get", "/api/teams/teams/?can=write", 1, member_budget=1),
+    Endpoint("team-create", "post", "/api/teams/teams/", 4, lambda s: {"org": s.org, "name": "new"},
+             member_budget=4),
+    Endpoint("team-detail", "get", "/api/teams/teams/{team}/", 2, member_budget=2),
+    Endpoint("team-update", "patch", "/api/teams/teams/{team}/", 4, lambda s: {"name": "renamed"},
+             member_budget=2),
+    Endpoint("team-destroy", "delete", "/api/teams/teams/{team}/", 7, member_budget=2, cascades=True),
+    Endpoint("team-members", "get", "/api/teams/teams/{team}/members/", 3, member_budget=3),
+    Endpoint("team-members-stream", "get", "/api/teams/teams/{team}/members/?stream=1", 3, member_budget=3),
+    Endpoint("role-list", "get", "/api/teams/roles/?org={org}", 1, member_budget=1),
+    Endpoint("add-member", "post", "/api/teams/teams/{team}/add-member/", 7,
+             lambda s: {"team": s.team, "user": s.outsiders[0], "role": s.roles["Member"]}, member_budget=2),
+    Endpoint("set-role", "patch", "/api/teams/teams/{team}/set-role/", 6,
+             lambda s: {"user": s.members[0], "role": s.roles["Viewer"]}, member_budget=2),
+    Endpoint("remove-member", "delete", "/api/teams/teams/{team}/remove-member/?user={members[0]}", 5,
+             member_budget=2),
+    Endpoint("bulk-add-members", "post", "/api/teams/teams/{team}/bulk-add-members/", 8,
+             lambda s: _members(s.outsiders, s.roles["Member"]), member_budget=2),
+    Endpoint("bulk-set-role", "patch", "/api/teams/teams/{team}/bulk-set-role/", 7,
+             lambda s: _members(s.members, s.roles["Viewer"]), member_budget=2),
+    Endpoint("bulk-remove-members", "post", "/api/teams/teams/{team}/bulk-remove-members/", 7,
+             lambda s: _members(s.members), member_budget=2),
+    Endpoint("authz-check", "post", "/api/teams/authz/check", 2, lambda s: {"checks": [
+        {"user": user_id, "team": s.team, "action": "write"} for user_id in s.members
+    ]}, member_budget=0),
+    Endpoint("membership-claims", "get", "/api/teams/claims/", 1, member_budget=1),
+    Endpoint("permission-cache-stats", "get", "/api/teams/admin/permission-cache/", 0),
+    # users
+    Endpoint("signup", "post", "/api/users/signup/", 7, _signup, auth=False),
+    Endpoint("async-signup", "post", "/api/users/async/signup/", 7, _signup, auth=False),
+    Endpoint("login", "post", "/api/users/login/", 1, _credentials, auth=False),
+    Endpoint("async-login", "post", "/api/users/async/login/", 1, _credentials, auth=False),
+    Endpoint("verify-email", "post", "/api/users/verify-email/", 3, _verification, auth=False),
+    Endpoint("async-verify-email", "post", "/api/users/async/verify-email/", 3, _verification, auth=False),
+    Endpoint("resend-verification", "post", "/api/users/resend-verification/", 5,
+             lambda s: {"email": s.owner.email}, auth=False),
+    Endpoint("async-resend-verification", "post", "/api/users/async/resend-verification/", 5,
+             lambda s: {"email": s.owner.email}, auth=False),
+    Endpoint("token-refresh", "post", "/api/users/token/refresh/", 1, lambda s: {"refresh": s.refresh}, auth=False,
+             member_budget=1),
+    Endpoint("logout", "post", "/api/users/logout/", 8, lambda s: {"refresh": s.refresh}, member_budget=8),
+    Endpoint("logout-all", "post", "/api/users/logout-all/", 1, member_budget=1),
+    Endpoint("admin-user-list", "get", "/api/users/admin/users/", 1),
+    Endpoint("admin-user-detail", "get", "/api/users/admin/users/{members[0]}/", 1),
+    Endpoint("admin-user-delete", "delete", "/api/users/admin/users/{owner.id}/", 16, cascades=True),
+    Endpoint("rate-limit-stats", "get", "/api/users/admin/rate-limits/", 0),
+    Endpoint("hashing-pool-stats", "get", "/api/users/admin/hashing-pool/", 0),
+    Endpoint("jwks", "get", "/.well-known/jwks.json", 0, auth=False),
+]
+
+
+def _normalize(sql) -> str:
+    """SQL with literals replaced, so per-row repeats of one statement compare equal."""
+    sql = re.sub(r"'[^']*'", "?", sql)
+    return re.sub(r"\b\d+\b", "?", sql)
+
+
+def _report(name, budget, counts, queries, baseline) -> str:
+    repeated = Counter(_normalize(q["sql"]) for q in queries) - Counter(_normalize(q["sql"]) for q in baseline)
+    lines = [
+        f"{name}: queries by size {counts} (budget {budget}).",
+        f"SQL at size {SIZES[-1]} (* = not issued at size {SIZES[0]} or issued more often):",
+    ]
+    for q in queries:
+        marker = "*" if repeated[_normalize(q["sql"])] else " "
+        lines.append(f" {marker} {q['sql']}")
+    return "\n".join(lines)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS={"RULES": {}},
+    EMAIL_OUTBOX={"ON_COMMIT": None},
+    TOKEN_DENYLIST={"REFRESH_INTERVAL": 3600.0},  # no periodic denylist pull inside a measured request
+)
+class QueryBudgetTests(TestCase):
+    def _measure(self, endpoint, size, as_member):
+        caller = "member" if as_member else "owner"
+        data = seed(size, f"{endpoint.name}-{caller}-{size}")
+        if as_member:
+            member = _member(data.team, Role.objects.get(pk=data.roles["Member"]), f"member-{endpoint.name}-{size}")
+            data = data._replace(refresh=str(LoginTokenObtainPairSerializer.get_token(member)))
+        authorization = f"Bearer {RefreshToken(data.refresh).access_token}"
+        # warm per-process caches (user state, token denylist) so only the endpoint's own queries count
+        APIClient(HTTP_AUTHORIZATION=authorization).get("/api/teams/claims/")
+        client = APIClient()
+        if endpoint.auth:
+            client.credentials(HTTP_AUTHORIZATION=authorization)
+        path = endpoint.path.format(**data._asdict())
+        body = endpoint.body(data) if endpoint.body else None
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(client, endpoint.method)(path, body, format="json")
+            if hasattr(response, "streaming_content"):
+                b"".join(response.streaming_content)
+        # a plain member may be refused a write, but the refusal must not scale either
+        refused = as_member and response.status_code == 403
+        self.assertTrue(response.status_code < 400 or refused,
+                        f"{endpoint.name} as {caller} at size {size}: {response.status_code}")
+        return ctx.captured_queries
+
+    def _check(self, endpoint, budget, as_member=False):
+        runs = [self._measure(endpoint, size, as_member) for size in SIZES]
+        counts = dict(zip(SIZES, map(len, runs)))
+        steady = len(set(counts.values())) == 1
+        if endpoint.cascades and not steady:
+            # the delete collector issues one DELETE per chunk of rows it sends signals for
+            steady = len({counts[size] - size // GET_ITERATOR_CHUNK_SIZE for size in SIZES}) == 1
+        if not steady or counts[SIZES[0]] > budget:
+            self.fail(_report(endpoint.name, budget, counts, runs[-1], runs[0]))
+
+    def test_query_counts_do_not_grow_with_data(self):
+        for endpoint in QUERY_BUDGETS:
+            with self.subTest(endpoint=endpoint.name):
+                self._check(endpoint, endpoint.budget)
+
+    def test_query_counts_do_not_grow_with_data_for_a_plain_member(self):
+        for endpoint in QUERY_BUDGETS:
+            if endpoint.member_budget is not None:
+                with self.subTest(endpoint=endpoint.name):
+                    self._check(endpoint, endpoint.member_budget, as_member=True)
+
+
+# ---- visibility ----
+@override_settings(RATE_LIMITS={"RULES": {}})
+class VisibilityTests(TestCase):
+    def setUp(self):
+        self.data = seed(2, "visible")  # org A: the default team plus team-1; the owner has a second org
+        self.member = User.objects.get(pk=self.data.members[0])
+        self.other_team = Team.objects.get(org_id=self.data.org, name="team-1")
+        other_owner = User.objects.create_user(username="other-owner", email="other-owner@example.com")
+        provisioned = provision_organization("Other", other_owner.id)
+        self.other_org, self.foreign_team = provisioned.org, provisioned.team
+        self.foreign_member = _member(self.foreign_team.id, provisioned.roles["Member"], "foreign")
+        self.outsider = User.objects.get(pk=self.data.outsiders[0])
+
+    def _ids(self, user, path):
+        response = _client_for(user).get(path)
+        self.assertEqual(response.status_code, 200)
+        return {row["id"] for row in response.data["results"]}
+
+    def _status(self, user, path):
+        return _client_for(user).get(path).status_code
+
+    def test_member_sees_their_teams_and_orgs_only(self):
+        self.assertEqual(self._ids(self.member, "/api/teams/teams/"), {self.data.team})
+        self.assertEqual(self._ids(self.member, "/api/teams/organizations/"), {self.data.org})
+        self.assertEqual(self._status(self.member, f"/api/teams/teams/{self.data.team}/"), 200)
+        self.assertEqual(self._status(self.member, f"/api/teams/teams/{self.other_team.id}/"), 404)
+        self.assertEqual(self._status(self.member, f"/api/teams/teams/{self.foreign_team.id}/"), 404)
+        self.assertEqual(self._status(self.member, f"/api/teams/organizations/{self.other_org.id}/"), 404)
+
+    def test_member_of_another_org_sees_nothing_here(self):
+        self.assertEqual(self._ids(self.foreign_member, "/api/teams/teams/"), {str(self.foreign_team.id)})
+        self.assertEqual(self._ids(self.foreign_member, "/api/teams/organizations/"), {str(self.other_org.id)})
+        self.assertEqual(self._status(self.foreign_member, f"/api/teams/teams/{self.data.team}/"), 404)
+        self.assertEqual(self._status(self.foreign_member, f"/api/teams/organizations/{self.data.org}/"), 404)
+
+    def test_non_member_sees_nothing(self):
+        self.assertEqual(self._ids(self.outsider, "/api/teams/teams/"), set())
+        self.assertEqual(self._ids(self.outsider, "/api/teams/organizations/"), set())
+        self.assertEqual(self._status(self.outsider, f"/api/teams/teams/{self.data.team}/"), 404)
+        self.assertEqual(self._status(self.outsider, f"/api/teams/organizations/{self.data.org}/"), 404)
+
+    def test_owner_sees_every_team_of_their_orgs_and_former_members_nothing(self):
+        owned = {str(pk) for pk in Team.objects.filter(org__owner=self.data.owner).values_list("id", flat=True)}
+        self.assertEqual(len(owned), 3)  # team-1 and both default teams
+        self.assertEqual(self._ids(self.data.owner, "/api/teams/teams/"), owned)
+        TeamMembership.objects.filter(user=self.member).update(left_at=timezone.now())
+        self.assertEqual(self._ids(self.member, "/api/teams/teams/"), set())
+        self.assertEqual(self._ids(self.member, "/api/teams/organizations/"), set())
+
+
+# ---- pagination ----
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@override_settings(RATE_LIMITS={"RULES": {}})
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.data = seed(7, "pages")
+        # every member joined at the same instant: pages must still split on id
+        TeamMembership.objects.filter(team_id=self.data.team).update(joined_at=timezone.now())
+        self.client = _client_for(self.data.owner)
+        self.url = f"/api/teams/teams/{self.data.team}/members/"
+
+    def _walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["user_id"] for row in response.data["results"]])
+            url = response.data[link]
+        return pages
+
+    def test_forward_and_backward_over_equal_ordering_keys(self):
+        forward = self._walk(f"{self.url}?page_size=3", "next")
+        self.assertEqual([len(page) for page in forward], [3, 3, 2])  # 7 members and the owner
+        expected = [str(user_id) for user_id in TeamMembership.objects.filter(team_id=self.data.team)
+                    .order_by("joined_at", "id").values_list("user_id", flat=True)]
+        self.assertEqual([user for page in forward for user in page], expected)
+
+        last = self.client.get(f"{self.url}?page_size=3")
+        for _ in range(2):
+            last = self.client.get(last.data["next"])
+        self.assertIsNone(last.data["next"])
+        self.assertEqual(self._walk(last.data["previous"], "previous"), forward[1::-1])
+
+    def test_page_size_is_clamped(self):
+        def size(query):
+            return len(self.client.get(f"{self.url}?{query}").data["results"])
+
+        self.assertEqual(size("page_size=2"), 2)
+        for query in ("page_size=0", "page_size=-3", "page_size=many"):
+            with self.subTest(query=query):
+                self.assertEqual(size(query), 8)  # the default page size: every member and the owner
+        with mock.patch("teams.views.MemberPagination.max_page_size", 4):
+            self.assertEqual(size("page_size=1000"), 4)
+
+    def test_invalid_and_tampered_cursors_are_not_found(self):
+        team = Team.objects.get(pk=self.data.team)
+        cursors = {
+            self.url: [_cursor({"v": ["not a date", str(uuid.uuid4())]}), _cursor({"v": [str(timezone.now()), "x"]})],
+            "/api/teams/teams/": [_cursor({"v": [self.data.org, team.name, "42"]}),
+                                  _cursor({"v": ["org", team.name, str(team.id)]})],
+            "/api/teams/organizations/": [_cursor({"v": ["org", {"id": 1}]})],
+            "/api/users/admin/users/": [_cursor({"v": ["a@example.com", [1, 2]]})],
+        }
+        garbage = ["!!!", _cursor(["no", "dict"]), _cursor({"v": "abc"}), _cursor({"v": [1]}),
+                   _cursor({"v": [None] * 3})]
+        for path, tampered in cursors.items():
+            for cursor in [*tampered, *garbage]:
+                with self.subTest(path=path, cursor=cursor):
+                    response = self.client.get(path, {"cursor": cursor})
+                    self.assertEqual(response.status_code, 404)
+                    self.assertEqual(response.data["detail"], "Invalid cursor")
+
+
+# ---- permission cache ----
+PERMS = EffectivePermissions(is_org_owner=False, is_member=True, role="Member", capabilities=3)
+
+
+class PermissionCacheTests(SimpleTestCase):
+    def _caches(self):
+        return [LocalPermissionCache(), DjangoPermissionCache(key_prefix=f"test:{uuid.uuid4().hex}")]
+
+    def test_hit_after_set_under_the_looked_up_version(self):
+        for cache in self._caches():
+            with self.subTest(backend=type(cache).__name__):
+                lookup = cache.get(1, 2, 3)
+                self.assertIsNone(lookup.perms)
+                cache.set(1, 2, 3, PERMS, lookup.version)
+                self.assertEqual(cache.get(1, 2, 3).perms, PERMS)
+
+    def test_bump_between_resolve_and_set_leaves_entry_stale(self):
+        for cache in self._caches():
+            with self.subTest(backend=type(cache).__name__):
+                _, version = cache.get(1, 2, 3)
+                cache.bump_org(3)  # a membership change commits while the old perms are resolved
+                cache.set(1, 2, 3, PERMS, version)
+                self.assertIsNone(cache.get(1, 2, 3).perms)
+
+    def test_local_entries_expire(self):
+        cache = LocalPermissionCache(timeout=60)
+        with mock.patch("teams.cache.time.monotonic", return_value=1000.0):
+            cache.set(1, 2, 3, PERMS, cache.get(1, 2, 3).version)
+            self.assertEqual(cache.get(1, 2, 3).perms, PERMS)
+        with mock.patch("teams.cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get(1, 2, 3).perms)
+
+    def test_process_local_cache_refused_with_several_processes(self):
+        with override_settings(WEB_PROCESSES=2):
+            with self.assertRaises(ImproperlyConfigured):
+                check_permission_cache()
+        shared = {"BACKEND": "teams.cache.DjangoPermissionCache", "OPTIONS": {"alias": "shared"}}
+        caches = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                  "shared": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                             "LOCATION": "/tmp/teams-test-cache"}}
+        with override_settings(WEB_PROCESSES=2, TEAMS_PERMISSION_CACHE=shared, CACHES=caches):
+            check_permission_cache()
+
+
+class AuthzCacheRaceTests(TestCase):
+    def test_membership_change_during_resolve_is_not_cached(self):
+        data = seed(1, "race")
+        user = User.objects.get(pk=data.members[0])
+        team_id = uuid.UUID(data.team)
+        org_id = Team.objects.get(pk=team_id).org_id
+        resolve = AuthzContext._resolve
+
+        def resolve_then_change(ctx, *args):
+            perms = resolve(ctx, *args)
+            with self.captureOnCommitCallbacks(execute=True):  # the removal commits and bumps the org
+                TeamMembership.objects.filter(user=user, team_id=team_id).delete()
+            return perms
+
+        with mock.patch.object(AuthzContext, "_resolve", resolve_then_change):
+            self.assertTrue(AuthzContext(user).team_permissions(team_id, org_id).is_member)
+        self.assertFalse(AuthzContext(user).team_permissions(team_id, org_id).is_member)
+
+
+
+@override_settings(TEAMS_PERMISSION_CACHE={"BACKEND": "teams.cache.LocalPermissionCache"})
+class PermissionCacheStatsTests(TestCase):
+    url = "/api/teams/admin/permission-cache/"
+
+    def test_counters_after_a_miss_a_hit_and_a_bump(self):
+        data = seed(1, "stats")
+        user = User.objects.get(pk=data.members[0])
+        team_id = uuid.UUID(data.team)
+        org_id = Team.objects.get(pk=team_id).org_id
+        for _ in range(2):  # a fresh context per request: the second is served from the cache
+            AuthzContext(user).team_permissions(team_id, org_id)
+        with self.captureOnCommitCallbacks(execute=True):  # the save commits and bumps the org
+            Team.objects.get(pk=team_id).save()
+
+        response = _client_for(data.owner).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"backend": "LocalPermissionCache", "hits": 1, "misses": 1,
+                                         "invalidations": 1, "hit_ratio": 0.5, "entries": 1})
+        self.assertEqual(_client_for(user).get(self.url).status_code, 403)
+
+
+# ---- member streaming ----
+@override_settings(RATE_LIMITS={"RULES": {}})
+class MemberStreamTests(TestCase):
+    def setUp(self):
+        self.data = seed(5, "stream")
+        self.client = _client_for(self.data.owner)
+        self.url = f"/api/teams/teams/{self.data.team}/members/"
+
+    def _lines(self, response) -> list:
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content)
+        self.assertTrue(body.endswith(b"\n"))
+        return [json.loads(line) for line in body.split(b"\n")[:-1]]
+
+    def test_one_member_object_per_line_in_page_order(self):
+        rows = self._lines(self.client.get(self.url, {"stream": "1"}))
+        paged = self.client.get(self.url).data["results"]
+        self.assertEqual(len(rows), 6)  # 5 members and the owner
+        self.assertEqual([row["id"] for row in rows], [row["id"] for row in paged])
+        self.assertEqual(set(rows[0]), {"id", "user_id", "username", "email", "role", "joined_at"})
+        self.assertEqual(rows, json.loads(json.dumps(paged, cls=encoders.JSONEncoder)))
+
+    def test_accept_header_selects_the_stream(self):
+        rows = self._lines(self.client.get(self.url, HTTP_ACCEPT="application/x-ndjson"))
+        self.assertEqual(len(rows), 6)
+
+    def test_stream_is_split_into_chunks(self):
+        with mock.patch("teams.views.TeamViewSet.members_stream_chunk_size", 2):
+            rows = self._lines(self.client.get(self.url, {"stream": "true"}))
+        self.assertEqual(len({row["user_id"] for row in rows}), 6)
+
+# ---- bulk membership ----
+@override_settings(RATE_LIMITS={"RULES": {}})
+class BulkMembershipTests(TestCase):
+    def setUp(self):
+        self.data = seed(2, "bulk")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken(self.data.refresh).access_token}")
+        self.url = f"/api/teams/teams/{self.data.team}/bulk-add-members/"
+
+    def test_body_that_is_not_an_object_is_rejected(self):
+        for body in ([{"user": self.data.outsiders[0]}], "members", 3):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, format="json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {"detail": "members must be a non-empty list"})
+
+    def _bulk(self, method, action, items):
+        path = f"/api/teams/teams/{self.data.team}/{action}/"
+        response = getattr(self.client, method)(path, {"members": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @staticmethod
+    def _outcomes(data) -> list:
+        return [r["result"] if r["ok"] else r["detail"] for r in data["results"]]
+
+    def test_add_reports_every_item(self):
+        new, other = self.data.outsiders
+        third = str(User.objects.create_user(username="third", email="third@example.com").id)
+        foreign_role = provision_organization("Foreign", self.data.owner.id).roles["Member"]
+        TeamMembership.objects.filter(user_id=self.data.members[1]).update(left_at=timezone.now())
+        data = self._bulk("post", "bulk-add-members", [
+            {"user": new, "role": self.data.roles["Member"]},
+            {"user": new},
+            {"user": "not-a-uuid"},
+            {"user": self.data.members[0]},
+            {"user": other, "role": "nope"},
+            {"user": third, "role": str(foreign_role.id)},
+            {"user": str(uuid.uuid4())},
+            {"user": self.data.members[1], "role": self.data.roles["Viewer"]},
+            "not an object",
+        ])
+        self.assertEqual(self._outcomes(data), [
+            "added", "duplicate user in request", "invalid user id", "already a member", "invalid role id",
+            "role must belong to the same organization", "user not found", "reactivated", "invalid user id",
+        ])
+        self.assertEqual((data["succeeded"], data["failed"]), (2, 7))
+        self.assertEqual(data["results"][0], {"user": new, "ok": True, "result": "added"})
+        self.assertEqual(data["results"][2], {"user": "not-a-uuid", "ok": False, "detail": "invalid user id"})
+        active = TeamMembership.objects.filter(team_id=self.data.team, left_at__isnull=True)
+        self.assertEqual(active.get(user_id=new).role_id, uuid.UUID(self.data.roles["Member"]))
+        self.assertEqual(active.get(user_id=self.data.members[1]).role_id, uuid.UUID(self.data.roles["Viewer"]))
+        self.assertFalse(TeamMembership.objects.filter(user_id__in=[other, third]).exists())
+
+    def test_set_role_and_remove_report_every_item(self):
+        member, outsider = self.data.members[0], self.data.outsiders[0]
+        data = self._bulk("patch", "bulk-set-role", [
+            {"user": member, "role": self.data.roles["Viewer"]},
+            {"user": outsider, "role": self.data.roles["Viewer"]},
+            {"user": self.data.members[1], "role": str(uuid.uuid4())},
+            {"user": self.data.members[1], "role": None},
+        ])
+        self.assertEqual(self._outcomes(data), ["updated", "not a member", "role must belong to the same organization",
+                                                "duplicate user in request"])
+        self.assertEqual(TeamMembership.objects.get(user_id=member).role_id, uuid.UUID(self.data.roles["Viewer"]))
+
+        data = self._bulk("post", "bulk-remove-members", [{"user": member}, {"user": outsider}, {"user": member}])
+        self.assertEqual(self._outcomes(data), ["removed", "not a member", "duplicate user in request"])
+        self.assertFalse(TeamMembership.objects.filter(user_id=member).exists())
+
+        data = self._bulk("post", "bulk-add-members", [{"user": member}])  # removed, then re-added
+        self.assertEqual(self._outcomes(data), ["added"])
+        self.assertIsNone(TeamMembership.objects.get(user_id=member).role_id)
+
+    def test_one_transaction_and_one_org_bump_per_request(self):
+        items = [{"user": user_id} for user_id in self.data.outsiders]
+        with mock.patch("teams.signals.bump_org_version") as bump:
+            self._bulk("post", "bulk-add-members", items)
+        bump.assert_called_once_with(uuid.UUID(self.data.org))
+
+        # a failure part-way through leaves nothing behind
+        TeamMembership.objects.filter(user_id__in=self.data.outsiders).delete()
+        TeamMembership.objects.filter(user_id=self.data.members[0]).update(left_at=timezone.now())
+        items.append({"user": self.data.members[0]})  # reactivated after the bulk_create
+        with mock.patch.object(TeamMembership.objects, "bulk_update", side_effect=DatabaseError("boom")):
+            with self.assertRaises(DatabaseError):
+                self.client.post(f"/api/teams/teams/{self.data.team}/bulk-add-members/", {"members": items},
+                                 format="json")
+        self.assertFalse(TeamMembership.objects.filter(user_id__in=self.data.outsiders).exists())
+
+
+# ---- capabilities ----
+def _client_for(user) -> APIClient:
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {LoginTokenObtainPairSerializer.get_token(user).access_token}")
+    return client
+
+
+def _member(team_id, role, tag) -> User:
+    user = User.objects.create_user(username=tag, email=f"{tag}@example.com")
+    TeamMembership.objects.create(team_id=team_id, user=user, role=role)
+    return user
+
+
+class CapabilityTests(SimpleTestCase):
+    def test_parse_and_names(self):
+        self.assertEqual(Capability.parse("write"), Capability.WRITE)
+        self.assertEqual(Capability.parse([" View ", "MANAGE_MEMBERS"]), Capability.VIEW | Capability.MANAGE_MEMBERS)
+        self.assertEqual(Capability.parse(1 << 20 | 3), Capability.VIEW | Capability.WRITE)
+        self.assertEqual(Capability.names(Capability.VIEW | Capability.DELETE_TEAM), ["view", "delete_team"])
+        with self.assertRaises(ValueError):
+            Capability.parse("fly")
+
+
+@override_settings(RATE_LIMITS={"RULES": {}})
+class CapabilityPermissionTests(TestCase):
+    def setUp(self):
+        self.data = seed(1, "caps")
+        self.roles = {role.name: role for role in Role.objects.filter(org_id=self.data.org)}
+        self.url = f"/api/teams/teams/{self.data.team}/"
+
+    def test_has_lookup_matches_every_bit(self):
+        def holding(capability):
+            return set(Role.objects.filter(org_id=self.data.org, capabilities__has=capability)
+                       .values_list("name", flat=True))
+
+        self.assertEqual(holding(Capability.WRITE), {"Owner", "Manager", "Member"})
+        self.assertEqual(holding(Capability.WRITE | Capability.DELETE_TEAM), {"Owner", "Manager"})
+        self.assertEqual(holding(Capability.MANAGE_ROLES), {"Owner"})
+
+    def test_every_member_reads_the_team_and_its_members(self):
+        # before capabilities, only Owner/Manager roles could read team detail and members
+        readers = [_member(self.data.team, self.roles["Member"], "member"),
+                   _member(self.data.team, self.roles["Viewer"], "viewer"),
+                   _member(self.data.team, None, "no-role")]
+        for user in readers:
+            with self.subTest(user=user.username):
+                client = _client_for(user)
+                self.assertEqual(client.get(self.url).status_code, 200)
+                self.assertEqual(client.get(f"{self.url}members/").status_code, 200)
+                self.assertEqual(client.patch(self.url, {"name": "x"}, format="json").status_code, 403)
+        outsider = User.objects.get(pk=self.data.outsiders[0])
+        self.assertEqual(_client_for(outsider).get(self.url).status_code, 404)
+
+    def test_edit_needs_edit_team(self):
+        viewer = _member(self.data.team, self.roles["Viewer"], "viewer")
+        manager = _member(self.data.team, self.roles["Manager"], "manager")
+        self.assertEqual(_client_for(viewer).get(self.url).status_code, 200)
+        self.assertEqual(_client_for(viewer).patch(self.url, {"name": "x"}, format="json").status_code, 403)
+        response = _client_for(manager).patch(self.url, {"name": "renamed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Team.objects.get(pk=self.data.team).name, "renamed")
+
+    def test_destroy_needs_delete_team_not_just_edit(self):
+        editor = Role.objects.create(org_id=self.data.org, name="Editor",
+                                     capabilities=Capability.VIEW | Capability.EDIT_TEAM)
+        user = _member(self.data.team, editor, "editor")
+        client = _client_for(user)
+        self.assertEqual(client.patch(self.url, {"name": "renamed"}, format="json").status_code, 200)
+        self.assertEqual(client.delete(self.url).status_code, 403)
+        self.assertTrue(Team.objects.filter(pk=self.data.team).exists())
+
+    def test_can_filter_lists_only_teams_with_the_capability(self):
+        viewer = _member(self.data.team, self.roles["Viewer"], "viewer")
+        other = Team.objects.create(org_id=self.data.org, name="other", created_by=self.data.owner)
+        TeamMembership.objects.create(team=other, user=viewer, role=self.roles["Member"])
+        client = _client_for(viewer)
+
+        def listed(query):
+            response = client.get(f"/api/teams/teams/{query}")
+            self.assertEqual(response.status_code, 200)
+            return {row["id"] for row in response.data["results"]}
+
+        self.assertEqual(listed(""), {self.data.team, str(other.id)})
+        self.assertEqual(listed("?can=write"), {str(other.id)})
+        self.assertEqual(listed("?can=view,manage_members"), set())
+        self.assertEqual(client.get("/api/teams/teams/?can=fly").status_code, 400)
+
+
+# ---- authz check ----
+@override_settings(RATE_LIMITS={"RULES": {}})
+class AuthzCheckTests(TestCase):
+    url = "/api/teams/authz/check"
+
+    def setUp(self):
+        self.data = seed(1, "authz")
+        self.viewer = _member(self.data.team, Role.objects.get(pk=self.data.roles["Viewer"]), "viewer")
+        self.owner = str(self.data.owner.id)
+
+    def _check(self, client, checks, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return client.post(self.url, {"checks": checks}, format="json", **headers)
+
+    def test_mixed_batch_answers_in_request_order(self):
+        viewer, outsider, team = str(self.viewer.id), self.data.outsiders[0], self.data.team
+        checks = [
+            {"user": viewer, "team": team, "action": "view"},
+            {"user": viewer, "team": team, "action": "write"},
+            {"user": outsider, "team": team, "action": "view"},
+            {"user": self.owner, "team": team, "action": ["delete_team", "manage_roles"]},
+            {"user": viewer, "org": self.data.org, "action": "view"},
+            {"user": viewer, "team": team, "action": "fly"},
+            {"user": "nope", "team": team, "action": "view"},
+            {"user": viewer, "team": str(uuid.uuid4()), "action": "view"},
+        ]
+        response = self._check(_client_for(self.data.owner), checks)
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([r["allowed"] for r in results], [True, False, False, True, True, False, False, False])
+        self.assertEqual([r.get("detail") for r in results[5:]],
+                         ["unknown action", "invalid user id", "team not found"])
+        self.assertEqual(results[0], {**checks[0], "allowed": True})
+
+    def test_non_staff_may_only_check_themselves(self):
+        checks = [{"user": str(self.viewer.id), "team": self.data.team, "action": "view"},
+                  {"user": self.owner, "team": self.data.team, "action": "view"}]
+        results = self._check(_client_for(self.viewer), checks).data["results"]
+        self.assertTrue(results[0]["allowed"])
+        self.assertEqual((results[1]["allowed"], results[1]["detail"]), (False, "only staff may check other users"))
+
+    def test_rejects_bad_bodies(self):
+        client = _client_for(self.data.owner)
+        for body in ({"checks": []}, {"checks": "x"}, ["x"]):
+            with self.subTest(body=body):
+                self.assertEqual(client.post(self.url, body, format="json").status_code, 400)
+
+    def test_revalidation_with_etag(self):
+        client = _client_for(self.data.owner)
+        checks = [{"user": str(self.viewer.id), "team": self.data.team, "action": "view"}]
+        response = self._check(client, checks)
+        etag = response["ETag"]
+        self.assertIn("must-revalidate", response["Cache-Control"])
+        response = self._check(client, checks, etag=f'"other", {etag}')
+        self.assertEqual((response.status_code, response["ETag"]), (304, etag))
+        self.assertNotEqual(self._check(client, [{**checks[0], "action": "write"}])["ETag"], etag)
+
+    def test_shared_cache_etag_follows_membership_changes(self):
+        shared = {"BACKEND": "teams.cache.DjangoPermissionCache",
+                  "OPTIONS": {"key_prefix": f"test:{uuid.uuid4().hex}"}}
+        client = _client_for(self.data.owner)
+        checks = [{"user": str(self.viewer.id), "team": self.data.team, "action": "view"}]
+        with self.settings(TEAMS_PERMISSION_CACHE=shared):
+            etag = self._check(client, checks)["ETag"]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self._check(client, checks, etag=etag).status_code, 304)
+            self.assertFalse([q for q in ctx.captured_queries if "teams_teammembership" in q["sql"]])
+
+            with self.captureOnCommitCallbacks(execute=True):  # commits bump the org's version
+                TeamMembership.objects.filter(user=self.viewer).delete()
+            response = self._check(client, checks, etag=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            self.assertFalse(response.data["results"][0]["allowed"])
+
+
+# ---- membership claims ----
+@override_settings(RATE_LIMITS={"RULES": {}}, TOKEN_MEMBERSHIP_CLAIMS={"ENABLED": True})
+class MembershipClaimsTests(TestCase):
+    def setUp(self):
+        self.data = seed(1, "claims")
+        self.viewer = _member(self.data.team, Role.objects.get(pk=self.data.roles["Viewer"]), "viewer")
+
+    def test_token_carries_compact_claims(self):
+        token = LoginTokenObtainPairSerializer.get_token(self.viewer).access_token
+        self.assertEqual(token["mbr"], claims.full_claims(self.viewer.id))
+        self.assertEqual(token["mbr"]["t"], {claims.encode_id(self.data.team): int(Capability.VIEW)})
+        self.assertEqual(token["mbr"]["o"], [])
+        owner = LoginTokenObtainPairSerializer.get_token(self.data.owner).access_token
+        self.assertEqual([claims.decode_id(o) for o in owner["mbr"]["o"]], [uuid.UUID(self.data.org)])
+
+    def test_oversized_claim_falls_back_to_the_stamp(self):
+        with self.settings(TOKEN_MEMBERSHIP_CLAIMS={"ENABLED": True, "MAX_BYTES": 16}):
+            token = LoginTokenObtainPairSerializer.get_token(self.viewer).access_token
+        self.assertEqual(token["mbr"], {"v": claims.full_claims(self.viewer.id)["v"]})
+
+    def test_claims_endpoint_uses_the_stamp_as_etag(self):
+        client = _client_for(self.viewer)
+        response = client.get("/api/teams/claims/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, claims.full_claims(self.viewer.id))
+        self.assertEqual(response["ETag"], f'"{response.data["v"]}"')
+        self.assertEqual(client.get("/api/teams/claims/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(client.get(f"/api/teams/claims/?user={self.data.owner.id}").status_code, 403)
+        staff = _client_for(self.data.owner).get(f"/api/teams/claims/?user={self.viewer.id}")
+        self.assertEqual(staff.data, response.data)
+
+    def test_refresh_re_signs_when_memberships_changed(self):
+        refresh = LoginTokenObtainPairSerializer.get_token(self.viewer)
+        stale = refresh["mbr"]
+        url = reverse("users:token-refresh")
+        response = self.client.post(url, {"refresh": str(refresh)}, content_type="application/json")
+        self.assertEqual(AccessToken(response.data["access"])["mbr"], stale)
+
+        other = Team.objects.create(org_id=self.data.org, name="other", created_by=self.data.owner)
+        TeamMembership.objects.create(team=other, user=self.viewer, role=Role.objects.get(pk=self.data.roles["Member"]))
+        response = self.client.post(url, {"refresh": str(refresh)}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        current = AccessToken(response.data["access"])["mbr"]
+        self.assertNotEqual(current["v"], stale["v"])
+        self.assertEqual(current["t"][claims.encode_id(other.id)], int(SYSTEM_ROLE_CAPABILITIES["Member"]))
+
+
+# ---- replica routing ----
+class _ReadAliasView(dbrouting.ReplicaReadMixin, APIView):
+    """Answers with the alias the router picks for reads while the request runs."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response({"alias": dbrouting.ReplicaRouter().db_for_read(Team)})
+
+    def post(self, request):
+        return Response({"alias": dbrouting.ReplicaRouter().db_for_read(Team)},
+                        status=request.data.get("status", 200))
+
+
+@override_settings(DATABASE_REPLICAS={"REPLICAS": ["replica"], "STICKY_SECONDS": 5, "RETRY_AFTER": 30})
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        dbrouting.health.clear()
+        self.addCleanup(dbrouting.health.clear)
+        self.replica = mock.Mock()
+        patcher = mock.patch.object(dbrouting, "connections", {"replica": self.replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = mock.Mock(id=uuid.uuid4(), is_authenticated=True)
+        # the middleware wraps the view as it does in MIDDLEWARE
+        self.app = dbrouting.ReadYourWritesMiddleware(_ReadAliasView.as_view())
+
+    def _alias(self, method="get", user=None, status=200):
+        request = getattr(APIRequestFactory(), method)("/", {"status": status}, format="json")
+        force_authenticate(request, user=user or self.user)
+        request.user = user or self.user  # what AuthenticationMiddleware would have set
+        response = self.app(request)
+        self.assertEqual(response.status_code, status)
+        return response.data["alias"]
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self._alias(), "replica")
+        self.assertEqual(dbrouting.ReplicaRouter().db_for_read(Team), "default")  # reset after the request
+        self.assertEqual(dbrouting.ReplicaRouter().db_for_write(Team), "default")
+        self.assertFalse(dbrouting.ReplicaRouter().allow_migrate("replica", "teams"))
+
+    def test_writers_stick_to_the_primary(self):
+        self.assertEqual(self._alias("post"), "default")
+        self.assertTrue(dbrouting.is_sticky(self.user.id))
+        self.assertEqual(self._alias(), "default")
+        other = mock.Mock(id=uuid.uuid4(), is_authenticated=True)
+        self.assertEqual(self._alias(user=other), "replica")
+
+    def test_failed_writes_do_not_stick(self):
+        self.assertEqual(self._alias("post", status=400), "default")
+        self.assertFalse(dbrouting.is_sticky(self.user.id))
+        self.assertEqual(self._alias(), "replica")
+
+    def test_unreachable_replica_is_left_out_until_retry_after(self):
+        self.replica.ensure_connection.side_effect = OperationalError("unreachable")
+        with mock.patch("project_mgmt.dbrouting.time.monotonic", return_value=1000.0):
+            self.assertEqual(self._alias(), "default")
+            self.assertEqual(self._alias(), "default")
+        self.assertEqual((self.replica.ensure_connection.call_count, dbrouting.health.failures), (1, 1))
+        self.replica.ensure_connection.side_effect = None
+        with mock.patch("project_mgmt.dbrouting.time.monotonic", return_value=1031.0):
+            self.assertEqual(self._alias(), "replica")
+
+
+
+def _copy_to_replica(*models):
+    """Snapshot rows into the "replica" test database, which the primary's writes then leave behind."""
+    for model in models:
+        model.objects.using("replica").bulk_create(list(model.objects.all()))
+
+
+@override_settings(RATE_LIMITS={"RULES": {}},
+                   DATABASE_REPLICAS={"REPLICAS": ["replica"], "STICKY_SECONDS": 5, "RETRY_AFTER": 30})
+class LaggingReplicaTests(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        dbrouting.health.clear()
+        self.data = seed(1, "lag")
+        self.url = f"/api/teams/teams/{self.data.team}/"
+        self.membership = TeamMembership.objects.get(user_id=self.data.members[0])
+        self.membership.role = Role.objects.get(pk=self.data.roles["Manager"])
+        self.membership.save()
+        self.member = self.membership.user
+        _copy_to_replica(User, Organization, Role, Team, TeamMembership)
+
+    def _change(self, **fields):
+        """Change the membership on the primary only; the commit bumps the org version."""
+        with self.captureOnCommitCallbacks(execute=True):
+            if fields:
+                TeamMembership.objects.filter(pk=self.membership.pk).update(**fields)
+                Team.objects.get(pk=self.data.team).save()  # update() sends no signals
+            else:
+                self.membership.delete()
+
+    def test_reads_go_to_the_replica(self):
+        Team.objects.using("replica").filter(pk=self.data.team).update(name="replica copy")
+        self.assertEqual(_client_for(self.member).get(self.url).data["name"], "replica copy")
+
+    def test_streamed_members_come_from_the_replica_too(self):
+        TeamMembership.objects.using("replica").filter(user=self.data.owner).delete()
+        response = _client_for(self.member).get(f"{self.url}members/?stream=1")
+        self.assertEqual(response.status_code, 200)
+        users = [json.loads(line)["user_id"] for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(users, [str(self.member.id)])  # the owner's membership is gone on the replica only
+
+    def test_removed_member_is_denied_although_the_replica_still_lists_them(self):
+        self.assertEqual(_client_for(self.member).get(self.url).status_code, 200)
+        self._change()
+        self.assertEqual(_client_for(self.member).get(self.url).status_code, 403)
+
+    def test_downgrade_is_not_cached_from_the_replica(self):
+        self._change(role=Role.objects.get(pk=self.data.roles["Viewer"]))
+        client = _client_for(self.member)
+        self.assertEqual(client.get(self.url).status_code, 200)  # resolves, and caches, permissions
+        self.assertEqual(client.patch(self.url, {"name": "renamed"}, format="json").status_code, 403)
+
+# ---- provisioning ----
+class ProvisioningTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com")
+
+    def test_default_roles_carry_the_system_capabilities(self):
+        result = provision_organization("Acme", self.owner.id)
+        self.assertEqual(
+            {role.name: role.capabilities for role in result.roles.values()},
+            {name: int(caps) for name, caps in SYSTEM_ROLE_CAPABILITIES.items()},
+        )
+        self.assertEqual(result.membership.role, result.roles["Owner"])
+        self.assertEqual(result.team.name, "General")
+
+    def test_template_overrides(self):
+        with self.settings(ORG_PROVISIONING={"ROLES": [{"name": "Editor", "capabilities": ["view", "write"]}],
+                                             "DEFAULT_TEAM": None}):
+            result = provision_organization("Acme", self.owner.id)
+        self.assertEqual(list(Role.objects.filter(org=result.org).values_list("name", "capabilities")),
+                         [("Editor", 3)])
+        self.assertIsNone(result.team)
+        self.assertFalse(Team.objects.filter(org=result.org).exists())
+
+    def test_command_reports_bad_rows_and_provisions_the_rest(self):
+        Organization.objects.create(name="Taken", owner=self.owner)
+        rows = [{"name": "Acme", "owner": "owner@example.com"}, {"name": ""},
+                {"name": "Ghost", "owner": "nobody@example.com"}, {"name": "Taken", "owner": "owner"}]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as fh:
+            fh.write("".join(json.dumps(row) + "\n" for row in rows) + "{not json\n")
+            fh.flush()
+            err = StringIO()
+            call_command("provision_orgs", fh.name, stdout=StringIO(), stderr=err)
+        errors = err.getvalue()
+        self.assertIn("line 2: name is required", errors)
+        self.assertIn("line 3: owner 'nobody@example.com' not found", errors)
+        self.assertIn("line 5:", errors)
+        self.assertEqual(sorted(Organization.objects.values_list("name", flat=True)), ["Acme", "Taken"])
+        self.assertEqual(Role.objects.filter(org__name="Acme").count(), len(SYSTEM_ROLE_CAPABILITIES))
+
+
+# ---- bench command ----
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    EMAIL_OUTBOX={"ON_COMMIT": None},
+)
+class BenchCommandTests(TransactionTestCase):
+    def test_reports_every_endpoint_and_cleans_up(self):
+        # one request in flight and no outbox sender thread: the in-memory SQLite test
+        # database locks tables across threads
+        with tempfile.NamedTemporaryFile("r", suffix=".json") as fh:
+            call_command("bench", "--requests", "3", "--concurrency", "1", "--users", "2", "--teams", "2",
+                         "--members", "3", "--output", fh.name, stdout=StringIO())
+            report = json.load(fh)
+        results = {(r["endpoint"], r["concurrency"]): r for r in report["results"]}
+        self.assertEqual(len(results), 6)
+        for key, result in results.items():
+            with self.subTest(run=key):
+                self.assertEqual((result["requests"], result["errors"]), (3, 0))
+                self.assertGreater(result["queries_per_request"], 0)
+                self.assertIsNotNone(result["cpu_ms_per_request"])
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Organization.objects.exists())
@@ -1,6 +1,9 @@
 from rest_framework.routers import DefaultRouter
-from django.urls import path, include
-from .views import OrganizationViewSet, TeamViewSet, RoleViewSet
+from django.urls import path, include, re_path
+from .views import (
+    OrganizationViewSet, TeamViewSet, RoleViewSet, AuthzCheckView, MembershipClaimsView,
+    PermissionCacheStatsView,
+)
 
 router = DefaultRouter()
 router.register(r"organizations", OrganizationViewSet, basename="organization")
@@ -8,5 +11,8 @@ router.register(r"teams", TeamViewSet, basename="team")
 router.register(r"roles", RoleViewSet, basename="role")
 
 urlpatterns = [
+    re_path(r"^authz/check/?$", AuthzCheckView.as_view(), name="authz-check"),
+    path("claims/", MembershipClaimsView.as_view(), name="membership-claims"),
+    path("admin/permission-cache/", PermissionCacheStatsView.as_view(), name="permission-cache-stats"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,9 @@
+import uuid
+
+
+def parse_uuid(value):
+    """UUID from client input (str, UUID or anything else), or None when it is not one."""
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
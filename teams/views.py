@@ -1,44 +1,115 @@
+import hashlib
+import json
+
 from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from users.models import User
 
+from . import bulk
 from .models import Organization, Team, Role, TeamMembership
 from .serializers import (
     OrganizationSerializer, TeamSerializer, RoleSerializer, TeamMembershipSerializer
 )
-from .permissions import IsOrgOwnerOrReadOnly, IsTeamReadable, TeamWriteByOwnerOrManager
+from .permissions import IsOrgOwnerOrReadOnly, IsTeamReadable, TeamWriteByCapability
+from .authz import teams_with_capability, visible_organizations, visible_teams
+from . import claims
+from .cache import get_permission_cache
+from .capabilities import Capability
+from .decisions import DecisionBatch
+from .renderers import NDJSONRenderer, ndjson_line
+from .signals import deferred_org_bump
+from .utils import parse_uuid
+from project_mgmt.dbrouting import ReplicaReadMixin
+from project_mgmt.pagination import KeysetPagination
+
+
+class OrganizationPagination(KeysetPagination):
+    ordering = ("name", "id")
+
+
+class TeamPagination(KeysetPagination):
+    ordering = ("org_id", "name", "id")
+
 
-class OrganizationViewSet(viewsets.ModelViewSet):
-    queryset = Organization.objects.all()
+class RolePagination(KeysetPagination):
+    ordering = ("name", "id")
+
+
+class MemberPagination(KeysetPagination):
+    ordering = ("joined_at", "id")
+
+
+class OrganizationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = Organization.objects.select_related("owner")  # OrganizationSerializer.owner
     serializer_class = OrganizationSerializer
     permission_classes = [permissions.IsAuthenticated, IsOrgOwnerOrReadOnly]
+    pagination_class = OrganizationPagination
 
     def get_queryset(self):
         # Org visible if user is owner OR belongs to any team in org
-        user = self.request.user
-        team_org_ids = TeamMembership.objects.filter(user=user, left_at__isnull=True).values_list("team__org_id", flat=True)
-        return Organization.objects.filter(id__in=list(team_org_ids)).union(
-            Organization.objects.filter(owner=user)
-        )
+        return visible_organizations(self.request.user, super().get_queryset())
+
+    def perform_destroy(self, instance):
+        # the cascade takes every team and membership with it: bump the org once
+        # rather than looking up each membership's org in its post_delete
+        with transaction.atomic(), deferred_org_bump(instance.pk):
+            instance.delete()
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Team.objects.select_related("org", "created_by")
     serializer_class = TeamSerializer
-    permission_classes = [permissions.IsAuthenticated, IsTeamReadable, TeamWriteByOwnerOrManager]
+    permission_classes = [permissions.IsAuthenticated, IsTeamReadable, TeamWriteByCapability]
+    pagination_class = TeamPagination
+
+    # capability each object action needs (see TeamWriteByCapability for the defaults)
+    required_capabilities = {
+        "destroy": Capability.DELETE_TEAM,
+        "add_member": Capability.MANAGE_MEMBERS,
+        "set_role": Capability.MANAGE_MEMBERS,
+        "remove_member": Capability.MANAGE_MEMBERS,
+        "bulk_add_members": Capability.MANAGE_MEMBERS,
+        "bulk_set_role": Capability.MANAGE_MEMBERS,
+        "bulk_remove_members": Capability.MANAGE_MEMBERS,
+    }
 
     def get_queryset(self):
-        user = self.request.user
         # A user can see teams where they are org owner or a member
-        owned_orgs = Organization.objects.filter(owner=user).values_list("id", flat=True)
-        member_team_ids = TeamMembership.objects.filter(user=user, left_at__isnull=True).values_list("team_id", flat=True)
-        return Team.objects.filter(org_id__in=owned_orgs).union(Team.objects.filter(id__in=member_team_ids))
+        qs = visible_teams(self.request.user, super().get_queryset())
+        # ?can=write[,manage_members]: only teams where the user holds those capabilities
+        can = self.request.query_params.get("can")
+        if can and self.action == "list":
+            try:
+                capability = Capability.parse(can.split(","))
+            except ValueError as exc:
+                raise ValidationError({"can": [str(exc)]})
+            qs = teams_with_capability(self.request.user, capability, qs)
+        return qs
+
+    def perform_destroy(self, instance):
+        # see OrganizationViewSet.perform_destroy
+        with transaction.atomic(), deferred_org_bump(instance.org_id):
+            instance.delete()
+
+    members_stream_chunk_size = 2000
 
     # ---- Membership operations ----
-    @action(detail=True, methods=["get"], url_path="members")
+    @action(detail=True, methods=["get"], url_path="members",
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer])
     def members(self, request, pk=None):
         team = self.get_object()
+        if request.query_params.get("stream") in ("1", "true") or request.accepted_renderer.format == "ndjson":
+            return self._stream_members(team)
         qs = TeamMembership.objects.select_related("user", "role").filter(team=team, left_at__isnull=True)
+        paginator = MemberPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
         data = [{
             "id": str(m.id),
             "user_id": str(m.user_id),
@@ -46,14 +117,36 @@ class TeamViewSet(viewsets.ModelViewSet):
             "email": m.user.email,
             "role": m.role.name if m.role else None,
             "joined_at": m.joined_at
-        } for m in qs]
-        return Response(data)
+        } for m in page]
+        return paginator.get_paginated_response(data)
+
+    def _stream_members(self, team):
+        """All active members as NDJSON, one row per line, without materializing the list."""
+        rows = TeamMembership.objects.filter(team=team, left_at__isnull=True).order_by(
+            "joined_at", "id"
+        ).values_list("id", "user_id", "user__username", "user__email", "role__name", "joined_at")
+        # the body is iterated after dispatch() has reset the request's read alias:
+        # pin the alias chosen for this request (a replica, unless the caller wrote recently)
+        rows = rows.using(rows.db)
+
+        def lines():
+            for m_id, user_id, username, email, role, joined_at in rows.iterator(chunk_size=self.members_stream_chunk_size):
+                yield ndjson_line({
+                    "id": str(m_id),
+                    "user_id": str(user_id),
+                    "username": username,
+                    "email": email,
+                    "role": role,
+                    "joined_at": joined_at,
+                })
+
+        return StreamingHttpResponse(lines(), content_type=NDJSONRenderer.media_type)
 
     @action(detail=True, methods=["post"], url_path="add-member")
     def add_member(self, request, pk=None):
+        # get_object() runs the Owner/Manager write check; the caller's
+        # memberships are memoized on the request so it costs no extra query
         team = self.get_object()
-        # write permission check: Owner/Manager
-        self.check_object_permissions(request, team)
         ser = TeamMembershipSerializer(data=request.data, context={"request": request})
         ser.is_valid(raise_exception=True)
         # enforce that membership is for this team
@@ -69,13 +162,12 @@ class TeamViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["put", "patch"], url_path="set-role")
     def set_role(self, request, pk=None):
         team = self.get_object()
-        self.check_object_permissions(request, team)
         user_id = request.data.get("user")
         role_id = request.data.get("role")  # can be null to clear
         m = get_object_or_404(TeamMembership, team=team, user_id=user_id, left_at__isnull=True)
         role = None
         if role_id:
-            role = get_object_or_404(Role, id=role_id, org=team.org)
+            role = get_object_or_404(Role, id=role_id, org_id=team.org_id)
         m.role = role
         m.save(update_fields=["role"])
         return Response({"detail": "role updated"})
@@ -83,23 +175,152 @@ class TeamViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["delete"], url_path="remove-member")
     def remove_member(self, request, pk=None):
         team = self.get_object()
-        self.check_object_permissions(request, team)
         user_id = request.query_params.get("user")
         m = get_object_or_404(TeamMembership, team=team, user_id=user_id, left_at__isnull=True)
         m.left_at = None  # hard-delete or set a timestamp; choose policy
         m.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    # ---- Bulk membership operations ----
+    # Body: {"members": [{"user": "<id>", "role": "<id or null>"}, ...]}
+    # One permission check, one transaction; per-item results in request order.
+    bulk_max_items = 1000
+
+    def _run_bulk(self, request, operation, *args):
+        team = self.get_object()
+        items = request.data.get("members") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "members must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response({"detail": f"at most {self.bulk_max_items} members per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic(), deferred_org_bump(team.org_id):
+            results = operation(team, items, *args)
+        return Response({
+            "succeeded": sum(1 for r in results if r["ok"]),
+            "failed": sum(1 for r in results if not r["ok"]),
+            "results": results,
+        })
+
+    @action(detail=True, methods=["post"], url_path="bulk-add-members")
+    def bulk_add_members(self, request, pk=None):
+        return self._run_bulk(request, bulk.bulk_add_members, request.user.id)
+
+    @action(detail=True, methods=["put", "patch"], url_path="bulk-set-role")
+    def bulk_set_role(self, request, pk=None):
+        return self._run_bulk(request, bulk.bulk_set_roles)
 
-class RoleViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    @action(detail=True, methods=["post"], url_path="bulk-remove-members")
+    def bulk_remove_members(self, request, pk=None):
+        return self._run_bulk(request, bulk.bulk_remove_members)
+
+
+class RoleViewSet(ReplicaReadMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """Read-only list of roles in an org (filter by ?org=<org_id>)."""
     queryset = Role.objects.select_related("org")
     serializer_class = RoleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RolePagination
 
     def get_queryset(self):
         qs = super().get_queryset()
         org_id = self.request.query_params.get("org")
         if org_id:
             qs = qs.filter(org_id=org_id)
-        return qs.order_by("name")
+        return qs.order_by("name", "id")
+
+
+class AuthzCheckView(APIView):
+    """
+    POST /api/teams/authz/check
+    Body: {"checks": [{"user": "<id>", "team": "<id>" | "org": "<id>", "action": "write"}, ...]}
+    Decisions in request order, resolved in a constant number of queries
+    (teams/decisions.py). Staff may ask about any user, others only about themselves.
+
+    The ETag is derived from the checks and the versions of the orgs involved,
+    so a caller can keep decisions and revalidate with If-None-Match: while no
+    membership, role, team or org changed, the answer is 304 without touching
+    memberships. Without a shared permission cache the ETag covers the decisions.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_checks = 1000
+    cache_max_age = 0   # seconds callers may reuse decisions without revalidating
+
+    def post(self, request, *args, **kwargs):
+        items = request.data.get("checks") if hasattr(request.data, "get") else None
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "checks must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_checks:
+            return Response({"detail": f"at most {self.max_checks} checks per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        batch = DecisionBatch(items, caller=request.user)
+        etag = None
+        cache = get_permission_cache()
+        if cache is not None and cache.shared and batch.all_found:
+            versions = cache.org_versions(batch.org_ids)
+            etag = self._etag([batch.cache_key(), sorted((str(k), v) for k, v in versions.items())])
+            if self._matches(request, etag):
+                return self._not_modified(etag)
+
+        results = batch.resolve()
+        if etag is None:
+            etag = self._etag(results)
+            if self._matches(request, etag):
+                return self._not_modified(etag)
+        return self._cacheable(Response({"results": results}), etag)
+
+    @staticmethod
+    def _etag(value) -> str:
+        return '"%s"' % hashlib.blake2b(json.dumps(value, default=str).encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _matches(request, etag) -> bool:
+        header = request.headers.get("If-None-Match", "")
+        return etag in {tag.strip() for tag in header.split(",")} or header.strip() == "*"
+
+    def _not_modified(self, etag):
+        return self._cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+    def _cacheable(self, response, etag):
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=self.cache_max_age, must_revalidate=True)
+        return response
+
+
+class PermissionCacheStatsView(APIView):
+    """
+    GET /api/teams/admin/permission-cache/
+    Hit/miss/invalidation counters of this process's permission cache (teams/cache.py).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        cache = get_permission_cache()
+        return Response(cache.stats() if cache is not None else {"backend": None})
+
+
+class MembershipClaimsView(APIView):
+    """
+    GET /api/teams/claims/[?user=<id>]
+    The full membership claim set (teams/claims.py) for the caller, or for any
+    user when the caller is staff. Services holding a token whose claim was cut
+    down to its stamp fetch this once per stamp; the stamp is also the ETag.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user_id = request.query_params.get("user") or request.user.id
+        if str(user_id) != str(request.user.id):
+            if not request.user.is_staff:
+                return Response({"detail": "only staff may read other users' claims"}, status=status.HTTP_403_FORBIDDEN)
+            user_id = get_object_or_404(User.objects.only("id"), pk=parse_uuid(user_id)).id
+        data = claims.full_claims(user_id)
+        etag = '"%s"' % data["v"]
+        if etag in {tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")}:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        return response
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, EmailVerificationToken, PasswordResetToken
+from .models import User, EmailVerificationToken, PasswordResetToken, RevokedToken, EmailOutbox
 
 
 class UserAdmin(BaseUserAdmin):
@@ -87,4 +87,19 @@ class PasswordResetTokenAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
 
 
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ("jti", "user", "revoked_at", "expires_at")
+    search_fields = ("jti", "user__username", "user__email")
+    ordering = ("-revoked_at",)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("to_email", "subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("to_email", "subject")
+    ordering = ("-created_at",)
+
+
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,154 @@
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from project_mgmt.caching import is_process_local, require_shared
+
+from .models import User
+from .revocation import is_token_revoked
+
+# Compact claims carried by every token we issue (see Principal.claims_for)
+USERNAME_CLAIM = "un"
+STAFF_CLAIM = "st"
+VERIFIED_CLAIM = "ev"
+TOKEN_VERSION_CLAIM = "tv"
+
+
+class UserState(NamedTuple):
+    """The only per-user facts checked on every request."""
+    is_active: bool
+    token_version: int
+
+
+def _state_alias() -> str:
+    return getattr(settings, "USER_STATE_CACHE_ALIAS", "default")
+
+
+def _state_cache():
+    return caches[_state_alias()]
+
+
+def check_user_state_cache():
+    """
+    Refuse to start with a per-process state cache behind several web processes:
+    logout-all or deactivation would only reach the worker that handled it.
+    """
+    alias = _state_alias()
+    require_shared(f"USER_STATE_CACHE_ALIAS ({alias!r})", is_process_local(alias))
+
+
+def _state_key(user_id) -> str:
+    return f"users:state:{user_id}"
+
+
+def get_user_state(user_id) -> Optional[UserState]:
+    """Cached (is_active, token_version); one tiny indexed query on a miss."""
+    cache = _state_cache()
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list("is_active", "token_version").first()
+        if row is None:
+            return None
+        state = tuple(row)
+        cache.set(key, state, getattr(settings, "USER_STATE_CACHE_TIMEOUT", 60))
+    return UserState(*state)
+
+
+def invalidate_user_state(user_id):
+    _state_cache().delete(_state_key(user_id))
+
+
+class Principal:
+    """
+    Lightweight authenticated user built from token claims.
+    Views that only need the id / username / staff flag never touch the DB;
+    any other attribute loads the full users.User once and delegates to it.
+    """
+    __slots__ = ("id", "username", "is_staff", "is_verified", "token_version", "_user")
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, username=None, is_staff=False, is_verified=False, token_version=0):
+        self.id = id
+        self.username = username
+        self.is_staff = is_staff
+        self.is_verified = is_verified
+        self.token_version = token_version
+        self._user = None
+
+    @classmethod
+    def from_token(cls, token) -> "Principal":
+        return cls(
+            id=User._meta.pk.to_python(token[jwt_settings.USER_ID_CLAIM]),
+            username=token.get(USERNAME_CLAIM),
+            is_staff=bool(token.get(STAFF_CLAIM, False)),
+            is_verified=bool(token.get(VERIFIED_CLAIM, False)),
+            token_version=token.get(TOKEN_VERSION_CLAIM, 0),
+        )
+
+    @staticmethod
+    def claims_for(user) -> dict:
+        return {
+            USERNAME_CLAIM: user.username,
+            STAFF_CLAIM: user.is_staff,
+            VERIFIED_CLAIM: user.is_verified,
+            TOKEN_VERSION_CLAIM: user.token_version,
+        }
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_user(self) -> User:
+        """Full model instance, loaded on first use."""
+        if self._user is None:
+            self._user = User.objects.get(pk=self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # only reached for attributes not defined on the principal itself
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+    def __eq__(self, other):
+        if isinstance(other, (Principal, User)):
+            return str(self.id) == str(other.pk)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self.id))
+
+    def __str__(self):
+        return self.username or str(self.id)
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request users.User query: the principal is
+    built from claims and checked against the cached UserState instead.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = User._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise AuthenticationFailed(_("Token contained no recognizable user identification"))
+
+        state = get_user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != state.token_version or is_token_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return Principal.from_token(validated_token)
@@ -0,0 +1,95 @@
+"""
+Helpers shared by the in-process benchmark commands (`bench_auth`, `bench`):
+throwaway accounts, login and verification bodies, a WSGI runner and latency percentiles.
+"""
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import cycle
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from users import verification
+from users.hashing import hash_password
+from users.models import EmailVerificationToken, User
+
+PASSWORD = "bench-password"
+
+
+class Sample(NamedTuple):
+    seconds: float
+    ok: bool
+    queries: Optional[int]   # None when not observable (e.g. against a remote server)
+
+
+def seed_users(prefix, count, password=PASSWORD) -> list:
+    """`count` verified accounts named <prefix>-<i>; password=None leaves them unusable."""
+    encoded = hash_password(password) if password else "!"  # one hash, shared by every account
+    now = timezone.now()
+    return User.objects.bulk_create([
+        User(username=f"{prefix}-{i}", email=f"{prefix}-{i}@bench.invalid", password=encoded, email_verified_at=now)
+        for i in range(count)
+    ])
+
+
+def login_bodies(accounts, n, password=PASSWORD) -> list:
+    accounts = cycle(accounts)
+    return [{"username": next(accounts).username, "password": password} for _ in range(n)]
+
+
+def verification_bodies(accounts, n) -> list:
+    """n verify-email bodies spread over `accounts`, in the configured EMAIL_VERIFICATION mode."""
+    accounts = cycle(accounts)
+    if verification.is_signed_mode():
+        return [{"token": verification.make_signed_token(next(accounts))} for _ in range(n)]
+    expires_at = timezone.now() + timezone.timedelta(hours=1)
+    tokens = EmailVerificationToken.objects.bulk_create([
+        EmailVerificationToken(user=next(accounts), expires_at=expires_at) for _ in range(n)
+    ])
+    return [{"token": str(t.token)} for t in tokens]
+
+
+@contextmanager
+def unthrottled():
+    """Let the test client in and turn rate limits off for in-process runs."""
+    # every request comes from one address: measure the views, not the rate limiter
+    no_limits = {**getattr(settings, "RATE_LIMITS", {}), "RULES": {}}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], RATE_LIMITS=no_limits):
+        yield
+
+
+def run_wsgi(requests, concurrency) -> list:
+    """
+    Send (method, path, body, headers) requests through the WSGI handler, `concurrency`
+    threads at a time; each Sample counts the queries its request ran.
+    """
+    def one(request):
+        method, path, body, headers = request
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        client = Client(headers=headers)
+        data = json.dumps(body) if body is not None else ""
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):  # `connection` is this thread's
+            response = client.generic(method.upper(), path, data, content_type="application/json")
+        return Sample(time.perf_counter() - started, response.status_code < 400, queries)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, requests))
+
+
+def percentiles(timings) -> dict:
+    """p50/p95/p99 of `timings`, in the same unit."""
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
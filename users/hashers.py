@@ -0,0 +1,54 @@
+"""
+Password hashers whose work factors come from settings.PASSWORD_HASHER_PARAMS,
+keyed by algorithm name, e.g.
+
+    PASSWORD_HASHER_PARAMS = {"pbkdf2_sha256": {"iterations": 600000}}
+
+so each deployment can use the values `manage.py calibrate_hashers` recommends
+for its hardware. Stored hashes are upgraded on login only when they are weaker
+than the configured parameters, never downgraded.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class TunedHasherMixin:
+    # hasher attribute -> key in self.decode(encoded)
+    tunable = {}
+
+    def __init__(self):
+        params = getattr(settings, "PASSWORD_HASHER_PARAMS", {}).get(self.algorithm, {})
+        for attr in self.tunable:
+            if attr in params:
+                setattr(self, attr, params[attr])
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        if any(decoded[key] < getattr(self, attr) for attr, key in self.tunable.items()):
+            return True
+        return hashers.must_update_salt(decoded["salt"], self.salt_entropy)
+
+
+class TunedPBKDF2PasswordHasher(TunedHasherMixin, hashers.PBKDF2PasswordHasher):
+    tunable = {"iterations": "iterations"}
+
+
+class TunedArgon2PasswordHasher(TunedHasherMixin, hashers.Argon2PasswordHasher):
+    tunable = {"time_cost": "time_cost", "memory_cost": "memory_cost", "parallelism": "parallelism"}
+
+
+class TunedBCryptSHA256PasswordHasher(TunedHasherMixin, hashers.BCryptSHA256PasswordHasher):
+    tunable = {"rounds": "work_factor"}
+
+
+class TunedScryptPasswordHasher(TunedHasherMixin, hashers.ScryptPasswordHasher):
+    tunable = {"work_factor": "work_factor"}
+
+
+@receiver(setting_changed)
+def _reset_hashers(setting, **kwargs):
+    if setting == "PASSWORD_HASHER_PARAMS":
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
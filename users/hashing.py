@@ -0,0 +1,280 @@
+"""
+Off-request password hashing.
+
+Password hashing is CPU-bound and takes tens of milliseconds, so it runs in a
+bounded process pool instead of on the request worker. Submissions beyond
+WORKERS + QUEUE_DEPTH wait up to QUEUE_TIMEOUT seconds and are then rejected
+with HashingPoolBusy (503), so a login storm sheds load instead of queueing
+every other request behind it. A crashed worker breaks a ProcessPoolExecutor
+for good: the pool is then replaced, and the requests it took down get a 503.
+
+Configured with settings.PASSWORD_HASHING_POOL; WORKERS = 0 hashes inline
+(tests, management commands, single-threaded dev).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.hashers import verify_password as _django_verify_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "WORKERS": 0,
+    "QUEUE_DEPTH": 64,
+    "QUEUE_TIMEOUT": 2.0,
+    "START_METHOD": "spawn",
+}
+
+
+class HashingPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server is busy, please retry shortly."
+    default_code = "hashing_pool_busy"
+
+
+# ---- worker side (must be importable top-level functions) ----
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _timed(func, *args):
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+def _hash(password):
+    return _timed(make_password, password)
+
+
+def _verify(password, encoded):
+    return _timed(_django_verify_password, password, encoded)
+
+
+# ---- parent side ----
+class HashingPool:
+    def __init__(self, workers=0, queue_depth=64, queue_timeout=2.0, start_method="spawn"):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_depth) if workers else None
+        self._executor = None
+        self._start_method = start_method
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"submitted": 0, "rejected": 0, "restarts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "hash_seconds": 0.0, "max_hash_seconds": 0.0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self._start_method),
+                    initializer=_init_worker,
+                    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "project_mgmt.settings"),),
+                )
+            return self._executor
+
+    def _replace_broken(self, executor):
+        """Drop an executor broken by a dead worker; the next submission starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already replaced by another caller
+            self._executor = None
+            self._stats["restarts"] += 1
+        logger.error("Password hashing worker died; restarting the pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, submitted_at, started_at, hash_seconds):
+        wait = max(0.0, started_at - submitted_at)
+        with self._lock:
+            s = self._stats
+            s["submitted"] += 1
+            s["wait_seconds"] += wait
+            s["max_wait_seconds"] = max(s["max_wait_seconds"], wait)
+            s["hash_seconds"] += hash_seconds
+            s["max_hash_seconds"] = max(s["max_hash_seconds"], hash_seconds)
+
+    def submit(self, func, *args, timeout=None) -> Future:
+        """
+        Run func in the pool; the returned future resolves to func's plain result.
+        Waits up to `timeout` (default QUEUE_TIMEOUT) for a queue slot; 0 means don't wait.
+        """
+        submitted_at = time.time()
+        outer = Future()
+
+        def finish(inner, executor=None):
+            if self._slots is not None:
+                with self._lock:
+                    self._in_flight -= 1
+                self._slots.release()
+            try:
+                result, started_at, hash_seconds = inner.result()
+            except BrokenProcessPool:
+                self._replace_broken(executor)
+                outer.set_exception(HashingPoolBusy())
+                return
+            except BaseException as exc:  # propagate worker failures to the caller
+                outer.set_exception(exc)
+                return
+            self._record(submitted_at, started_at, hash_seconds)
+            outer.set_result(result)
+
+        if self._slots is None:
+            inline = Future()
+            inline.set_result(func(*args))
+            finish(inline)
+            return outer
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        acquired = self._slots.acquire(blocking=False) if timeout == 0 else self._slots.acquire(timeout=timeout)
+        if not acquired:
+            if timeout:
+                with self._lock:
+                    self._stats["rejected"] += 1
+            raise HashingPoolBusy()
+        with self._lock:
+            self._in_flight += 1
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                inner = executor.submit(func, *args)
+            except BrokenProcessPool:  # broke since the last submission: retry once on a fresh pool
+                self._replace_broken(executor)
+                if attempt == 0:
+                    continue
+                finish(_failed(HashingPoolBusy()))
+                return outer
+            except BaseException as exc:
+                finish(_failed(exc))
+                raise
+            inner.add_done_callback(lambda f, executor=executor: finish(f, executor))
+            return outer
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+        done = data["submitted"] or 1
+        data["avg_wait_seconds"] = data["wait_seconds"] / done
+        data["avg_hash_seconds"] = data["hash_seconds"] / done
+        data["workers"] = self.workers
+        data["in_flight"] = self._in_flight   # running or waiting for a worker
+        return data
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def _failed(exc) -> Future:
+    future = Future()
+    future.set_exception(exc)
+    return future
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> HashingPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING_POOL", {})}
+            _pool = HashingPool(
+                workers=config["WORKERS"],
+                queue_depth=config["QUEUE_DEPTH"],
+                queue_timeout=config["QUEUE_TIMEOUT"],
+                start_method=config["START_METHOD"],
+            )
+        return _pool
+
+
+@receiver(setting_changed)
+def _reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting in ("PASSWORD_HASHING_POOL", "PASSWORD_HASHERS"):
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = None
+
+
+# ---- public entry points ----
+def hash_password(password) -> str:
+    return get_hashing_pool().submit(_hash, password).result()
+
+
+def verify_password(password, encoded) -> tuple[bool, bool]:
+    """Return (is_correct, must_update), like django.contrib.auth.hashers.verify_password."""
+    return get_hashing_pool().submit(_verify, password, encoded).result()
+
+
+async def _asubmit(func, *args):
+    pool = get_hashing_pool()
+    try:
+        future = pool.submit(func, *args, timeout=0)
+    except HashingPoolBusy:
+        # queue is full: wait for a slot on a thread, never on the event loop
+        future = await asyncio.to_thread(pool.submit, func, *args)
+    return await asyncio.wrap_future(future)
+
+
+async def ahash_password(password) -> str:
+    return await _asubmit(_hash, password)
+
+
+async def averify_password(password, encoded) -> tuple[bool, bool]:
+    return await _asubmit(_verify, password, encoded)
+
+
+# ---- bulk hashing (imports) ----
+class BulkHasher:
+    """
+    Dedicated process pool for hashing many passwords at once, separate from the
+    request pool so an import never competes with logins for its queue slots.
+    `map()` returns immediately; hashes are computed in the background and yielded
+    in order. workers=0 hashes inline.
+    """
+
+    def __init__(self, workers=None, start_method=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._executor = None
+        if self.workers:
+            config = {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING_POOL", {})}
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(start_method or config["START_METHOD"]),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "project_mgmt.settings"),),
+            )
+
+    def map(self, passwords):
+        passwords = list(passwords)
+        if self._executor is None:
+            return iter([make_password(p) for p in passwords])
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return self._executor.map(make_password, passwords, chunksize=chunksize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
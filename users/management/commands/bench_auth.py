@@ -0,0 +1,83 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.urls import reverse
+
+from users.benchmarking import login_bodies, percentiles, run_wsgi, seed_users, unthrottled, verification_bodies
+from users.models import User
+
+# endpoint -> (sync url name, async url name)
+ENDPOINTS = {
+    "login": ("users:login", "users:async-login"),
+    "verify-email": ("users:verify-email", "users:async-verify-email"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the sync (WSGI, one thread per in-flight request) and async (ASGI, one event loop) "
+        "auth endpoints in-process at the same concurrency and compare throughput and latency. "
+        "Creates throwaway users in the configured database and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and mode (default: 200).")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once (default: 50).")
+        parser.add_argument("--users", type=int, default=20, help="Seeded accounts to spread logins over (default: 20).")
+        parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), action="append",
+                            help="Endpoint to benchmark; repeatable (default: all).")
+
+    def handle(self, *args, **options):
+        n, concurrency = max(1, options["requests"]), max(1, options["concurrency"])
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        users = seed_users(prefix, max(1, options["users"]))
+        try:
+            with unthrottled():
+                for endpoint in options["endpoint"] or sorted(ENDPOINTS):
+                    sync_name, async_name = ENDPOINTS[endpoint]
+                    for mode, name in (("wsgi", sync_name), ("asgi", async_name)):
+                        bodies = self._bodies(endpoint, users, n)
+                        run = self._run_wsgi if mode == "wsgi" else self._run_asgi
+                        started = time.perf_counter()
+                        timings, errors = run(reverse(name), bodies, concurrency)
+                        self._report(endpoint, mode, timings, errors, time.perf_counter() - started)
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    @staticmethod
+    def _bodies(endpoint, users, n):
+        if endpoint == "login":
+            return login_bodies(users, n)
+        return verification_bodies(users, n)
+
+    @staticmethod
+    def _run_wsgi(url, bodies, concurrency):
+        samples = run_wsgi([("post", url, body, {}) for body in bodies], concurrency)
+        return [s.seconds for s in samples], sum(1 for s in samples if not s.ok)
+
+    @staticmethod
+    def _run_asgi(url, bodies, concurrency):
+        async def main():
+            client, gate = AsyncClient(), asyncio.Semaphore(concurrency)
+
+            async def one(body):
+                async with gate:
+                    started = time.perf_counter()
+                    response = await client.post(url, body, content_type="application/json")
+                    return time.perf_counter() - started, response.status_code < 400
+
+            return await asyncio.gather(*(one(body) for body in bodies))
+
+        results = asyncio.run(main())
+        return [t for t, _ in results], sum(1 for _, ok in results if not ok)
+
+    def _report(self, endpoint, mode, timings, errors, elapsed):
+        cuts = percentiles(timings)
+        self.stdout.write(
+            f"{endpoint:<13} {mode}: {len(timings) / elapsed:8.1f} req/s  "
+            f"p50 {cuts['p50'] * 1000:7.1f}ms  p95 {cuts['p95'] * 1000:7.1f}ms  p99 {cuts['p99'] * 1000:7.1f}ms  "
+            f"errors {errors}/{len(timings)}"
+        )
@@ -0,0 +1,108 @@
+import math
+import statistics
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from users.hashers import TunedHasherMixin
+
+# algorithm -> (attribute to tune, how cost scales with it)
+TUNABLE = {
+    "pbkdf2_sha256": ("iterations", "linear"),
+    "pbkdf2_sha1": ("iterations", "linear"),
+    "argon2": ("time_cost", "linear"),
+    "bcrypt_sha256": ("rounds", "log2"),
+    "bcrypt": ("rounds", "log2"),
+    "scrypt": ("work_factor", "pow2"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the configured PASSWORD_HASHERS on this host and recommend work factors "
+        "that hash one password in about --target-ms, never below Django's defaults. Prints a "
+        "PASSWORD_HASHER_PARAMS snippet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=100.0,
+                            help="Latency budget for hashing one password (default: 100ms).")
+        parser.add_argument("--samples", type=int, default=5,
+                            help="Timed hashes per measurement; the median is used (default: 5).")
+
+    def handle(self, *args, **options):
+        target = options["target_ms"] / 1000.0
+        samples = max(1, options["samples"])
+        recommended = {}
+
+        for hasher in get_hashers():
+            spec = TUNABLE.get(hasher.algorithm)
+            if spec is None:
+                self.stdout.write(f"{hasher.algorithm}: no tunable work factor, skipped")
+                continue
+            attr, scaling = spec
+            try:
+                current_value = getattr(hasher, attr)
+                current = self._measure(hasher, samples)
+            except (ImportError, ValueError) as exc:  # optional library (argon2/bcrypt) missing
+                self.stdout.write(f"{hasher.algorithm}: unavailable ({exc}), skipped")
+                continue
+
+            value = self._scale(current_value, current, target, scaling)
+            floor = getattr(type(hasher), attr)  # Django's built-in default for this hasher
+            if value < floor:
+                self.stdout.write(self.style.WARNING(
+                    f"{hasher.algorithm}: --target-ms would need {attr}={value}, below Django's default "
+                    f"of {floor}; recommending {floor}. Hash off the request path (PASSWORD_HASHING_POOL) "
+                    f"or add CPU rather than weakening stored passwords."
+                ))
+                value = floor
+            setattr(hasher, attr, value)
+            try:
+                tuned = self._measure(hasher, samples)
+            except ValueError as exc:  # e.g. scrypt exceeding OpenSSL's memory limit
+                self.stdout.write(f"{hasher.algorithm}: {attr}={value} not usable here ({exc}), skipped")
+                continue
+            finally:
+                setattr(hasher, attr, current_value)
+
+            self.stdout.write(
+                f"{hasher.algorithm}: {attr}={current_value} -> {current * 1000:.1f}ms; "
+                f"recommended {attr}={value} -> {tuned * 1000:.1f}ms"
+            )
+            if isinstance(hasher, TunedHasherMixin) and attr in hasher.tunable:
+                recommended[hasher.algorithm] = {attr: value}
+            elif hasher is get_hashers()[0]:
+                self.stdout.write(self.style.WARNING(
+                    f"  {type(hasher).__name__} reads {attr} from its class; use the matching "
+                    f"users.hashers.Tuned* hasher first in PASSWORD_HASHERS to apply this value."
+                ))
+
+        if recommended:
+            self.stdout.write("\n# settings.py (generated by calibrate_hashers)")
+            self.stdout.write("PASSWORD_HASHER_PARAMS = {")
+            for algorithm, params in recommended.items():
+                self.stdout.write(f"    {algorithm!r}: {params!r},")
+            self.stdout.write("}")
+
+    @staticmethod
+    def _measure(hasher, samples):
+        salt = hasher.salt()
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            hasher.encode("calibration-password", salt)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    @staticmethod
+    def _scale(value, measured, target, scaling):
+        ratio = target / measured if measured else 1.0
+        if scaling == "log2":  # bcrypt: cost doubles per round
+            return max(4, min(31, value + round(math.log2(ratio))))
+        if scaling == "pow2":  # scrypt: N must stay a power of two
+            return max(2, 2 ** round(math.log2(value * ratio)))
+        if value >= 10000:  # pbkdf2 iteration counts: round to thousands
+            return max(1000, int(round(value * ratio, -3)))
+        return max(1, round(value * ratio))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a private key for asymmetric JWT signing and print it as a JWT_SIGNING[\"KEYS\"] "
+        "entry. Add it to KEYS first, switch ACTIVE_KID once JWKS caches have it (see users/signing.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--algorithm", choices=["RS256", "ES256", "EdDSA"], default="EdDSA",
+                            help="Signing algorithm the key is for (default: EdDSA).")
+        parser.add_argument("--kid", help="Key id (default: current UTC timestamp).")
+        parser.add_argument("--rsa-bits", type=int, default=3072, help="RSA modulus size (default: 3072).")
+
+    def handle(self, *args, **options):
+        try:
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+        except ImportError:
+            raise CommandError("Asymmetric signing requires the cryptography package.")
+
+        algorithm = options["algorithm"]
+        if algorithm == "RS256":
+            key = rsa.generate_private_key(public_exponent=65537, key_size=options["rsa_bits"])
+        elif algorithm == "ES256":
+            key = ec.generate_private_key(ec.SECP256R1())
+        else:
+            key = ed25519.Ed25519PrivateKey.generate()
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        kid = options["kid"] or timezone.now().strftime("%Y%m%d%H%M%S")
+
+        self.stdout.write(f"# JWT_SIGNING[\"ALGORITHM\"] = {algorithm!r}; keep the PEM out of version control")
+        self.stdout.write(f"{{\"kid\": {kid!r}, \"private_key\": {pem!r}}}")
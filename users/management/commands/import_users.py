@@ -0,0 +1,204 @@
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from project_mgmt.rowfiles import detect_format, open_input, read_rows
+from teams.models import Role, Team, TeamMembership
+from teams.signals import bump_org_version
+from users.hashing import BulkHasher
+from users.models import User
+
+_validate_username = UnicodeUsernameValidator()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from CSV or JSONL (fields: username, email, password or password_hash, "
+        "first_name, last_name, team, role). Raw passwords are hashed in a process pool while the "
+        "previous batch is inserted with bulk_create. Existing usernames/emails are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="Input format (default: from the file extension, else csv).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users per INSERT (default: 1000).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Hashing processes (default: CPU count; 0 hashes inline).")
+        parser.add_argument("--verified", action="store_true", help="Mark imported emails as verified.")
+        parser.add_argument("--team", help="Team id to add every user to (rows may override with a team column).")
+        parser.add_argument("--role", help="Role name in the team's organization (rows may override).")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.verified_at = timezone.now() if options["verified"] else None
+        self.seen_usernames, self.seen_emails = set(), set()
+        self.teams, self.roles = {}, {}
+        self.counts = {"imported": 0, "skipped": 0, "failed": 0, "memberships": 0}
+        self.started = time.perf_counter()
+
+        with open_input(options["path"]) as stream, BulkHasher(options["workers"]) as hasher:
+            rows = read_rows(stream, detect_format(options["path"], options["format"]))
+            pending = None
+            while batch := list(islice(rows, max(1, options["batch_size"]))):
+                prepared = self._prepare(batch)
+                # hashes for this batch are computed while the previous batch is inserted
+                hashes = hasher.map(raw for _, _, raw, _ in prepared if raw is not None)
+                if pending:
+                    self._insert(*pending)
+                pending = (prepared, hashes)
+            if pending:
+                self._insert(*pending)
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.counts['imported']} imported, {self.counts['skipped']} skipped, "
+            f"{self.counts['failed']} failed, {self.counts['memberships']} memberships in {elapsed:.1f}s "
+            f"({self.counts['imported'] / elapsed if elapsed else 0:.0f} users/s)"
+        ))
+
+    # ---- validation ----
+    def _fail(self, line_no, message):
+        self.counts["failed"] += 1
+        self.stderr.write(f"line {line_no}: {message}")
+
+    def _prepare(self, batch):
+        """Validate a batch; returns [(line, User without password, raw password or None, (team, role_id))]."""
+        candidates = []
+        for line_no, row in batch:
+            if "_error" in row:
+                self._fail(line_no, row["_error"])
+                continue
+            username = str(row.get("username") or "").strip()
+            email = str(row.get("email") or "").strip().lower()
+            try:
+                _validate_username(username)
+                validate_email(email)
+            except ValidationError as exc:
+                self._fail(line_no, "; ".join(exc.messages))
+                continue
+            if username in self.seen_usernames or email in self.seen_emails:
+                self.counts["skipped"] += 1
+                continue
+            self.seen_usernames.add(username)
+            self.seen_emails.add(email)
+            candidates.append((line_no, row, username, email))
+
+        existing = User.objects.filter(
+            Q(username__in=[c[2] for c in candidates]) | Q(email__in=[c[3] for c in candidates])
+        ).values_list("username", "email")
+        taken_usernames, taken_emails = set(), set()
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+        self._load_teams(row.get("team") or self.options["team"] for _, row, _, _ in candidates)
+
+        prepared = []
+        for line_no, row, username, email in candidates:
+            if username in taken_usernames or email in taken_emails:
+                self.counts["skipped"] += 1
+                continue
+            try:
+                encoded, raw = self._password(row)
+                membership = self._membership(row)
+            except ValueError as exc:
+                self._fail(line_no, str(exc))
+                continue
+            user = User(
+                username=username,
+                email=email,
+                first_name=str(row.get("first_name") or ""),
+                last_name=str(row.get("last_name") or ""),
+                password=encoded or "",
+                email_verified_at=self.verified_at,
+            )
+            prepared.append((line_no, user, raw, membership))
+        return prepared
+
+    @staticmethod
+    def _password(row):
+        """(encoded, None) for a pre-hashed or missing password, (None, raw) to hash."""
+        encoded, raw = row.get("password_hash"), row.get("password")
+        if encoded:
+            if not isinstance(encoded, str):
+                raise ValueError("password_hash must be a string")
+            if not encoded.startswith(UNUSABLE_PASSWORD_PREFIX):
+                try:
+                    identify_hasher(encoded)
+                except ValueError:
+                    raise ValueError("password_hash uses an unknown or unconfigured hasher")
+            return encoded, None
+        if raw:
+            return None, str(raw)
+        return None, None
+
+    def _load_teams(self, team_ids):
+        wanted = {str(t) for t in team_ids if t} - set(self.teams)
+        if not wanted:
+            return
+        valid = []
+        for team_id in wanted:
+            try:
+                valid.append(Team._meta.pk.to_python(team_id))
+            except ValidationError:
+                self.teams[team_id] = None
+        found = {str(t.id): t for t in Team.objects.filter(id__in=valid)}
+        for team_id in wanted:
+            self.teams.setdefault(team_id, found.get(team_id))
+
+    def _role_id(self, team, name):
+        key = (team.org_id, name)
+        if key not in self.roles:
+            self.roles[key] = Role.objects.filter(org_id=team.org_id, name=name).values_list("id", flat=True).first()
+        return self.roles[key]
+
+    def _membership(self, row):
+        team_id = row.get("team") or self.options["team"]
+        if not team_id:
+            return None
+        team = self.teams.get(str(team_id))
+        if team is None:
+            raise ValueError(f"team {team_id} not found")
+        role_name = row.get("role") or self.options["role"]
+        role_id = None
+        if role_name:
+            role_id = self._role_id(team, role_name)
+            if role_id is None:
+                raise ValueError(f"role {role_name!r} not found in the team's organization")
+        return team, role_id
+
+    # ---- output ----
+    def _insert(self, prepared, hashes):
+        hashes = iter(hashes)
+        memberships, org_ids = [], set()
+        for _, user, raw, membership in prepared:
+            if raw is not None:
+                user.password = next(hashes)
+            elif not user.password:
+                user.set_unusable_password()
+            if membership:
+                team, role_id = membership
+                memberships.append(TeamMembership(team=team, user=user, role_id=role_id))
+                org_ids.add(team.org_id)
+
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user, _, _ in prepared])
+            TeamMembership.objects.bulk_create(memberships)
+            for org_id in org_ids:  # bulk_create sends no signals
+                bump_org_version(org_id)
+
+        self.counts["imported"] += len(prepared)
+        self.counts["memberships"] += len(memberships)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f"{self.counts['imported']} imported, {self.counts['skipped']} skipped, "
+            f"{self.counts['failed']} failed ({self.counts['imported'] / elapsed:.0f} users/s)"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from users.purge import purge_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete consumed or expired email-verification and password-reset tokens, and revoked "
+        "JTIs past their expiry, in primary-key-ordered chunks. Reports rows and rows/s per table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="Rows per DELETE (default: TOKEN_PURGE['CHUNK_SIZE']).")
+        parser.add_argument("--pause", type=float, default=None,
+                            help="Seconds to sleep between chunks (default: TOKEN_PURGE['PAUSE']).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be deleted without deleting it.")
+
+    def handle(self, *args, **options):
+        verb = "would delete" if options["dry_run"] else "deleted"
+        total = 0
+        for result in purge_tokens(options["chunk_size"], options["pause"], options["dry_run"]):
+            total += result.deleted
+            self.stdout.write(
+                f"{result.model}: {verb} {result.deleted} row(s) in {result.chunks} chunk(s), "
+                f"{result.seconds:.2f}s ({result.rate:.0f} rows/s)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Total: {verb} {total} row(s)."))
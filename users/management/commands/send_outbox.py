@@ -0,0 +1,44 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.outbox import close_quietly, deliver_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued EmailOutbox rows: claim ready rows in batches, send them over one "
+        "reused mail connection and reschedule failures with exponential backoff. "
+        "Runs until interrupted unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Rows claimed per batch (default: EMAIL_OUTBOX['BATCH_SIZE']).")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to sleep when nothing is ready (default: 2).")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is ready now and exit.")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total = 0
+        try:
+            while True:
+                claimed = deliver_batch(options["batch_size"], connection=connection)
+                total += claimed
+                if claimed:
+                    continue
+                if options["once"]:
+                    break
+                # idle: release the mail and DB connections until the next poll
+                close_quietly(connection)
+                close_old_connections()
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_quietly(connection)
+        self.stdout.write(f"Processed {total} outbox row(s).")
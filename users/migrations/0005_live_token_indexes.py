@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emailverificationtoken',
+            name='users_email_user_id_7816c5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='emailverificationtoken',
+            name='users_email_token_c6eae7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='passwordresettoken',
+            name='users_passw_user_id_d370fc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='passwordresettoken',
+            name='users_passw_token_b56ca3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(condition=models.Q(('consumed_at__isnull', True)), fields=['user', 'expires_at'], name='users_evt_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(condition=models.Q(('consumed_at__isnull', True)), fields=['user', 'expires_at'], name='users_prt_live_idx'),
+        ),
+    ]
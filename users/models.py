@@ -25,6 +25,9 @@ class User(AbstractUser):
     timezone = models.CharField(max_length=64, default="UTC")
     last_password_change_at = models.DateTimeField(null=True, blank=True)
 
+    # Carried in JWTs as the "tv" claim; tokens with an older version are rejected
+    token_version = models.PositiveIntegerField(default=0)
+
 
     def __str__(self):
         return self.username or self.email
@@ -34,15 +37,62 @@ class User(AbstractUser):
             self.email_verified_at = timezone.now()
             self.save(update_fields=["email_verified_at"])
 
+    async def amark_email_verified(self):
+        if not self.email_verified_at:
+            self.email_verified_at = timezone.now()
+            await self.asave(update_fields=["email_verified_at"])
+
     @property
     def is_verified(self) -> bool:
         return self.email_verified_at is not None
 
+    def set_password(self, raw_password):
+        #   Hash in the bounded hashing pool (users/hashing.py) rather than on the request worker
+        from .hashing import hash_password
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+        self.last_password_change_at = timezone.now()
+
+    async def aset_password(self, raw_password):
+        from .hashing import ahash_password
+        self.password = await ahash_password(raw_password)
+        self._password = raw_password
+        self.last_password_change_at = timezone.now()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember access flags as loaded, so save() can tell when they are taken away
+        instance._loaded_access = tuple(
+            getattr(instance, f) if f in field_names else None
+            for f in ("is_active", "is_staff", "is_superuser")
+        )
+        return instance
+
+    def _revokes_tokens(self) -> bool:
+        """Password changed, or the account lost active/staff/superuser status."""
+        if self._state.adding:
+            return False
+        if self._password is not None:
+            return True
+        loaded = getattr(self, "_loaded_access", None)
+        if loaded is None:
+            return False
+        current = (self.is_active, self.is_staff, self.is_superuser)
+        return any(before and not after for before, after in zip(loaded, current))
+
     def save(self, *args, **kwargs):
         #   Normalize email to lowercase before saving
         if self.email:
             self.email = self.email.strip().lower()
+        #   Invalidate all outstanding JWTs (see users/revocation.py)
+        if self._revokes_tokens():
+            self.token_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version", "last_password_change_at"}
         super().save(*args, **kwargs)
+        self._loaded_access = (self.is_active, self.is_staff, self.is_superuser)
 
     class Meta:
         # Case-insensitive uniqueness for email at the DB level
@@ -97,10 +147,18 @@ class EmailVerificationToken(models.Model):
         if commit:
             self.save(update_fields=["consumed_at"])
 
+    async def amark_consumed(self):
+        self.consumed_at = timezone.now()
+        await self.asave(update_fields=["consumed_at"])
+
     class Meta:
         indexes = [
-            models.Index(fields=["user", "expires_at"]),
-            models.Index(fields=["token"]),
+            # live (unconsumed) tokens per user only; `token` is already indexed by its unique constraint
+            models.Index(
+                fields=["user", "expires_at"],
+                name="users_evt_live_idx",
+                condition=models.Q(consumed_at__isnull=True),
+            ),
         ]
 
 
@@ -145,6 +203,70 @@ class PasswordResetToken(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=["user", "expires_at"]),
-            models.Index(fields=["token"]),
+            # live (unconsumed) tokens per user only; `token` is already indexed by its unique constraint
+            models.Index(
+                fields=["user", "expires_at"],
+                name="users_prt_live_idx",
+                condition=models.Q(consumed_at__isnull=True),
+            ),
+        ]
+
+
+class RevokedToken(models.Model):
+    """
+    Exact store behind the in-memory JTI denylist (users/revocation.py).
+    Rows are only needed until the token would have expired anyway.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    jti = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name="revoked_tokens"
+    )
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["revoked_at"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email, written in the same transaction as whatever triggered it
+    and delivered after commit by users/outbox.py (in-process or `manage.py send_outbox`).
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # earliest time a sender may claim the row; claiming pushes it forward by a lease
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Email to {self.to_email}: {self.subject}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="users_outbox_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
         ]
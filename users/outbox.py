@@ -0,0 +1,173 @@
+"""
+Transactional email outbox.
+
+`enqueue_email()` writes an EmailOutbox row inside the caller's transaction, so
+an email exists if and only if the user/token it refers to was committed, and
+the request never waits on the mail provider. Rows are delivered by
+`deliver_batch()`, which claims ready rows, sends them over one reused backend
+connection and reschedules failures with exponential backoff:
+
+- after commit, according to EMAIL_OUTBOX["ON_COMMIT"]: "thread" wakes an
+  in-process sender thread, "inline" delivers in the committing thread
+  (dev/tests), None leaves everything to the worker;
+- `manage.py send_outbox`, which also picks up retries and rows whose sender
+  died mid-batch (a claim is only a lease on `next_attempt_at`).
+"""
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ON_COMMIT": "thread",
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 8,
+    "BACKOFF_BASE": 30.0,      # seconds before the first retry; doubles per attempt
+    "BACKOFF_MAX": 3600.0,
+    "LEASE_SECONDS": 300.0,    # a claimed row becomes claimable again after this
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "EMAIL_OUTBOX", {})}
+
+
+def enqueue_email(to_email, subject, body) -> EmailOutbox:
+    """Queue one email in the current transaction; delivery starts after commit."""
+    row = EmailOutbox.objects.create(to_email=to_email, subject=subject, body=body)
+    mode = get_config()["ON_COMMIT"]
+    if mode == "thread":
+        transaction.on_commit(_dispatcher.wake)
+    elif mode == "inline":
+        transaction.on_commit(deliver_pending)
+    return row
+
+
+def backoff(attempts: int, config=None) -> timedelta:
+    """Delay before retrying a row that has failed `attempts` times (with jitter)."""
+    config = config or get_config()
+    delay = min(config["BACKOFF_MAX"], config["BACKOFF_BASE"] * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_batch(limit: int, config=None) -> list:
+    """Claim up to `limit` ready rows by moving them out of reach for one lease."""
+    config = config or get_config()
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        if rows:
+            EmailOutbox.objects.filter(id__in=[r.id for r in rows]).update(
+                attempts=F("attempts") + 1,
+                next_attempt_at=now + timedelta(seconds=config["LEASE_SECONDS"]),
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def deliver_batch(limit=None, connection=None) -> int:
+    """
+    Claim and send one batch. Returns the number of rows claimed (0 = nothing ready).
+    Pass a backend `connection` to keep it open across batches.
+    """
+    config = get_config()
+    rows = claim_batch(limit or config["BATCH_SIZE"], config)
+    if not rows:
+        return 0
+
+    owns_connection = connection is None
+    connection = connection or get_connection()
+    sent, failed = [], []
+    try:
+        for row in rows:
+            message = EmailMessage(row.subject, row.body, settings.DEFAULT_FROM_EMAIL, [row.to_email])
+            try:
+                connection.open()  # no-op while the connection is still up
+                if not connection.send_messages([message]):
+                    raise RuntimeError("backend reported the message as not sent")
+            except Exception as exc:
+                row.last_error = f"{type(exc).__name__}: {exc}"
+                failed.append(row)
+                close_quietly(connection)  # reconnect for the next message
+            else:
+                sent.append(row)
+    finally:
+        if owns_connection:
+            close_quietly(connection)
+
+    now = timezone.now()
+    if sent:
+        EmailOutbox.objects.filter(id__in=[r.id for r in sent]).update(
+            status=EmailOutbox.SENT, sent_at=now, last_error=""
+        )
+    for row in failed:
+        if row.attempts >= config["MAX_ATTEMPTS"]:
+            row.status = EmailOutbox.FAILED
+            logger.error("Giving up on outbox email %s after %s attempts: %s", row.id, row.attempts, row.last_error)
+        else:
+            row.next_attempt_at = now + backoff(row.attempts, config)
+    if failed:
+        EmailOutbox.objects.bulk_update(failed, ["status", "next_attempt_at", "last_error"])
+    return len(rows)
+
+
+def deliver_pending(connection=None) -> int:
+    """Deliver batches until nothing is ready; returns the number of rows handled."""
+    total = 0
+    while True:
+        claimed = deliver_batch(connection=connection)
+        if not claimed:
+            return total
+        total += claimed
+
+
+class _Dispatcher:
+    """Daemon thread that drains the outbox whenever a transaction enqueues mail."""
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                deliver_pending()
+            except Exception:
+                logger.exception("Outbox delivery failed; rows stay queued for send_outbox")
+            finally:
+                close_old_connections()
+
+
+_dispatcher = _Dispatcher()
@@ -0,0 +1,127 @@
+"""
+Purge of dead token rows.
+
+Verification and reset tokens are dead once consumed or expired; revoked JTIs
+once the token they deny would have expired anyway. Rows are deleted in
+primary-key-ordered chunks, each chunk its own short DELETE ... WHERE pk IN (...),
+so no statement holds locks on more than CHUNK_SIZE rows.
+
+Run `manage.py purge_tokens` from cron, or set TOKEN_PURGE["INTERVAL"] to let
+web processes kick off a background purge at most once per interval across the
+deployment (coordinated through the default cache).
+"""
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EmailVerificationToken, PasswordResetToken, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "INTERVAL": None,     # seconds between background purges; None = only via the command
+    "CHUNK_SIZE": 1000,
+    "PAUSE": 0.0,         # seconds to sleep between chunks
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "TOKEN_PURGE", {})}
+
+
+def dead_rows(now=None) -> dict:
+    """model -> filter matching rows that can be deleted."""
+    now = now or timezone.now()
+    spent = Q(consumed_at__isnull=False) | Q(expires_at__lte=now)
+    return {
+        EmailVerificationToken: spent,
+        PasswordResetToken: spent,
+        RevokedToken: Q(expires_at__lte=now),
+    }
+
+
+class PurgeResult(NamedTuple):
+    model: str
+    deleted: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+
+def purge_model(model, condition, chunk_size=1000, pause=0.0, dry_run=False) -> PurgeResult:
+    started = time.perf_counter()
+    deleted = chunks = 0
+    last_pk = None
+    while True:
+        qs = model.objects.filter(condition).order_by("pk")
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        pks = list(qs.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        chunks += 1
+        if dry_run:
+            deleted += len(pks)
+        else:
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+        if len(pks) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return PurgeResult(model._meta.label, deleted, chunks, time.perf_counter() - started)
+
+
+def purge_tokens(chunk_size=None, pause=None, dry_run=False) -> list:
+    config = get_config()
+    chunk_size = chunk_size or config["CHUNK_SIZE"]
+    pause = config["PAUSE"] if pause is None else pause
+    return [
+        purge_model(model, condition, chunk_size, pause, dry_run)
+        for model, condition in dead_rows().items()
+    ]
+
+
+# ---- Periodic hook (request_finished, see users/signals.py) ----
+
+_LOCK_KEY = "users:purge:lock"
+_next_check = 0.0
+_check_lock = threading.Lock()
+
+
+def maybe_schedule_purge():
+    """Start a background purge if TOKEN_PURGE["INTERVAL"] has elapsed; cheap no-op otherwise."""
+    global _next_check
+    interval = get_config()["INTERVAL"]
+    if not interval:
+        return
+    now = time.monotonic()
+    if now < _next_check:
+        return
+    with _check_lock:
+        if now < _next_check:
+            return
+        _next_check = now + interval
+    if cache.add(_LOCK_KEY, 1, timeout=interval):  # one process per interval
+        threading.Thread(target=_periodic_purge, name="token-purge", daemon=True).start()
+
+
+def _periodic_purge():
+    try:
+        for result in purge_tokens():
+            if result.deleted:
+                logger.info("Purged %s %s rows in %.2fs", result.deleted, result.model, result.seconds)
+    except Exception:
+        logger.exception("Periodic token purge failed")
+    finally:
+        close_old_connections()
@@ -0,0 +1,343 @@
+"""
+Sliding-window rate limiting for the public auth endpoints.
+
+Each scope ("login", "signup", "resend") has rules in settings.RATE_LIMITS that
+cap requests per key (client IP, login identifier or email) over a window.
+Counts use the sliding-window approximation: the current fixed bucket plus the
+previous one weighted by how much of it still overlaps the window, so each
+check is one increment and one read regardless of traffic.
+
+Checks run in the throttle phase, before the serializer touches the database
+or the hashing pool. Failed logins additionally feed a progressive lockout per
+identifier: after THRESHOLD failures within WINDOW seconds the identifier is
+locked for BASE seconds, doubling with every further failure up to MAX.
+
+Backends mirror teams/cache.py: LocalRateLimiter (per process) or
+CacheRateLimiter (shared through a Django cache alias).
+"""
+import hashlib
+import heapq
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    "BACKEND": "users.ratelimit.LocalRateLimiter",
+    "OPTIONS": {},
+    "RULES": {},
+    # reverse proxies in front of the app that append to X-Forwarded-For; 0 keys "ip" on REMOTE_ADDR
+    "NUM_PROXIES": 0,
+    "LOCKOUT": {"THRESHOLD": 5, "WINDOW": 900, "BASE": 30, "MAX": 3600},
+}
+
+
+class BaseRateLimiter:
+    """Sliding-window counters and lockouts over four storage primitives."""
+
+    def __init__(self):
+        self.counters = Counter()
+
+    def _incr(self, key, timeout) -> int:
+        raise NotImplementedError
+
+    def _get(self, key, default=None):
+        raise NotImplementedError
+
+    def _set(self, key, value, timeout):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def hit(self, name, window, now=None) -> float:
+        """Count one event for `name` and return the events seen in the last `window` seconds."""
+        now = time.time() if now is None else now
+        bucket, offset = divmod(now, window)
+        bucket = int(bucket)
+        current = self._incr(f"{name}:{window}:{bucket}", timeout=int(window * 2) + 1)
+        previous = self._get(f"{name}:{window}:{bucket - 1}", 0)
+        return previous * (1 - offset / window) + current
+
+    def locked_for(self, name, now=None) -> float:
+        """Seconds left on a lockout for `name` (0 when not locked)."""
+        until = self._get(f"lock:{name}")
+        now = time.time() if now is None else now
+        return max(0.0, until - now) if until else 0.0
+
+    def lock(self, name, seconds, now=None):
+        now = time.time() if now is None else now
+        self._set(f"lock:{name}", now + seconds, timeout=int(seconds) + 1)
+
+    def unlock(self, name):
+        self._delete(f"lock:{name}")
+
+    def reset(self, name, window, now=None):
+        now = time.time() if now is None else now
+        bucket = int(now // window)
+        self._delete(f"{name}:{window}:{bucket}")
+        self._delete(f"{name}:{window}:{bucket - 1}")
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__, **self.counters}
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """
+    In-process counters; each worker process enforces its own limits.
+    Expiries are kept in a heap: expired entries are swept at most once per
+    `prune_interval` seconds, and past `max_entries` the soonest-expiring
+    entries are evicted, so the dict stays bounded even when every entry is live.
+    """
+
+    def __init__(self, max_entries=100000, prune_interval=1.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (value, expires_at)
+        self._expiries = []  # heap of (expires_at, key); stale pairs are skipped when popped
+        self._next_prune = 0.0
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _store(self, key, value, expires_at, now):
+        entry = self._entries.get(key)
+        self._entries[key] = (value, expires_at)
+        if entry is None or entry[1] != expires_at:
+            heapq.heappush(self._expiries, (expires_at, key))
+        if now >= self._next_prune:
+            self._next_prune = now + self.prune_interval
+            self._evict(lambda expires_at: expires_at <= now)
+        if len(self._entries) > self.max_entries:
+            self._evict(lambda expires_at: len(self._entries) > self.max_entries)
+        if len(self._expiries) > 2 * len(self._entries) + 64:
+            self._expiries = [(e[1], k) for k, e in self._entries.items()]
+            heapq.heapify(self._expiries)
+
+    def _evict(self, more):
+        """Pop entries in expiry order while more(expires_at) holds."""
+        while self._expiries and more(self._expiries[0][0]):
+            expires_at, key = heapq.heappop(self._expiries)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+
+    def _incr(self, key, timeout):
+        now = time.time()
+        with self._lock:
+            entry = self._live(key, now)
+            value = entry[0] + 1 if entry else 1
+            self._store(key, value, entry[1] if entry else now + timeout, now)
+            return value
+
+    def _get(self, key, default=None):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else default
+
+    def _set(self, key, value, timeout):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now + timeout, now)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        data = super().stats()
+        data["entries"] = len(self._entries)
+        return data
+
+
+class CacheRateLimiter(BaseRateLimiter):
+    """Counters shared across processes and nodes through a Django cache alias."""
+
+    def __init__(self, alias="default", key_prefix="users:rl"):
+        super().__init__()
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def _incr(self, key, timeout):
+        key = self._key(key)
+        if self._cache.add(key, 1, timeout):
+            return 1
+        try:
+            return self._cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            self._cache.set(key, 1, timeout)
+            return 1
+
+    def _get(self, key, default=None):
+        return self._cache.get(self._key(key), default)
+
+    def _set(self, key, value, timeout):
+        self._cache.set(self._key(key), value, timeout)
+
+    def _delete(self, key):
+        self._cache.delete(self._key(key))
+
+
+_rate_limiter = None
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "RATE_LIMITS", {})}
+
+
+def get_rate_limiter() -> BaseRateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        config = get_config()
+        _rate_limiter = import_string(config["BACKEND"])(**config["OPTIONS"])
+    return _rate_limiter
+
+
+@receiver(setting_changed)
+def _reset_rate_limiter(setting, **kwargs):
+    global _rate_limiter
+    if setting == "RATE_LIMITS":
+        _rate_limiter = None
+
+
+def _lockout_config() -> dict:
+    return {**DEFAULTS["LOCKOUT"], **get_config()["LOCKOUT"]}
+
+
+def _digest(value) -> str:
+    # bounded, cache-safe keys whatever the client sends
+    return hashlib.blake2b(str(value).encode(), digest_size=12).hexdigest()
+
+
+def _normalize(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def client_ip(request) -> str:
+    """
+    REMOTE_ADDR, or with NUM_PROXIES trusted proxies in front, the address the
+    outermost of them saw (X-Forwarded-For entries left of it are client-supplied).
+    """
+    remote_addr = request.META.get("REMOTE_ADDR", "")
+    num_proxies = get_config()["NUM_PROXIES"]
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if not num_proxies or not forwarded:
+        return remote_addr
+    addrs = [a.strip() for a in forwarded.split(",") if a.strip()]
+    return addrs[-min(num_proxies, len(addrs))] if addrs else remote_addr
+
+
+def request_keys(request, data) -> dict:
+    """Values each rule can be keyed on; missing ones are skipped by check()."""
+    data = data if hasattr(data, "get") else {}
+    return {
+        "ip": client_ip(request),
+        "identifier": _normalize(data.get("username")),
+        "email": _normalize(data.get("email")),
+    }
+
+
+def check(scope, request, data) -> Optional[float]:
+    """Count this request against the scope's rules; return seconds to wait if it must be rejected."""
+    config = get_config()
+    limiter = get_rate_limiter()
+    keys = request_keys(request, data)
+
+    if scope == "login" and keys["identifier"]:
+        locked = limiter.locked_for(f"login:{_digest(keys['identifier'])}")
+        if locked:
+            limiter.counters[f"{scope}:locked"] += 1
+            return locked
+
+    wait = None
+    for rule in config["RULES"].get(scope, []):
+        value = keys.get(rule["key"])
+        if not value:
+            continue
+        window = rule["window"]
+        count = limiter.hit(f"{scope}:{rule['key']}:{_digest(value)}", window)
+        if count > rule["limit"]:
+            limiter.counters[f"{scope}:rejected:{rule['key']}"] += 1
+            # rough time until the weighted count drops back under the limit
+            wait = max(wait or 1.0, window * (1 - rule["limit"] / count))
+    if wait is None:
+        limiter.counters[f"{scope}:allowed"] += 1
+    return wait
+
+
+def record_login_failure(identifier):
+    """Count a failed login; lock the identifier once failures reach the threshold."""
+    identifier = _normalize(identifier)
+    if not identifier:
+        return
+    lockout = _lockout_config()
+    limiter = get_rate_limiter()
+    name = f"login:{_digest(identifier)}"
+    limiter.counters["login:failures"] += 1
+    failures = limiter.hit(f"fail:{name}", lockout["WINDOW"])
+    excess = int(failures) - lockout["THRESHOLD"]
+    if excess >= 0:
+        limiter.lock(name, min(lockout["MAX"], lockout["BASE"] * 2 ** excess))
+        limiter.counters["login:lockouts"] += 1
+
+
+def clear_login_failures(identifier):
+    identifier = _normalize(identifier)
+    if not identifier:
+        return
+    name = f"login:{_digest(identifier)}"
+    limiter = get_rate_limiter()
+    limiter.reset(f"fail:{name}", _lockout_config()["WINDOW"])
+    limiter.unlock(name)
+
+
+class AuthRateThrottle(BaseThrottle):
+    """DRF throttle applying RATE_LIMITS rules for the view's `throttle_scope`."""
+
+    def allow_request(self, request, view):
+        self._wait = check(view.throttle_scope, request, request.data)
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
+
+
+async def _off_loop(func, *args):
+    # in-process counters are a dict update; a shared cache is a network round trip
+    if isinstance(get_rate_limiter(), LocalRateLimiter):
+        return func(*args)
+    return await sync_to_async(func, thread_sensitive=False)(*args)
+
+
+async def acheck(scope, request, data) -> Optional[float]:
+    return await _off_loop(check, scope, request, data)
+
+
+async def arecord_login_failure(identifier):
+    await _off_loop(record_login_failure, identifier)
+
+
+async def aclear_login_failures(identifier):
+    await _off_loop(clear_login_failures, identifier)
+
@@ -0,0 +1,156 @@
+"""
+Token revocation.
+
+Two mechanisms, neither of which costs a query on the hot path:
+
+- Per-user token versions: User.token_version is embedded in every token as the
+  "tv" claim and compared against the cached UserState (users/authentication.py).
+  Bumping it (password change, deactivation, privilege removal, logout-all)
+  invalidates every token the user holds.
+- Per-token (JTI) denylist: revoked JTIs are stored exactly in RevokedToken and
+  mirrored into an in-process Bloom filter. A request only reaches the table when
+  the filter says "maybe" (a real revocation or a rare false positive). Each
+  process pulls newly revoked JTIs every REFRESH_INTERVAL seconds and rebuilds
+  the filter every REBUILD_INTERVAL seconds so expired entries age out.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import RevokedToken, User
+
+DEFAULTS = {
+    "FILTER_BITS": 1 << 20,     # 128 KiB; ~1% false positives at ~100k live revocations
+    "FILTER_HASHES": 7,
+    "REFRESH_INTERVAL": 5.0,
+    "REBUILD_INTERVAL": 3600.0,
+}
+
+# how far back each incremental refresh looks, to catch rows committed out of order
+_REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value: str):
+        for pos in self._positions(value):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: str) -> bool:
+        array = self._array
+        return all(array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class JTIDenylist:
+    def __init__(self, bits, hashes, refresh_interval, rebuild_interval):
+        self._bits, self._hashes = bits, hashes
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._filter = None
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        self.stats = {"checks": 0, "filter_negatives": 0, "store_lookups": 0, "false_positives": 0}
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._filter is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+            rebuild = self._filter is None or now - self._built_at >= self.rebuild_interval
+            target = BloomFilter(self._bits, self._hashes) if rebuild else self._filter
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            if not rebuild and self._watermark is not None:
+                rows = rows.filter(revoked_at__gte=self._watermark - _REFRESH_OVERLAP)
+            watermark = self._watermark if not rebuild else None
+            for jti, revoked_at in rows.values_list("jti", "revoked_at").iterator(chunk_size=5000):
+                target.add(jti)
+                watermark = revoked_at if watermark is None else max(watermark, revoked_at)
+            self._filter, self._watermark, self._refreshed_at = target, watermark, now
+            if rebuild:
+                self._built_at = now
+
+    def add(self, jti: str):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def is_revoked(self, jti) -> bool:
+        if not jti:
+            return False
+        self._sync()
+        self.stats["checks"] += 1
+        if jti not in self._filter:
+            self.stats["filter_negatives"] += 1
+            return False
+        self.stats["store_lookups"] += 1
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        if not revoked:
+            self.stats["false_positives"] += 1
+        return revoked
+
+
+_denylist = None
+
+
+def get_denylist() -> JTIDenylist:
+    global _denylist
+    if _denylist is None:
+        config = {**DEFAULTS, **getattr(settings, "TOKEN_DENYLIST", {})}
+        _denylist = JTIDenylist(
+            bits=config["FILTER_BITS"],
+            hashes=config["FILTER_HASHES"],
+            refresh_interval=config["REFRESH_INTERVAL"],
+            rebuild_interval=config["REBUILD_INTERVAL"],
+        )
+    return _denylist
+
+
+@receiver(setting_changed)
+def _reset_denylist(setting, **kwargs):
+    global _denylist
+    if setting == "TOKEN_DENYLIST":
+        _denylist = None
+
+
+def is_token_revoked(token) -> bool:
+    return get_denylist().is_revoked(token.get(jwt_settings.JTI_CLAIM))
+
+
+def revoke_token(token, user_id=None):
+    """Deny one access/refresh token until it expires."""
+    jti = token.get(jwt_settings.JTI_CLAIM)
+    if not jti:
+        return
+    expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+    RevokedToken.objects.get_or_create(jti=jti, defaults={"user_id": user_id, "expires_at": expires_at})
+    get_denylist().add(jti)
+
+
+def revoke_all_tokens(user_id):
+    """Invalidate every token a user holds by bumping their token version."""
+    from .authentication import invalidate_user_state
+
+    User.objects.filter(pk=user_id).update(token_version=F("token_version") + 1)
+    invalidate_user_state(user_id)
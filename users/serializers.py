@@ -1,11 +1,25 @@
 # users/serializers.py
-from django.contrib.auth import get_user_model, authenticate
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import TOKEN_VERSION_CLAIM, Principal, get_user_state
+from .revocation import is_token_revoked, revoke_token
+from .hashing import ahash_password, averify_password, hash_password, verify_password
 from .models import EmailVerificationToken
+from .outbox import enqueue_email
+from . import ratelimit, verification
 from django.urls import reverse
+from teams import claims as membership_claims
 
 User = get_user_model()
 
@@ -17,6 +31,54 @@ class UserListSerializer(serializers.ModelSerializer):
 
 # ================================================================================
 
+class AsyncValidationMixin:
+    """
+    is_valid() for the async views in users/views.py: field-level validation
+    runs as usual (it never queries), then `avalidate()` does the lookups with the
+    async ORM instead of `validate()`.
+    """
+    async def ais_valid(self, raise_exception=False):
+        try:
+            attrs = self.to_internal_value(self.initial_data)
+            self._validated_data = await self.avalidate(attrs)
+        except serializers.ValidationError as exc:
+            self._validated_data = {}
+            self._errors = serializers.as_serializer_error(exc)
+        else:
+            self._errors = {}
+        if self._errors and raise_exception:
+            raise serializers.ValidationError(self.errors)
+        return not bool(self._errors)
+
+
+def _verification_url(request, token_value) -> str:
+    verify_path = reverse("users:verify-email")  # defined in users/urls.py
+    return f"{request.build_absolute_uri(verify_path)}?token={token_value}"
+
+
+def _queue_verification(user, request):
+    """
+    Issue a verification link (users/verification.py) and queue its email. Call inside
+    a transaction: in "db" mode the token row and the outbox row commit (or roll back) together.
+    """
+    max_age = verification.get_config()["MAX_AGE"]
+    if verification.is_signed_mode():
+        token_value = verification.make_signed_token(user)
+    else:
+        token_value = EmailVerificationToken.objects.create(
+            user=user,
+            expires_at=timezone.now() + timezone.timedelta(seconds=max_age),
+        ).token
+    verify_url = _verification_url(request, token_value)
+    enqueue_email(
+        user.email,
+        "Verify your email address",
+        f"Confirm your email address by opening this link:\n\n{verify_url}\n\n"
+        f"The link expires in {max_age // 3600} hours.",
+    )
+    return token_value
+
+
 class SignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     # Optional extras exposed at signup:
@@ -33,139 +95,244 @@ class SignupSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         password = validated_data.pop("password")
         user = User(**validated_data)
-        user.set_password(password)
-        user.save()
+        user.set_password(password)  # hashed before the transaction opens
+        self._save_with_verification(user)
+        return user
 
-        # Create email verification token (24h expiry)
-        token = EmailVerificationToken.objects.create(
-            user=user,
-            expires_at=timezone.now() + timezone.timedelta(hours=24),
-        )
+    async def acreate(self, validated_data):
+        password = validated_data.pop("password")
+        user = User(**validated_data)
+        await user.aset_password(password)
+        # no async transactions in the ORM yet: run the writes as one sync block
+        await sync_to_async(self._save_with_verification)(user)
+        return user
+
+    def _save_with_verification(self, user):
+        # user, verification token and the queued email are written atomically;
+        # delivery starts after commit (users/outbox.py)
+        with transaction.atomic():
+            user.save()
+            _queue_verification(user, self.context.get("request"))
+
+
+class AsyncSignupSerializer(AsyncValidationMixin, SignupSerializer):
+    """Signup for the async view: uniqueness is checked in avalidate() rather than by UniqueValidator."""
+
+    class Meta(SignupSerializer.Meta):
+        extra_kwargs = {
+            "username": {"validators": [UnicodeUsernameValidator()]},
+            "email": {"validators": []},
+        }
+
+    async def avalidate(self, attrs):
+        errors = {}
+        if await User.objects.filter(username=attrs["username"]).aexists():
+            errors["username"] = ["A user with that username already exists."]
+        if await User.objects.filter(email=attrs["email"]).aexists():
+            errors["email"] = ["user with this email already exists."]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
-        # Build verification URL (frontend or API endpoint)
-        request = self.context.get("request")
-        verify_path = reverse("users:verify-email")  # defined in users/urls.py
-        verify_url = f"{request.build_absolute_uri(verify_path)}?token={token.token}"
 
-        # Send email (MVP: print to console; plug in real email later)
-        self._send_verification_email(user.email, verify_url)
-        return user
+class VerifyEmailSerializer(AsyncValidationMixin, serializers.Serializer):
+    # a UUID in "db" mode, a signed payload in "signed" mode (users/verification.py)
+    token = serializers.CharField()
+
+    def validate_token(self, value):
+        if verification.is_signed_mode():
+            return value
+        return serializers.UUIDField().run_validation(value)
 
     @staticmethod
-    def _send_verification_email(email, url):
-        # TODO: replace with real email sender (SendGrid/SES/etc.)
-        print(f"[DEV] Send email verification to {email}: {url}")
+    def _check_usable(token_obj):
+        if token_obj.consumed_at is not None:
+            raise serializers.ValidationError("Token already used.")
+        if timezone.now() >= token_obj.expires_at:
+            raise serializers.ValidationError("Token has expired.")
 
+    @staticmethod
+    def _load_signed(value):
+        try:
+            return verification.load_signed_token(value)
+        except verification.InvalidLink as exc:
+            raise serializers.ValidationError(str(exc))
 
-class VerifyEmailSerializer(serializers.Serializer):
-    token = serializers.UUIDField()
+    @staticmethod
+    def _check_signed(user, fingerprint):
+        try:
+            verification.check_fingerprint(user, fingerprint)
+        except verification.InvalidLink as exc:
+            raise serializers.ValidationError(str(exc))
 
     def validate(self, attrs):
+        if verification.is_signed_mode():
+            user_id, fingerprint = self._load_signed(attrs["token"])
+            user = User.objects.filter(pk=user_id).first()
+            self._check_signed(user, fingerprint)
+            attrs.update(user=user, token_obj=None)
+            return attrs
+
         token_value = attrs["token"]
         try:
             token_obj = EmailVerificationToken.objects.select_related("user").get(token=token_value)
         except EmailVerificationToken.DoesNotExist:
             raise serializers.ValidationError("Invalid token.")
 
-        if token_obj.consumed_at is not None:
-            raise serializers.ValidationError("Token already used.")
-        if timezone.now() >= token_obj.expires_at:
-            raise serializers.ValidationError("Token has expired.")
+        self._check_usable(token_obj)
+        attrs.update(user=token_obj.user, token_obj=token_obj)
+        return attrs
+
+    async def avalidate(self, attrs):
+        if verification.is_signed_mode():
+            user_id, fingerprint = self._load_signed(attrs["token"])
+            user = await User.objects.filter(pk=user_id).afirst()
+            self._check_signed(user, fingerprint)
+            attrs.update(user=user, token_obj=None)
+            return attrs
 
-        attrs["token_obj"] = token_obj
+        try:
+            token_obj = await EmailVerificationToken.objects.select_related("user").aget(token=attrs["token"])
+        except EmailVerificationToken.DoesNotExist:
+            raise serializers.ValidationError("Invalid token.")
+
+        self._check_usable(token_obj)
+        attrs.update(user=token_obj.user, token_obj=token_obj)
         return attrs
 
     def save(self, **kwargs):
-        token_obj: EmailVerificationToken = self.validated_data["token_obj"]
-        user = token_obj.user
+        user = self.validated_data["user"]
         user.mark_email_verified()
-        token_obj.mark_consumed()
+        token_obj = self.validated_data["token_obj"]
+        if token_obj is not None:
+            token_obj.mark_consumed()
+        return user
+
+    async def asave(self, **kwargs):
+        user = self.validated_data["user"]
+        await user.amark_email_verified()
+        token_obj = self.validated_data["token_obj"]
+        if token_obj is not None:
+            await token_obj.amark_consumed()
         return user
 
 
-class ResendVerificationSerializer(serializers.Serializer):
+class ResendVerificationSerializer(AsyncValidationMixin, serializers.Serializer):
     email = serializers.EmailField()
 
     def validate_email(self, v):
         return v.strip().lower()
 
-    def validate(self, attrs):
-        email = attrs["email"]
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+    @staticmethod
+    def _check_user(user):
+        if user is None:
             raise serializers.ValidationError("If the email exists, a message will be sent.")  # don’t leak users
-
         if user.is_verified:
             raise serializers.ValidationError("Email is already verified.")
 
+    def validate(self, attrs):
+        user = User.objects.filter(email=attrs["email"]).first()
+        self._check_user(user)
+        attrs["user"] = user
+        return attrs
+
+    async def avalidate(self, attrs):
+        user = await User.objects.filter(email=attrs["email"]).afirst()
+        self._check_user(user)
         attrs["user"] = user
         return attrs
 
     def save(self, **kwargs):
-        user = self.validated_data["user"]
-        token = EmailVerificationToken.objects.create(
-            user=user,
-            expires_at=timezone.now() + timezone.timedelta(hours=24),
-        )
-        request = self.context.get("request")
-        from django.urls import reverse
-        verify_path = reverse("users:verify-email")
-        verify_url = f"{request.build_absolute_uri(verify_path)}?token={token.token}"
-        SignupSerializer._send_verification_email(user.email, verify_url)
+        with transaction.atomic():
+            _queue_verification(self.validated_data["user"], self.context.get("request"))
         return {"detail": "If the email exists, a verification link has been sent."}
 
+    async def asave(self, **kwargs):
+        return await sync_to_async(self.save)(**kwargs)
+
 
-class LoginTokenObtainPairSerializer(TokenObtainPairSerializer):
+class LoginTokenObtainPairSerializer(AsyncValidationMixin, TokenObtainPairSerializer):
     """
     SimpleJWT login with an extra check: require verified email before issuing tokens.
+    - One user lookup: email (case-insensitive) or username.
+    - Exactly one password hash per attempt, including the failure paths,
+      plus at most one rehash when the stored hash is weaker than the configured hasher.
     """
-    def validate(self, attrs):
-        # Allow login by username or email (lowercased)
-        identifier = attrs.get("username")  # SimpleJWT uses 'username' key
-        password = attrs.get("password")
+    @classmethod
+    def get_token(cls, user, membership=None):
+        token = super().get_token(user)
+        for claim, value in Principal.claims_for(user).items():
+            token[claim] = value
+        # opt-in team/role claims (teams/claims.py); async login passes them precomputed
+        if membership is None and membership_claims.is_enabled():
+            membership = membership_claims.token_claims(user.id)
+        if membership is not None:
+            membership_claims.refresh_claims(token, membership)
+        return token
 
-        user = None
-        if identifier:
-            identifier_l = identifier.strip().lower()
-            # Try email first
-            try:
-                user = User.objects.get(email=identifier_l)
-            except User.DoesNotExist:
-                # Fallback to username
-                user = authenticate(request=self.context.get("request"),
-                                    username=identifier, password=password)
-                if user is None:
-                    # Try username lookup if auth backend needs explicit check
-                    try:
-                        user_obj = User.objects.get(username=identifier)
-                        if not user_obj.check_password(password):
-                            user_obj = None
-                        user = user_obj
-                    except User.DoesNotExist:
-                        user = None
+    @staticmethod
+    def _lookup_queryset(identifier):
+        identifier = (identifier or "").strip()
+        if not identifier:
+            return None
+        return User.objects.filter(Q(email=identifier.lower()) | Q(username=identifier))[:2]
 
-        if user is None:
-            # If email path: authenticate explicitly
-            try:
-                user_obj = User.objects.get(email=identifier_l)
-                if not user_obj.check_password(password):
-                    user_obj = None
-                user = user_obj
-            except Exception:
-                pass
+    @staticmethod
+    def _pick_user(matches, identifier):
+        # an email match wins if someone's username happens to be another user's email
+        identifier_l = (identifier or "").strip().lower()
+        for user in matches:
+            if user.email == identifier_l:
+                return user
+        return matches[0] if matches else None
+
+    @classmethod
+    def _lookup_user(cls, identifier):
+        qs = cls._lookup_queryset(identifier)
+        return cls._pick_user(list(qs) if qs is not None else [], identifier)
+
+    @classmethod
+    async def _alookup_user(cls, identifier):
+        qs = cls._lookup_queryset(identifier)
+        return cls._pick_user([u async for u in qs] if qs is not None else [], identifier)
 
-        if user is None:
-            raise serializers.ValidationError("Invalid credentials.")
+    @staticmethod
+    def _verify_password(user, password) -> bool:
+        if user is None or not user.has_usable_password():
+            hash_password(password)  # keep timing identical to a real verification
+            return False
+        is_correct, must_update = verify_password(password, user.password)
+        if is_correct and must_update:
+            # upgrade in place to the current hasher/work factor, without a full save()
+            user.password = hash_password(password)
+            User.objects.filter(pk=user.pk).update(password=user.password)
+        return is_correct
+
+    @staticmethod
+    async def _averify_password(user, password) -> bool:
+        if user is None or not user.has_usable_password():
+            await ahash_password(password)
+            return False
+        is_correct, must_update = await averify_password(password, user.password)
+        if is_correct and must_update:
+            user.password = await ahash_password(password)
+            await User.objects.filter(pk=user.pk).aupdate(password=user.password)
+        return is_correct
 
+    @staticmethod
+    def _check_user(user):
         if not user.is_active:
             raise serializers.ValidationError("User account is disabled.")
 
         if not user.is_verified:
             raise serializers.ValidationError("Email not verified.")
 
-        # Let SimpleJWT create tokens
-        data = super().validate({"username": user.username, "password": password})
+    def _token_data(self, user, membership=None) -> dict:
+        # Mint tokens directly; the password was already verified
+        self.user = user
+        refresh = self.get_token(user, membership)
+        data = {"refresh": str(refresh), "access": str(refresh.access_token)}
+
         # Optionally add user info
         data.update({
             "user": {
@@ -177,3 +344,90 @@ class LoginTokenObtainPairSerializer(TokenObtainPairSerializer):
             }
         })
         return data
+
+    def validate(self, attrs):
+        # Allow login by username or email (lowercased)
+        identifier = attrs.get("username")  # SimpleJWT uses 'username' key
+        password = attrs.get("password")
+
+        user = self._lookup_user(identifier)
+        if not self._verify_password(user, password):
+            ratelimit.record_login_failure(identifier)
+            raise serializers.ValidationError("Invalid credentials.")
+        ratelimit.clear_login_failures(identifier)
+        self._check_user(user)
+
+        data = self._token_data(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return data
+
+    async def avalidate(self, attrs):
+        identifier = attrs.get("username")
+        password = attrs.get("password")
+
+        user = await self._alookup_user(identifier)
+        if not await self._averify_password(user, password):
+            await ratelimit.arecord_login_failure(identifier)
+            raise serializers.ValidationError("Invalid credentials.")
+        await ratelimit.aclear_login_failures(identifier)
+        self._check_user(user)
+
+        membership = await membership_claims.atoken_claims(user.id) if membership_claims.is_enabled() else None
+        data = self._token_data(user, membership)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            user.last_login = timezone.now()
+            await User.objects.filter(pk=user.pk).aupdate(last_login=user.last_login)
+        return data
+
+
+def _check_not_revoked(refresh):
+    user_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+    state = get_user_state(user_id) if user_id else None
+    if state is None or refresh.get(TOKEN_VERSION_CLAIM, 0) != state.token_version or is_token_revoked(refresh):
+        raise serializers.ValidationError("Token has been revoked.")
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh that honours the per-user token version and the JTI denylist,
+    and re-issues membership claims when the user's memberships changed.
+    """
+    def validate(self, attrs):
+        try:
+            refresh = self.token_class(attrs["refresh"])
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
+        _check_not_revoked(refresh)
+        data = super().validate(attrs)
+        if membership_claims.is_enabled():
+            current = membership_claims.token_claims(refresh[jwt_settings.USER_ID_CLAIM])
+            if membership_claims.refresh_claims(refresh, current):
+                # the new access token was copied from the stale claims: re-sign both with the fresh set
+                for key, token_class in (("access", AccessToken), ("refresh", self.token_class)):
+                    if key in data:
+                        token = token_class(data[key], verify=False)
+                        membership_claims.refresh_claims(token, current)
+                        data[key] = str(token)
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Revoke the given refresh token (and the access token used for the call)."""
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def save(self, **kwargs):
+        request = self.context["request"]
+        refresh = self.validated_data["refresh"]
+        if str(refresh.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.id):
+            raise serializers.ValidationError({"refresh": "Token belongs to another user."})
+        revoke_token(refresh, user_id=request.user.id)
+        if request.auth is not None:
+            revoke_token(request.auth, user_id=request.user.id)
+        return {"detail": "Logged out."}
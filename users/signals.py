@@ -0,0 +1,17 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user_state
+from .models import User
+from .purge import maybe_schedule_purge
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user_state(instance.pk)
+
+
+@receiver(request_finished)
+def _periodic_token_purge(sender, **kwargs):
+    maybe_schedule_purge()
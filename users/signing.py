@@ -0,0 +1,179 @@
+"""
+Asymmetric JWT signing with a key ring.
+
+By default tokens are HS256-signed with SIMPLE_JWT's SIGNING_KEY, so anyone who
+verifies them needs that secret. With settings.JWT_SIGNING["ALGORITHM"] set to
+RS256, ES256 or EdDSA, tokens are signed with the ACTIVE_KID private key and
+carry its `kid` header; every key in KEYS is published at
+/.well-known/jwks.json, so other services verify locally.
+
+Rotation: add the new key to KEYS (published, not yet used), wait for JWKS
+caches to pick it up (JWKS_MAX_AGE), switch ACTIVE_KID, and drop the old key
+once REFRESH_TOKEN_LIFETIME has passed.
+
+PEMs are parsed once per process (lru_cache on the PEM text), not per token.
+Requires the `cryptography` package.
+"""
+import functools
+import hashlib
+import json
+from typing import NamedTuple, Optional
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from jwt import InvalidTokenError, algorithms
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    "ALGORITHM": None,      # None keeps SIMPLE_JWT's symmetric signing
+    # [{"kid": "2026-10", "private_key": "<PEM>"}, {"kid": "2026-04", "public_key": "<PEM>"}];
+    # "private_key_path"/"public_key_path" read the PEM from a file instead
+    "KEYS": [],
+    "ACTIVE_KID": None,     # default: the first key with a private key
+    "JWKS_MAX_AGE": 3600,
+}
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "PS256", "ES256", "ES384", "EdDSA"}
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "JWT_SIGNING", {})}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_private_key(pem: str):
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    return load_pem_private_key(pem.encode(), password=None)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_public_key(pem: str):
+    from cryptography.hazmat.primitives.serialization import load_pem_public_key
+    return load_pem_public_key(pem.encode())
+
+
+def _pem(spec, name) -> Optional[str]:
+    if spec.get(name):
+        return spec[name]
+    path = spec.get(f"{name}_path")
+    if path:
+        with open(path) as fh:
+            return fh.read()
+    return None
+
+
+class SigningKey(NamedTuple):
+    kid: str
+    private: object     # None for verify-only (retired or not yet active) keys
+    public: object
+
+
+def load_keys(config) -> dict:
+    """kid -> SigningKey, in KEYS order."""
+    keys = {}
+    for spec in config["KEYS"]:
+        private_pem, public_pem = _pem(spec, "private_key"), _pem(spec, "public_key")
+        private = _load_private_key(private_pem) if private_pem else None
+        public = _load_public_key(public_pem) if public_pem else (private.public_key() if private else None)
+        if public is None:
+            raise ImproperlyConfigured(f"JWT_SIGNING key {spec.get('kid')!r} has neither a private nor a public key")
+        keys[str(spec["kid"])] = SigningKey(str(spec["kid"]), private, public)
+    return keys
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """TokenBackend that signs with one key of a ring and verifies by the token's `kid`."""
+
+    def __init__(self, algorithm, keys: dict, active_kid, **kwargs):
+        super().__init__(algorithm, **kwargs)
+        self.keys = keys
+        self.active = keys[active_kid]
+        self.jwks = build_jwks(algorithm, keys.values())
+
+    def encode(self, payload):
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+        return jwt.encode(
+            jwt_payload,
+            self.active.private,
+            algorithm=self.algorithm,
+            headers={"kid": self.active.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def get_verifying_key(self, token):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except InvalidTokenError as exc:
+            raise TokenBackendError(_("Token is invalid")) from exc
+        key = self.keys.get(kid)
+        if key is None:
+            raise TokenBackendError(_("Token is invalid"))
+        return key.public
+
+
+def build_jwks(algorithm, keys) -> dict:
+    jws_algorithm = jwt.get_algorithm_by_name(algorithm)
+    return {"keys": [
+        {**jws_algorithm.to_jwk(key.public, as_dict=True), "kid": key.kid, "use": "sig", "alg": algorithm}
+        for key in keys
+    ]}
+
+
+_default_backend = state.token_backend
+_jwks_document = None
+
+
+def build_backend(config=None) -> TokenBackend:
+    config = config or get_config()
+    algorithm = config["ALGORITHM"]
+    if not algorithm:
+        return _default_backend
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ImproperlyConfigured(f"JWT_SIGNING ALGORITHM must be one of {sorted(ASYMMETRIC_ALGORITHMS)}")
+    if not algorithms.has_crypto:
+        raise ImproperlyConfigured("JWT_SIGNING requires the cryptography package")
+    keys = load_keys(config)
+    active_kid = config["ACTIVE_KID"] or next((k.kid for k in keys.values() if k.private is not None), None)
+    if active_kid not in keys or keys[active_kid].private is None:
+        raise ImproperlyConfigured("JWT_SIGNING ACTIVE_KID must name a key with a private key")
+    return KeyRingTokenBackend(
+        algorithm, keys, active_kid,
+        audience=jwt_settings.AUDIENCE,
+        issuer=jwt_settings.ISSUER,
+        leeway=jwt_settings.LEEWAY,
+        json_encoder=jwt_settings.JSON_ENCODER,
+    )
+
+
+def install():
+    """Make every simplejwt token (login, refresh, authentication) use the configured backend."""
+    global _jwks_document
+    state.token_backend = build_backend()
+    _jwks_document = None
+
+
+def jwks_document() -> tuple:
+    """(JSON bytes, ETag) of the published keys; built once per key ring."""
+    global _jwks_document
+    if _jwks_document is None:
+        keys = getattr(state.token_backend, "jwks", {"keys": []})
+        body = json.dumps(keys, separators=(",", ":")).encode()
+        _jwks_document = (body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest())
+    return _jwks_document
+
+
+@receiver(setting_changed)
+def _reinstall(setting, **kwargs):
+    if setting == "JWT_SIGNING":
+        install()
@@ -1,23 +1,831 @@
+"""
+Manual smoke checks (dev server):
 
-#signup a new user
+    # signup a new user
+    curl -X POST http://localhost:8000/api/users/signup/ \\
+      -H "Content-Type: application/json" \\
+      -d '{
+            "username": "mxssxn100",
+            "email": "meme@example.com",
+            "password": "SecretPass123!",
+            "first_name": "Mx",
+            "last_name": "606"
+          }'
 
-curl -X POST http://localhost:8000/api/users/signup/ \
-  -H "Content-Type: application/json" \
-  -d '{
-        "username": "mxssxn100",
-        "email": "meme@example.com",
-        "password": "SecretPass123!",
-        "first_name": "Mx",
-        "last_name": "606"
-      }'
+    # verify email
+    curl "http://localhost:8000/api/users/verify-email/?token=<UUID-TOKEN-HERE>"
 
+    # login
+    curl -X POST http://localhost:8000/api/users/login/ \\
+      -H "Content-Type: application/json" \\
+      -d '{"username": "me@example.com", "password": "SecretPass123!"}'
 
-#verify email
-curl "http://localhost:8000/api/users/verify-email/?token=<UUID-TOKEN-HERE>"
+# organisation, teams, teammembership, users,
+"""
+import ast
+import asyncio
+import json
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-#login
-curl -X POST http://localhost:8000/api/users/login/ \
-  -H "Content-Type: application/json" \
-  -d '{"username": "me@example.com", "password": "SecretPass123!"}'
+from django.contrib.auth.hashers import MD5PasswordHasher, PBKDF2PasswordHasher, check_password
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import jwt
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
-# organisation, teams, teammembership, users,
\ No newline at end of file
+from . import purge, signing, verification
+from .authentication import Principal, PrincipalJWTAuthentication, _state_cache, _state_key, check_user_state_cache
+from .hashers import TunedPBKDF2PasswordHasher
+from .hashing import HashingPool, HashingPoolBusy, _asubmit, _hash
+from .management.commands.calibrate_hashers import Command as CalibrateHashers
+from .models import EmailOutbox, EmailVerificationToken, PasswordResetToken, RevokedToken, User
+from .outbox import deliver_batch, enqueue_email
+from .ratelimit import LocalRateLimiter, client_ip
+from .serializers import LoginTokenObtainPairSerializer, SignupSerializer
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+)
+class LoginPipelineTests(TestCase):
+    password = "SecretPass123!"
+
+    def setUp(self):
+        self.user = User(username="mx", email="me@example.com", email_verified_at=timezone.now())
+        self.user.set_password(self.password)
+        self.user.save()
+
+    def _login(self, identifier, password):
+        ser = LoginTokenObtainPairSerializer(data={"username": identifier, "password": password})
+        with mock.patch.object(MD5PasswordHasher, "encode", autospec=True,
+                               side_effect=MD5PasswordHasher.encode) as encode:
+            try:
+                ser.is_valid(raise_exception=True)
+                error = None
+            except serializers.ValidationError as exc:
+                error = str(exc.detail["non_field_errors"][0])
+        return ser, error, encode.call_count
+
+    def test_success_by_email_hashes_once(self):
+        with self.assertNumQueries(1):  # single user lookup
+            ser, error, hashes = self._login("  Me@Example.com ", self.password)
+        self.assertIsNone(error)
+        self.assertEqual(hashes, 1)
+        self.assertIn("access", ser.validated_data)
+        self.assertEqual(ser.validated_data["user"]["id"], str(self.user.id))
+
+    def test_success_by_username_hashes_once(self):
+        ser, error, hashes = self._login("mx", self.password)
+        self.assertIsNone(error)
+        self.assertEqual(hashes, 1)
+
+    def test_wrong_password_hashes_once(self):
+        _, error, hashes = self._login("me@example.com", "wrong-password")
+        self.assertEqual(error, "Invalid credentials.")
+        self.assertEqual(hashes, 1)
+
+    def test_unknown_user_hashes_once(self):
+        with self.assertNumQueries(1):
+            _, error, hashes = self._login("nobody@example.com", self.password)
+        self.assertEqual(error, "Invalid credentials.")
+        self.assertEqual(hashes, 1)
+
+    def test_unusable_password_hashes_once(self):
+        self.user.set_unusable_password()
+        self.user.save()
+        _, error, hashes = self._login("mx", self.password)
+        self.assertEqual(error, "Invalid credentials.")
+        self.assertEqual(hashes, 1)
+
+    def test_inactive_user_hashes_once(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        _, error, hashes = self._login("mx", self.password)
+        self.assertEqual(error, "User account is disabled.")
+        self.assertEqual(hashes, 1)
+
+    def test_unverified_user_hashes_once(self):
+        User.objects.filter(pk=self.user.pk).update(email_verified_at=None)
+        _, error, hashes = self._login("mx", self.password)
+        self.assertEqual(error, "Email not verified.")
+        self.assertEqual(hashes, 1)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["users.hashers.TunedPBKDF2PasswordHasher"],
+    PASSWORD_HASHER_PARAMS={"pbkdf2_sha256": {"iterations": 1000}},
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+)
+class LoginRehashTests(TestCase):
+    password = "SecretPass123!"
+
+    def setUp(self):
+        self.user = User(username="mx", email="me@example.com", email_verified_at=timezone.now())
+        self.user.set_password(self.password)
+        self.user.save()
+
+    def _login(self):
+        ser = LoginTokenObtainPairSerializer(data={"username": "mx", "password": self.password})
+        with mock.patch.object(PBKDF2PasswordHasher, "encode", autospec=True,
+                               side_effect=PBKDF2PasswordHasher.encode) as encode:
+            ser.is_valid(raise_exception=True)
+        return encode.call_count
+
+    def test_weaker_hash_is_upgraded_once(self):
+        with self.settings(PASSWORD_HASHER_PARAMS={"pbkdf2_sha256": {"iterations": 2000}}):
+            self.assertEqual(self._login(), 2)  # verify + one rehash
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+            self.assertEqual(self._login(), 1)
+
+    def test_stronger_hash_is_not_downgraded(self):
+        with self.settings(PASSWORD_HASHER_PARAMS={"pbkdf2_sha256": {"iterations": 500}}):
+            self.assertEqual(self._login(), 1)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+
+class _ThreadExecutor(ThreadPoolExecutor):
+    """Stands in for the worker processes: same interface, no process start-up."""
+
+    def __init__(self, max_workers, **kwargs):
+        super().__init__(max_workers=max_workers)
+
+
+def _blocked(gate):
+    gate.wait(5)
+    return "hashed", time.time(), 0.01
+
+
+def _crash():
+    raise BrokenProcessPool("a worker died")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS={"RULES": {}},
+)
+class HashingPoolTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("users.hashing.ProcessPoolExecutor", _ThreadExecutor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = HashingPool(workers=1, queue_depth=1, queue_timeout=0.05)
+        self.addCleanup(self.pool.shutdown)
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def _fill(self) -> list:
+        return [self.pool.submit(_blocked, self.gate) for _ in range(2)]  # one running, one queued
+
+    def test_submissions_beyond_workers_and_queue_are_rejected(self):
+        running = self._fill()
+        self.assertEqual(self.pool.stats()["in_flight"], 2)
+        with self.assertRaises(HashingPoolBusy):
+            self.pool.submit(_blocked, self.gate)
+        self.gate.set()
+        self.assertEqual([f.result(5) for f in running], ["hashed", "hashed"])
+        self.assertEqual(self.pool.submit(_blocked, self.gate).result(5), "hashed")  # slots were released
+        stats = self.pool.stats()
+        self.assertEqual((stats["submitted"], stats["rejected"], stats["in_flight"]), (3, 1, 0))
+        self.assertAlmostEqual(stats["avg_hash_seconds"], 0.01)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.0)
+
+    def test_async_callers_wait_for_a_slot_off_the_event_loop(self):
+        running = self._fill()
+
+        async def scenario():
+            hashing = asyncio.ensure_future(_asubmit(_blocked, self.gate))
+            await asyncio.sleep(0.01)
+            self.assertFalse(hashing.done())
+            beat = await asyncio.wait_for(asyncio.sleep(0, "loop alive"), 1)  # the loop is not blocked
+            self.gate.set()
+            return beat, await asyncio.wait_for(hashing, 5)
+
+        with mock.patch("users.hashing.get_hashing_pool", return_value=self.pool):
+            self.assertEqual(asyncio.run(scenario()), ("loop alive", "hashed"))
+        self.assertEqual([f.result(5) for f in running], ["hashed", "hashed"])
+
+    def test_crashed_worker_restarts_the_pool(self):
+        with self.assertLogs("users.hashing", "ERROR"), self.assertRaises(HashingPoolBusy):
+            self.pool.submit(_crash).result(5)
+        self.assertIsNone(self.pool._executor)
+        self.assertTrue(check_password("secret", self.pool.submit(_hash, "secret").result(5)))
+        self.assertEqual(self.pool.stats()["restarts"], 1)
+
+    def test_busy_pool_is_a_503(self):
+        User.objects.create_user(username="mx", email="me@example.com", password="SecretPass123!",
+                                 email_verified_at=timezone.now())
+        with mock.patch.object(HashingPool, "submit", side_effect=HashingPoolBusy):
+            response = APIClient().post(reverse("users:login"), {"username": "mx", "password": "SecretPass123!"},
+                                        format="json")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data["detail"], HashingPoolBusy.default_detail)
+
+    def test_stats_are_staff_only(self):
+        staff = User.objects.create_user(username="admin", email="admin@example.com", is_staff=True)
+        token = LoginTokenObtainPairSerializer.get_token(staff).access_token
+        response = APIClient(HTTP_AUTHORIZATION=f"Bearer {token}").get("/api/users/admin/hashing-pool/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["workers"], 0)
+        self.assertIn("avg_wait_seconds", response.data)
+        self.assertEqual(APIClient().get("/api/users/admin/hashing-pool/").status_code, 401)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; recipients in server.reject get a transient 451."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost test SMTP")
+        rcpt = None
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "RCPT":
+                rcpt = line.split(":", 1)[1].strip(" <>")
+                self.reply("451 try again later" if rcpt in self.server.reject else "250 OK")
+            elif verb == "DATA":
+                self.reply("354 end with .")
+                body = []
+                while (data := self.rfile.readline().decode()) not in (".\r\n", ""):
+                    body.append(data)
+                self.server.messages.append((rcpt, "".join(body)))
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:  # MAIL, RSET, NOOP
+                self.reply("250 OK")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.messages, self.reject, self.connections = [], set(), 0
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    EMAIL_OUTBOX={"ON_COMMIT": None, "BACKOFF_BASE": 30.0, "MAX_ATTEMPTS": 3},
+)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.smtp = LocalSMTPServer().__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        smtp_settings = self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.smtp.server_address[1],
+        )
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def _signup(self, username):
+        ser = SignupSerializer(
+            data={"username": username, "email": f"{username}@example.com", "password": "SecretPass123!"},
+            context={"request": RequestFactory().post("/api/users/signup/")},
+        )
+        ser.is_valid(raise_exception=True)
+        return ser.save()
+
+    def test_signup_queues_email_without_sending(self):
+        user = self._signup("mx")
+        row = EmailOutbox.objects.get()
+        token = EmailVerificationToken.objects.get(user=user)
+        self.assertEqual(row.to_email, "mx@example.com")
+        self.assertIn(str(token.token), row.body)
+        self.assertEqual(row.status, EmailOutbox.PENDING)
+        self.assertEqual(self.smtp.messages, [])
+
+    def test_signup_rolls_back_with_the_outbox_row(self):
+        with mock.patch("users.serializers.enqueue_email", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self._signup("mx")
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(EmailVerificationToken.objects.exists())
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(3):
+            self._signup(f"user{i}")
+        self.assertEqual(deliver_batch(), 3)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(sorted(rcpt for rcpt, _ in self.smtp.messages),
+                         ["user0@example.com", "user1@example.com", "user2@example.com"])
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.SENT).exists())
+        self.assertEqual(deliver_batch(), 0)
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        row = enqueue_email("flaky@example.com", "Hi", "Body")
+        self.smtp.reject.add("flaky@example.com")
+        started = timezone.now()
+        self.assertEqual(deliver_batch(), 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (EmailOutbox.PENDING, 1))
+        self.assertIn("451", row.last_error)
+        self.assertGreaterEqual(row.next_attempt_at, started + timedelta(seconds=15))
+        self.assertEqual(deliver_batch(), 0)  # not due yet
+
+        self.smtp.reject.clear()
+        EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        call_command("send_outbox", "--once", stdout=mock.Mock())
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (EmailOutbox.SENT, 2))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        row = enqueue_email("gone@example.com", "Hi", "Body")
+        self.smtp.reject.add("gone@example.com")
+        with self.assertLogs("users.outbox", "ERROR"):
+            for _ in range(3):
+                EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+                deliver_batch()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (EmailOutbox.FAILED, 3))
+
+    def test_inline_mode_delivers_after_commit(self):
+        with self.settings(EMAIL_OUTBOX={"ON_COMMIT": "inline"}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._signup("mx")
+                self.assertEqual(self.smtp.messages, [])
+        self.assertEqual([rcpt for rcpt, _ in self.smtp.messages], ["mx@example.com"])
+
+
+
+SIGNUP_LIMIT = {"RULES": {"signup": [{"key": "ip", "limit": 2, "window": 3600}]}}
+
+
+@override_settings(RATE_LIMITS=SIGNUP_LIMIT)
+class RateLimitTests(TestCase):
+    def _signup(self, **extra):
+        return APIClient().post(reverse("users:signup"), {}, format="json", **extra).status_code
+
+    def test_forwarded_for_cannot_reset_the_ip_counter(self):
+        statuses = [self._signup(HTTP_X_FORWARDED_FOR=f"198.51.100.{i}") for i in range(4)]
+        self.assertEqual(statuses, [400, 400, 429, 429])
+
+    def test_forwarded_for_is_read_through_trusted_proxies_only(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 203.0.113.7")
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        with self.settings(RATE_LIMITS={**SIGNUP_LIMIT, "NUM_PROXIES": 1}):
+            self.assertEqual(client_ip(request), "203.0.113.7")
+        with self.settings(RATE_LIMITS={**SIGNUP_LIMIT, "NUM_PROXIES": 2}):
+            self.assertEqual(client_ip(request), "1.1.1.1")
+
+
+LOGIN_LOCKOUT = {
+    "RULES": {"login": [{"key": "identifier", "limit": 20, "window": 60}]},
+    "LOCKOUT": {"THRESHOLD": 3, "WINDOW": 900, "BASE": 30, "MAX": 3600},
+}
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS=LOGIN_LOCKOUT,
+)
+class LoginLockoutTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="mx", email="me@example.com", password="SecretPass123!",
+                                 email_verified_at=timezone.now())
+
+    def _login(self, password, at=None):
+        with mock.patch("users.ratelimit.time.time", return_value=at or 1_000_000.0):
+            return APIClient().post(reverse("users:login"), {"username": "mx", "password": password}, format="json")
+
+    def test_identifier_is_locked_after_repeated_failures(self):
+        self.assertEqual([self._login("wrong").status_code for _ in range(3)], [400, 400, 400])
+        response = self._login("SecretPass123!")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_lock_doubles_with_each_further_failure(self):
+        for _ in range(3):
+            self._login("wrong")
+        self.assertEqual(self._login("wrong", at=1_000_031.0).status_code, 400)  # first lock over
+        self.assertEqual(self._login("SecretPass123!", at=1_000_032.0)["Retry-After"], "59")
+
+    def test_success_clears_failures(self):
+        for _ in range(2):
+            self._login("wrong")
+        self.assertEqual(self._login("SecretPass123!").status_code, 200)
+        self.assertEqual([self._login("wrong").status_code for _ in range(2)], [400, 400])
+        self.assertEqual(self._login("SecretPass123!").status_code, 200)
+
+    def test_per_identifier_limit_returns_429(self):
+        with self.settings(RATE_LIMITS={"RULES": {"login": [{"key": "identifier", "limit": 2, "window": 60}]}}):
+            statuses = [self._login("SecretPass123!").status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class LocalRateLimiterTests(SimpleTestCase):
+    def test_entries_are_capped_when_all_are_live(self):
+        limiter = LocalRateLimiter(max_entries=100)
+        for i in range(1000):
+            limiter.hit(f"k{i}", 60)
+        self.assertLessEqual(len(limiter._entries), 100)
+        self.assertLessEqual(len(limiter._expiries), 2 * 100 + 64)
+
+    def test_expired_entries_are_swept_at_most_once_per_interval(self):
+        limiter = LocalRateLimiter(prune_interval=10)
+        with mock.patch("users.ratelimit.time.time", return_value=1000.0):
+            limiter._set("old", 1, timeout=1)
+        with mock.patch("users.ratelimit.time.time", return_value=1005.0):
+            limiter._set("new", 1, timeout=60)
+            self.assertIn("old", limiter._entries)  # next sweep not due yet
+        with mock.patch("users.ratelimit.time.time", return_value=1011.0):
+            limiter._set("newer", 1, timeout=60)
+        self.assertEqual(set(limiter._entries), {"new", "newer"})
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS={"RULES": {}},
+)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mx", email="me@example.com", password="SecretPass123!",
+                                             email_verified_at=timezone.now())
+        self.refresh = LoginTokenObtainPairSerializer.get_token(self.user)
+        self.access = str(self.refresh.access_token)
+
+    def _status(self, access=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access or self.access}")
+        return client.get("/api/teams/claims/").status_code
+
+    def test_logout_all_rejects_every_outstanding_token(self):
+        self.assertEqual(self._status(), 200)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(client.post(reverse("users:logout-all")).status_code, 200)
+        self.assertEqual(self._status(), 401)
+        response = APIClient().post(reverse("users:token-refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_revocation_is_seen_across_a_cache_miss(self):
+        self.assertEqual(self._status(), 200)  # state now cached in this process
+        # another worker revokes: the DB moves on, this process's entry is untouched until it expires
+        User.objects.filter(pk=self.user.pk).update(token_version=F("token_version") + 1)
+        self.assertEqual(self._status(), 200)
+        _state_cache().delete(_state_key(self.user.pk))
+        self.assertEqual(self._status(), 401)
+
+    def test_deactivation_takes_effect_immediately(self):
+        self.assertEqual(self._status(), 200)
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertEqual(self._status(), 401)
+
+    def test_logout_denylists_the_refresh_and_calling_access_token(self):
+        other = str(LoginTokenObtainPairSerializer.get_token(self.user).access_token)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(client.post(reverse("users:logout"), {"refresh": str(self.refresh)}, format="json").status_code, 200)
+        self.assertEqual(RevokedToken.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self._status(), 401)
+        self.assertEqual(self._status(other), 200)  # other sessions keep working
+        response = APIClient().post(reverse("users:token-refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_process_local_state_cache_refused_with_several_processes(self):
+        with self.settings(WEB_PROCESSES=2):
+            with self.assertRaises(ImproperlyConfigured):
+                check_user_state_cache()
+        caches = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                  "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost"}}
+        with self.settings(WEB_PROCESSES=2, CACHES=caches, USER_STATE_CACHE_ALIAS="shared"):
+            check_user_state_cache()
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersTests(TestCase):
+    def _import(self, rows, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as fh:
+            fh.write("".join(json.dumps(row) + "\n" for row in rows))
+            fh.flush()
+            out, err = StringIO(), StringIO()
+            call_command("import_users", fh.name, "--workers", "0", *args, stdout=out, stderr=err)
+        return err.getvalue()
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        User.objects.create_user(username="taken", email="taken@example.com")
+        errors = self._import([
+            {"username": "ok", "email": "ok@example.com", "password": "SecretPass123!"},
+            {"username": "hashed", "email": "hashed@example.com", "password_hash": 12345},
+            {"username": "weird", "email": "weird@example.com", "password_hash": "nope$abc"},
+            {"username": "bad name!", "email": "x@example.com"},
+            {"username": "noteam", "email": "noteam@example.com", "team": "00000000-0000-0000-0000-000000000000"},
+            {"username": "taken", "email": "other@example.com"},
+        ])
+        self.assertIn("line 2: password_hash must be a string", errors)
+        self.assertIn("line 3: password_hash uses an unknown or unconfigured hasher", errors)
+        self.assertIn("line 4:", errors)
+        self.assertIn("line 5: team 00000000-0000-0000-0000-000000000000 not found", errors)
+        self.assertEqual(sorted(User.objects.values_list("username", flat=True)), ["ok", "taken"])
+        self.assertTrue(User.objects.get(username="ok").check_password("SecretPass123!"))
+
+
+@override_settings(PASSWORD_HASHERS=["users.hashers.TunedPBKDF2PasswordHasher"])
+class CalibrateHashersTests(SimpleTestCase):
+    def _calibrate(self, measured):
+        out = StringIO()
+        with mock.patch.object(CalibrateHashers, "_measure", return_value=measured):
+            call_command("calibrate_hashers", "--target-ms", "20", "--samples", "1", stdout=out)
+        return out.getvalue()
+
+    def test_never_recommends_less_than_the_default(self):
+        output = self._calibrate(measured=1.0)  # the default takes 1s here: 20ms would need ~2% of it
+        floor = TunedPBKDF2PasswordHasher.iterations
+        self.assertIn(f"below Django's default of {floor}", output)
+        self.assertIn(f"'pbkdf2_sha256': {{'iterations': {floor}}}", output)
+
+    def test_scales_up_on_fast_hosts(self):
+        output = self._calibrate(measured=0.005)
+        self.assertIn(f"'iterations': {TunedPBKDF2PasswordHasher.iterations * 4}", output)
+        self.assertNotIn("below Django's default", output)
+
+
+class PrincipalAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mx", email="me@example.com", is_staff=True,
+                                             email_verified_at=timezone.now())
+        token = LoginTokenObtainPairSerializer.get_token(self.user).access_token
+        self.request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_principal_comes_from_claims_without_loading_the_user(self):
+        PrincipalJWTAuthentication().authenticate(self.request)  # user state now cached
+        with CaptureQueriesContext(connection) as ctx:
+            principal, _ = PrincipalJWTAuthentication().authenticate(self.request)
+        self.assertEqual(len(ctx), 0)
+        self.assertIsInstance(principal, Principal)
+        self.assertEqual((principal.id, principal.username, principal.is_staff, principal.is_verified),
+                         (self.user.id, "mx", True, True))
+        self.assertEqual(principal, self.user)
+
+    def test_other_attributes_load_the_user_once(self):
+        principal, _ = PrincipalJWTAuthentication().authenticate(self.request)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(principal.email, "me@example.com")
+            self.assertEqual(principal.date_joined, self.user.date_joined)
+        self.assertEqual(len(ctx), 1)
+
+    def test_state_is_dropped_when_the_user_is_saved(self):
+        PrincipalJWTAuthentication().authenticate(self.request)
+        self.assertIsNotNone(_state_cache().get(_state_key(self.user.pk)))
+        self.user.first_name = "M"
+        self.user.save()
+        self.assertIsNone(_state_cache().get(_state_key(self.user.pk)))
+
+    def test_deleted_user_is_rejected(self):
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, "User not found"):
+            PrincipalJWTAuthentication().authenticate(self.request)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS={"RULES": {}},
+    EMAIL_OUTBOX={"ON_COMMIT": None},
+)
+class AsyncAuthEndpointTests(TestCase):
+    async def _post(self, name, body):
+        return await AsyncClient().post(reverse(name), body, content_type="application/json")
+
+    async def test_signup_verify_login(self):
+        response = await self._post("users:async-signup", {"username": "mx", "email": "Me@Example.com",
+                                                           "password": "SecretPass123!"})
+        self.assertEqual(response.status_code, 201)
+        user = await User.objects.aget(username="mx")
+        self.assertEqual(user.email, "me@example.com")
+        self.assertFalse(user.is_verified)
+
+        response = await self._post("users:async-login", {"username": "mx", "password": "SecretPass123!"})
+        self.assertEqual(response.status_code, 400)  # email not verified yet
+
+        token = await EmailVerificationToken.objects.filter(user=user).afirst()
+        response = await self._post("users:async-verify-email", {"token": str(token.token)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["user_id"], str(user.id))
+
+        response = await self._post("users:async-login", {"username": "me@example.com", "password": "SecretPass123!"})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({"access", "refresh"}, set(response.json()))
+
+    async def test_validation_errors_and_bad_json_are_400(self):
+        response = await self._post("users:async-signup", {"username": "mx"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json())
+        response = await AsyncClient().post(reverse("users:async-login"), "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_throttled_like_the_sync_view(self):
+        with self.settings(RATE_LIMITS=SIGNUP_LIMIT):
+            responses = [await self._post("users:async-signup", {}) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [400, 400, 429])
+        self.assertIn("Retry-After", responses[-1])
+
+
+class PurgeTokensTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mx", email="me@example.com")
+        now = timezone.now()
+        past, future = now - timedelta(hours=1), now + timedelta(hours=1)
+        EmailVerificationToken.objects.bulk_create(
+            [EmailVerificationToken(user=self.user, expires_at=past) for _ in range(5)]
+            + [EmailVerificationToken(user=self.user, expires_at=future, consumed_at=now) for _ in range(2)]
+            + [EmailVerificationToken(user=self.user, expires_at=future) for _ in range(3)]
+        )
+        PasswordResetToken.objects.bulk_create([
+            PasswordResetToken(user=self.user, expires_at=past), PasswordResetToken(user=self.user, expires_at=future),
+        ])
+        RevokedToken.objects.bulk_create([
+            RevokedToken(jti="old", user=self.user, expires_at=past),
+            RevokedToken(jti="live", user=self.user, expires_at=future),
+        ])
+
+    def _purge(self, *args):
+        out = StringIO()
+        call_command("purge_tokens", *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_dead_rows_are_deleted_in_chunks(self):
+        output = self._purge("--chunk-size", "2")
+        self.assertIn("users.EmailVerificationToken: deleted 7 row(s) in 4 chunk(s)", output)
+        self.assertIn("Total: deleted 9 row(s).", output)
+        self.assertEqual(EmailVerificationToken.objects.count(), 3)
+        self.assertFalse(EmailVerificationToken.objects.filter(consumed_at__isnull=False).exists())
+        self.assertEqual(PasswordResetToken.objects.count(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+
+    def test_dry_run_deletes_nothing(self):
+        self.assertIn("Total: would delete 9 row(s).", self._purge("--dry-run"))
+        self.assertEqual(EmailVerificationToken.objects.count(), 10)
+
+    def test_background_purge_starts_once_per_interval(self):
+        with self.settings(TOKEN_PURGE={"INTERVAL": 60}), \
+                mock.patch.object(purge, "_next_check", 0.0), \
+                mock.patch("users.purge.threading.Thread") as thread:
+            purge.cache.delete(purge._LOCK_KEY)
+            purge.maybe_schedule_purge()
+            purge.maybe_schedule_purge()
+        self.assertEqual(thread.return_value.start.call_count, 1)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0},
+    RATE_LIMITS={"RULES": {}},
+    EMAIL_VERIFICATION={"MODE": "signed", "MAX_AGE": 3600},
+)
+class SignedVerificationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mx", email="me@example.com")
+
+    def _verify(self, token):
+        response = APIClient().post(reverse("users:verify-email"), {"token": token}, format="json")
+        return response.status_code, str(response.data)
+
+    def test_link_works_once(self):
+        token = verification.make_signed_token(self.user)
+        self.assertEqual(self._verify(token)[0], 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        status, detail = self._verify(token)
+        self.assertEqual(status, 400)
+        self.assertIn("Token already used.", detail)
+
+    def test_signup_writes_no_token_row(self):
+        response = APIClient().post(reverse("users:signup"), {"username": "new", "email": "new@example.com",
+                                                               "password": "SecretPass123!"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(EmailVerificationToken.objects.exists())
+
+    def test_tampered_expired_and_superseded_links_are_rejected(self):
+        token = verification.make_signed_token(self.user)
+        self.assertIn("Invalid token.", self._verify(token[:-2] + "xx")[1])
+        with mock.patch("django.core.signing.time.time", return_value=timezone.now().timestamp() + 3601):
+            self.assertIn("Token has expired.", self._verify(token)[1])
+        self.user.email = "other@example.com"
+        self.user.save()
+        self.assertIn("Invalid token.", self._verify(token)[1])
+
+
+def _signing_key(kid) -> dict:
+    out = StringIO()
+    call_command("generate_signing_key", "--kid", kid, stdout=out)
+    return ast.literal_eval(out.getvalue().splitlines()[-1])
+
+
+def _public(spec) -> dict:
+    from cryptography.hazmat.primitives import serialization
+    public = signing._load_private_key(spec["private_key"]).public_key()
+    pem = public.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return {"kid": spec["kid"], "public_key": pem}
+
+
+@override_settings(RATE_LIMITS={"RULES": {}})
+class AsymmetricSigningTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.old, cls.new = _signing_key("2026-04"), _signing_key("2026-10")
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="mx", email="me@example.com")
+
+    def _signing(self, *keys, active=None):
+        return self.settings(JWT_SIGNING={"ALGORITHM": "EdDSA", "KEYS": list(keys), "ACTIVE_KID": active})
+
+    def _token(self) -> str:
+        return str(LoginTokenObtainPairSerializer.get_token(self.user).access_token)
+
+    def _authenticates(self, token) -> bool:
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        try:
+            return PrincipalJWTAuthentication().authenticate(request)[0].id == self.user.id
+        except AuthenticationFailed:
+            return False
+
+    def test_tokens_carry_the_active_kid(self):
+        with self._signing(self.old):
+            token = self._token()
+            self.assertEqual(jwt.get_unverified_header(token), {"alg": "EdDSA", "kid": "2026-04", "typ": "JWT"})
+            self.assertTrue(self._authenticates(token))
+        self.assertFalse(self._authenticates(token))  # back to HS256: the EdDSA token no longer verifies
+
+    def test_rotation_keeps_old_tokens_valid_until_the_key_is_dropped(self):
+        with self._signing(self.old):
+            old_token = self._token()
+        with self._signing(self.new, _public(self.old), active="2026-10"):
+            self.assertEqual(jwt.get_unverified_header(self._token())["kid"], "2026-10")
+            self.assertTrue(self._authenticates(old_token))
+        with self._signing(self.new):
+            self.assertFalse(self._authenticates(old_token))
+
+    def test_unknown_kid_and_symmetric_tokens_are_rejected(self):
+        symmetric = self._token()
+        with self._signing(self.old):
+            forged = jwt.encode(jwt.decode(symmetric, options={"verify_signature": False}),
+                                signing._load_private_key(self.new["private_key"]), algorithm="EdDSA",
+                                headers={"kid": "2026-10"})
+            self.assertFalse(self._authenticates(forged))
+            self.assertFalse(self._authenticates(symmetric))
+
+    def test_active_kid_must_have_a_private_key(self):
+        config = {**signing.DEFAULTS, "ALGORITHM": "EdDSA", "KEYS": [self.new, _public(self.old)],
+                  "ACTIVE_KID": "2026-04"}
+        with self.assertRaises(ImproperlyConfigured):
+            signing.build_backend(config)
+
+    def test_jwks_publishes_every_key_with_an_etag(self):
+        with self._signing(self.new, _public(self.old), active="2026-10"):
+            response = self.client.get("/.well-known/jwks.json")
+            self.assertEqual(response.status_code, 200)
+            keys = json.loads(response.content)["keys"]
+            self.assertEqual([(k["kid"], k["kty"], k["crv"], k["alg"]) for k in keys],
+                             [("2026-10", "OKP", "Ed25519", "EdDSA"), ("2026-04", "OKP", "Ed25519", "EdDSA")])
+            self.assertFalse(any("d" in k for k in keys))  # no private material
+            self.assertIn("max-age=3600", response["Cache-Control"])
+            etag = response["ETag"]
+            self.assertEqual(self.client.get("/.well-known/jwks.json", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self._signing(self.new):
+            self.assertNotEqual(self.client.get("/.well-known/jwks.json")["ETag"], etag)
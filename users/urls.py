@@ -1,5 +1,9 @@
 from django.urls import path
-from .views import SignupView, LoginView, VerifyEmailView, ResendVerificationView
+from .views import (
+    SignupView, LoginView, VerifyEmailView, ResendVerificationView,
+    RefreshView, LogoutView, LogoutAllView, RateLimitStatsView, HashingPoolStatsView,
+    AsyncSignupView, AsyncLoginView, AsyncVerifyEmailView, AsyncResendVerificationView,
+)
 
 
 from rest_framework.routers import DefaultRouter
@@ -12,6 +16,17 @@ urlpatterns = [
     path("login/",  LoginView.as_view(), name="login"),
     path("verify-email/", VerifyEmailView.as_view(), name="verify-email"),
     path("resend-verification/", ResendVerificationView.as_view(), name="resend-verification"),
+    path("token/refresh/", RefreshView.as_view(), name="token-refresh"),
+    path("logout/", LogoutView.as_view(), name="logout"),
+    path("logout-all/", LogoutAllView.as_view(), name="logout-all"),
+    path("admin/rate-limits/", RateLimitStatsView.as_view(), name="rate-limit-stats"),
+    path("admin/hashing-pool/", HashingPoolStatsView.as_view(), name="hashing-pool-stats"),
+
+    # async-native variants for ASGI deployments
+    path("async/signup/", AsyncSignupView.as_view(), name="async-signup"),
+    path("async/login/", AsyncLoginView.as_view(), name="async-login"),
+    path("async/verify-email/", AsyncVerifyEmailView.as_view(), name="async-verify-email"),
+    path("async/resend-verification/", AsyncResendVerificationView.as_view(), name="async-resend-verification"),
 ]
 
 
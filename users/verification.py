@@ -0,0 +1,68 @@
+"""
+Email-verification link tokens, in one of two modes (settings.EMAIL_VERIFICATION["MODE"]):
+
+- "db" (default): a random EmailVerificationToken row per link. Every link is
+  auditable (created/consumed timestamps, IP, user agent).
+- "signed": no table. The link carries an expiring, HMAC-signed payload of the
+  user id plus a fingerprint of the user's email and email_verified_at. Verifying
+  sets email_verified_at, which changes the fingerprint, so a link works once;
+  changing the email invalidates outstanding links. Signup and verify each save
+  one write and one index lookup.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import User
+
+DEFAULTS = {
+    "MODE": "db",
+    "MAX_AGE": 24 * 3600,   # seconds a link stays valid, in both modes
+}
+
+_SIGNING_SALT = "users.verification.link"
+_FINGERPRINT_SALT = "users.verification.fingerprint"
+
+
+class InvalidLink(Exception):
+    """Raised with the user-facing reason a verification link cannot be used."""
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "EMAIL_VERIFICATION", {})}
+
+
+def is_signed_mode() -> bool:
+    return get_config()["MODE"] == "signed"
+
+
+def fingerprint(user) -> str:
+    verified_at = user.email_verified_at.isoformat() if user.email_verified_at else ""
+    return salted_hmac(_FINGERPRINT_SALT, f"{user.pk}|{user.email}|{verified_at}").hexdigest()[:24]
+
+
+def make_signed_token(user) -> str:
+    return signing.dumps({"u": str(user.pk), "f": fingerprint(user)}, salt=_SIGNING_SALT)
+
+
+def load_signed_token(value) -> tuple:
+    """(user_id, fingerprint) from a signed link; the user is checked with check_fingerprint()."""
+    try:
+        payload = signing.loads(value, salt=_SIGNING_SALT, max_age=get_config()["MAX_AGE"])
+    except signing.SignatureExpired:
+        raise InvalidLink("Token has expired.")
+    except signing.BadSignature:
+        raise InvalidLink("Invalid token.")
+    try:
+        return User._meta.pk.to_python(payload["u"]), payload["f"]
+    except (TypeError, KeyError, ValidationError):
+        raise InvalidLink("Invalid token.")
+
+
+def check_fingerprint(user, expected):
+    if user is None:
+        raise InvalidLink("Invalid token.")
+    if not constant_time_compare(fingerprint(user), expected):
+        # a verified user's old link has been used (or superseded); anything else is tampering/stale
+        raise InvalidLink("Token already used." if user.is_verified else "Invalid token.")
@@ -1,40 +1,114 @@
 
-from rest_framework import generics, viewsets, permissions
+import json
+
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.exceptions import APIException, ParseError, Throttled
+from rest_framework.utils import encoders
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .serializers import (
     UserListSerializer,
     SignupSerializer,
+    AsyncSignupSerializer,
     VerifyEmailSerializer,
     ResendVerificationSerializer,
     LoginTokenObtainPairSerializer,
+    RefreshSerializer,
+    LogoutSerializer,
 )
+from .hashing import get_hashing_pool
+from .ratelimit import AuthRateThrottle, acheck, get_rate_limiter
+from .revocation import revoke_all_tokens
+from . import signing
 
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from project_mgmt.dbrouting import ReplicaReadMixin
+from project_mgmt.pagination import KeysetPagination
+from teams.models import TeamMembership
+from teams.signals import deferred_org_bump
 User = get_user_model()
 
 class IsAdminOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and request.user.is_staff)
 
-class UserAdminViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by("email")
+class UserKeysetPagination(KeysetPagination):
+    ordering = ("email", "id")
+
+class UserAdminViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    queryset = User.objects.all().order_by("email", "id")
     serializer_class = UserListSerializer
     permission_classes = [IsAdminOnly]
+    pagination_class = UserKeysetPagination
     http_method_names = ["get","delete","head","options"]  # list/retrieve/delete
 
+    def perform_destroy(self, instance):
+        # the cascade takes the user's memberships with it: bump each of their orgs once
+        # rather than looking up every membership's org in its post_delete
+        org_ids = set(TeamMembership.objects.filter(user=instance).values_list("team__org_id", flat=True))
+        with transaction.atomic(), deferred_org_bump(*org_ids):
+            instance.delete()
+
+
+
+
+
+class RateLimitStatsView(APIView):
+    """
+    GET /api/users/admin/rate-limits/
+    Allowed/rejected/lockout counters of this process's rate limiter.
+    """
+    permission_classes = [IsAdminOnly]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_rate_limiter().stats())
+
+
+class HashingPoolStatsView(APIView):
+    """
+    GET /api/users/admin/hashing-pool/
+    Queue (in flight, rejected, wait) and hashing latency counters of this process's hashing pool.
+    """
+    permission_classes = [IsAdminOnly]
 
+    def get(self, request, *args, **kwargs):
+        return Response(get_hashing_pool().stats())
 
 
+class JWKSView(View):
+    """
+    GET /.well-known/jwks.json
+    Public keys for verifying our tokens (users/signing.py); empty with symmetric signing.
+    Serialized once per key ring and cacheable for JWT_SIGNING["JWKS_MAX_AGE"] seconds.
+    """
+
+    def get(self, request, *args, **kwargs):
+        body, etag = signing.jwks_document()
+        if etag in {tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")}:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=signing.get_config()["JWKS_MAX_AGE"])
+        return response
+
 
 class SignupView(generics.CreateAPIView):
     """
     POST /api/users/signup/
     """
     permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "signup"
     serializer_class = SignupSerializer
 
 
@@ -65,6 +139,9 @@ class ResendVerificationView(generics.CreateAPIView):
     Body: {"email": "user@example.com"}
     """
     permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "resend"
     serializer_class = ResendVerificationSerializer
 
 
@@ -75,4 +152,147 @@ class LoginView(TokenObtainPairView):
     Returns: {"refresh": "...", "access": "...", "user": {...}}
     """
     permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "login"
     serializer_class = LoginTokenObtainPairSerializer
+
+
+class RefreshView(TokenRefreshView):
+    """
+    POST /api/users/token/refresh/
+    Body: {"refresh": "..."}
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = RefreshSerializer
+
+
+class LogoutView(APIView):
+    """
+    POST /api/users/logout/
+    Body: {"refresh": "..."} -- revokes that refresh token and the calling access token.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = LogoutSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
+class LogoutAllView(APIView):
+    """
+    POST /api/users/logout-all/
+    Revokes every access and refresh token issued to the caller.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        revoke_all_tokens(request.user.id)
+        return Response({"detail": "All sessions revoked."})
+
+
+# ---- Async (ASGI) auth endpoints ----
+# Same request/response contract as the views above, but every query goes through
+# the async ORM and hashing / email dispatch are awaited off the event loop, so
+# one ASGI worker can hold many logins and verifications in flight at once.
+
+class AsyncAuthView(View):
+    """
+    Minimal async counterpart of an AllowAny APIView: JSON or form body in,
+    DRF-style JSON out (400 with serializer errors, APIException status codes).
+    Views with a `throttle_scope` are rate limited like their sync counterparts.
+    """
+    throttle_scope = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = self.respond(detail, status=exc.status_code)
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = str(int(exc.wait))
+            return response
+
+    @staticmethod
+    def request_data(request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as exc:
+                raise ParseError(f"JSON parse error - {exc}")
+        return request.POST.dict()
+
+    @staticmethod
+    def respond(data, status=status.HTTP_200_OK):
+        return JsonResponse(data, status=status, encoder=encoders.JSONEncoder, safe=False)
+
+    async def validated(self, serializer_class, request, data):
+        if self.throttle_scope:
+            wait = await acheck(self.throttle_scope, request, data)
+            if wait is not None:
+                raise Throttled(wait)
+        serializer = serializer_class(data=data, context={"request": request})
+        await serializer.ais_valid(raise_exception=True)
+        return serializer
+
+
+class AsyncSignupView(AsyncAuthView):
+    """
+    POST /api/users/async/signup/
+    """
+    throttle_scope = "signup"
+
+    async def post(self, request, *args, **kwargs):
+        serializer = await self.validated(AsyncSignupSerializer, request, self.request_data(request))
+        serializer.instance = await serializer.acreate(dict(serializer.validated_data))
+        return self.respond(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncVerifyEmailView(AsyncAuthView):
+    """
+    GET or POST /api/users/async/verify-email/?token=...
+    Body alternative: {"token": "..."}
+    """
+
+    async def _verify(self, request, data):
+        serializer = await self.validated(VerifyEmailSerializer, request, data)
+        user = await serializer.asave()
+        return self.respond({"detail": "Email verified", "user_id": str(user.id)})
+
+    async def get(self, request, *args, **kwargs):
+        return await self._verify(request, {"token": request.GET.get("token")})
+
+    async def post(self, request, *args, **kwargs):
+        return await self._verify(request, self.request_data(request))
+
+
+class AsyncResendVerificationView(AsyncAuthView):
+    """
+    POST /api/users/async/resend-verification/
+    Body: {"email": "user@example.com"}
+    """
+    throttle_scope = "resend"
+
+    async def post(self, request, *args, **kwargs):
+        serializer = await self.validated(ResendVerificationSerializer, request, self.request_data(request))
+        await serializer.asave()
+        return self.respond(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncLoginView(AsyncAuthView):
+    """
+    POST /api/users/async/login/
+    Body: {"username": "<email or username>", "password": "..."}
+    Returns: {"refresh": "...", "access": "...", "user": {...}}
+    """
+    throttle_scope = "login"
+
+    async def post(self, request, *args, **kwargs):
+        serializer = await self.validated(LoginTokenObtainPairSerializer, request, self.request_data(request))
+        return self.respond(serializer.validated_data)